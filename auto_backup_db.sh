@@ -19,8 +19,12 @@ while true; do
   if [ -f "$DB_FILE" ]; then
     # 이전 백업이 없거나 차이가 있는 경우에만 백업
     if [ ! -f "$BACKUP_FILE" ] || ! cmp -s "$DB_FILE" "$BACKUP_FILE"; then
-      # 백업 수행
-      cp "$DB_FILE" "$BACKUP_FILE"
+      # 백업 수행 (WAL 모드에서는 sqlite3 백업 명령으로 최신 내용을 포함)
+      if command -v sqlite3 > /dev/null 2>&1; then
+        sqlite3 "$DB_FILE" ".backup '$BACKUP_FILE'"
+      else
+        cp "$DB_FILE" "$BACKUP_FILE"
+      fi
       echo "[$TIMESTAMP] 데이터베이스가 백업되었습니다: $BACKUP_FILE"
     else
       echo "[$TIMESTAMP] 변경사항 없음. 백업 생략."
@@ -1,17 +1,22 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 import os
+import signal
 import sys
 
 # 상위 디렉토리의 모듈을 임포트하기 위한 경로 추가
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from db.database import setup_database, DB_PATH
+from db.catalog import load_catalog
+from db.database import get_db, setup_database, DB_PATH
+from db.embeddings import embeddings_available, schedule_embedding_refresh
+from db.similarity import schedule_similarity_refresh, similarity_needs_refresh
 from routes.prompt_routes import prompt_bp
 from routes.folder_routes import folder_bp
 from routes.tag_routes import tag_bp
 from routes.settings_routes import settings_bp
 from routes.collection_routes import collection_bp
+from routes.stats_routes import stats_bp
 
 app = Flask(__name__)
 
@@ -40,9 +45,21 @@ def add_cors_headers(response):
 # 이 함수는 테이블이 없는 경우에만 테이블을 생성하고,
 # 기본 데이터가 없는 경우에만 기본 데이터를 삽입합니다.
 # 사용자가 추가한 데이터는 유지됩니다.
-# 메인 앱에서 이미 초기화된 경우 중복 실행을 방지하기 위해 조건부 초기화
-if not os.path.exists(DB_PATH):
-    setup_database()
+# 기존 DB에도 검색 인덱스 등 새 스키마가 적용되도록 항상 실행 (이미 적용된 단계는 건너뜀)
+setup_database()
+
+# 목록 API가 사용하는 메모리 내 프롬프트 카탈로그를 미리 구성
+load_catalog()
+
+# 유사 프롬프트 목록이 없는 프롬프트가 있으면(업그레이드한 DB, 갱신 전 종료 등)
+# 처음 조회하기 전에 백그라운드에서 채움
+with get_db() as conn:
+    if similarity_needs_refresh(conn):
+        schedule_similarity_refresh()
+
+# 임베딩 파일을 백그라운드에서 열고, 없거나 DB와 다르면 다시 만듦
+if embeddings_available():
+    schedule_embedding_refresh()
 
 # 블루프린트 등록
 app.register_blueprint(prompt_bp)
@@ -50,6 +67,7 @@ app.register_blueprint(folder_bp)
 app.register_blueprint(tag_bp)
 app.register_blueprint(settings_bp)
 app.register_blueprint(collection_bp)
+app.register_blueprint(stats_bp)
 
 
 # 루트 경로
@@ -61,4 +79,6 @@ def index():
 
 
 if __name__ == "__main__":
+    # SIGTERM으로 종료될 때도 atexit 정리 작업(사용 기록 버퍼 저장 등)이 실행되도록 함
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     app.run(debug=True, port=8000, host="0.0.0.0")
@@ -1,28 +1,63 @@
 from flask import Blueprint, jsonify, request
-from db.database import get_db_connection
+from db.data_versions import COLLECTION_LIST_VERSIONS, conditional_get
+from db.database import get_db
+from db.hot_score import current_hot_score
+from db.embeddings import embedding_status, embeddings_available, semantic_similar
+from db.hydration import fetch_scored_prompts, hydrate_prompts
+from db.projection import (
+    PROMPT_LIST_FIELDS,
+    drop_fields,
+    normalize_prompts,
+    parse_format,
+    parse_projection,
+    projection_sql,
+)
+from db.similarity import SIMILARITY_TOP_K, similarity_status
+from db.usage_buffer import overlay_usage, pending_usage
 
 collection_bp = Blueprint("collections", __name__)
 
+MAX_TRENDING_LIMIT = 100
+
+# 유사 프롬프트 기준: metadata(태그/폴더/내용 점수 인덱스), semantic(임베딩)
+SIMILAR_MODES = ("metadata", "semantic")
+
+# 컬렉션 프롬프트 목록 고유 필드와 기본 필드
+COLLECTION_COLUMNS = {"position": "cp.position", "added_at": "cp.added_at"}
+COLLECTION_PROMPT_FIELDS = PROMPT_LIST_FIELDS + tuple(COLLECTION_COLUMNS)
+
+# 최근 사용 프롬프트 기본 필드
+RECENT_PROMPT_FIELDS = (
+    "id",
+    "title",
+    "content",
+    "folder_id",
+    "folder",
+    "is_favorite",
+    "use_count",
+    "last_used_at",
+)
+
 
 # 모든 컬렉션 가져오기
 @collection_bp.route("/api/collections", methods=["GET"])
+@conditional_get(COLLECTION_LIST_VERSIONS, cache=True)
 def get_collections():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute(
+        cursor.execute(
+            """
+            SELECT c.id, c.name, c.created_at, c.updated_at,
+                   IFNULL(s.prompt_count, 0) as prompt_count
+            FROM collections c
+            LEFT JOIN collection_stats s ON s.collection_id = c.id
+            ORDER BY c.name
         """
-        SELECT c.id, c.name, c.created_at, c.updated_at,
-               COUNT(cp.prompt_id) as prompt_count
-        FROM collections c
-        LEFT JOIN collection_prompts cp ON c.id = cp.collection_id
-        GROUP BY c.id
-        ORDER BY c.name
-    """
-    )
+        )
+
+        collections = [dict(collection) for collection in cursor.fetchall()]
 
-    collections = [dict(collection) for collection in cursor.fetchall()]
-    conn.close()
     return jsonify(collections)
 
 
@@ -35,128 +70,115 @@ def create_collection():
     if not name:
         return jsonify({"error": "컬렉션 이름은 필수입니다."}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-    try:
-        cursor.execute(
-            """
-            INSERT INTO collections (name)
-            VALUES (?)
-        """,
-            (name,),
-        )
+        try:
+            cursor.execute(
+                """
+                INSERT INTO collections (name)
+                VALUES (?)
+            """,
+                (name,),
+            )
 
-        collection_id = cursor.lastrowid
-        conn.commit()
+            collection_id = cursor.lastrowid
+            conn.commit()
 
-        # 생성된 컬렉션 정보 조회
-        cursor.execute(
-            """
-            SELECT id, name, created_at, updated_at
-            FROM collections
-            WHERE id = ?
-        """,
-            (collection_id,),
-        )
+            # 생성된 컬렉션 정보 조회
+            cursor.execute(
+                """
+                SELECT id, name, created_at, updated_at
+                FROM collections
+                WHERE id = ?
+            """,
+                (collection_id,),
+            )
 
-        collection = dict(cursor.fetchone())
-        conn.close()
-        return jsonify(collection)
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        return jsonify({"error": f"컬렉션 생성 오류: {str(e)}"}), 500
+            collection = dict(cursor.fetchone())
+            return jsonify(collection)
+        except Exception as e:
+            conn.rollback()
+            return jsonify({"error": f"컬렉션 생성 오류: {str(e)}"}), 500
 
 
 # 컬렉션 삭제
 @collection_bp.route("/api/collections/<int:id>", methods=["DELETE"])
 def delete_collection(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # 컬렉션 존재 여부 확인
-        cursor.execute("SELECT id FROM collections WHERE id = ?", (id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"error": "컬렉션을 찾을 수 없습니다."}), 404
+        try:
+            # 컬렉션 존재 여부 확인
+            cursor.execute("SELECT id FROM collections WHERE id = ?", (id,))
+            if not cursor.fetchone():
+                return jsonify({"error": "컬렉션을 찾을 수 없습니다."}), 404
 
-        # 컬렉션-프롬프트 관계 삭제
-        cursor.execute("DELETE FROM collection_prompts WHERE collection_id = ?", (id,))
+            # 컬렉션-프롬프트 관계 삭제
+            cursor.execute(
+                "DELETE FROM collection_prompts WHERE collection_id = ?", (id,)
+            )
 
-        # 컬렉션 삭제
-        cursor.execute("DELETE FROM collections WHERE id = ?", (id,))
-        conn.commit()
-        conn.close()
+            # 컬렉션 삭제
+            cursor.execute("DELETE FROM collections WHERE id = ?", (id,))
+            conn.commit()
 
-        return jsonify({"success": True})
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        return jsonify({"error": f"컬렉션 삭제 오류: {str(e)}"}), 500
+            return jsonify({"success": True})
+        except Exception as e:
+            conn.rollback()
+            return jsonify({"error": f"컬렉션 삭제 오류: {str(e)}"}), 500
 
 
 # 컬렉션의 프롬프트 목록 가져오기
 @collection_bp.route("/api/collections/<int:id>/prompts", methods=["GET"])
 def get_collection_prompts(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    try:
+        projection = parse_projection(
+            request.args,
+            COLLECTION_PROMPT_FIELDS,
+            ("tags", "variables"),
+            extra_fields=COLLECTION_COLUMNS,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    # 컬렉션 존재 여부 확인
-    cursor.execute("SELECT id FROM collections WHERE id = ?", (id,))
-    if not cursor.fetchone():
-        conn.close()
-        return jsonify({"error": "컬렉션을 찾을 수 없습니다."}), 404
+    columns, joins = projection_sql(projection["fields"], COLLECTION_COLUMNS)
 
-    # 컬렉션에 속한 프롬프트 조회
-    cursor.execute(
-        """
-        SELECT p.id, p.title, p.content, p.folder_id, f.name as folder,
-               p.created_at, p.updated_at, p.is_favorite, 
-               p.use_count, p.last_used_at, p.memo,
-               cp.position, cp.added_at
-        FROM prompts p
-        JOIN collection_prompts cp ON p.id = cp.prompt_id
-        LEFT JOIN folders f ON p.folder_id = f.id
-        WHERE cp.collection_id = ?
-        ORDER BY cp.position
-    """,
-        (id,),
-    )
-
-    prompts = []
-    for row in cursor.fetchall():
-        prompt = dict(row)
-
-        # 태그 조회
-        cursor.execute(
-            """
-            SELECT t.id, t.name, t.color
-            FROM tags t
-            JOIN prompt_tags pt ON t.id = pt.tag_id
-            WHERE pt.prompt_id = ?
-        """,
-            (prompt["id"],),
-        )
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-        prompt["tags"] = [dict(tag) for tag in cursor.fetchall()]
+        # 컬렉션 존재 여부 확인
+        cursor.execute("SELECT id FROM collections WHERE id = ?", (id,))
+        if not cursor.fetchone():
+            return jsonify({"error": "컬렉션을 찾을 수 없습니다."}), 404
 
-        # 변수 조회
+        # 컬렉션에 속한 프롬프트 조회 (요청한 필드의 컬럼과 조인만 읽음)
         cursor.execute(
-            """
-            SELECT id, name, default_value
-            FROM variables
-            WHERE prompt_id = ?
+            f"""
+            SELECT {columns}
+            FROM prompts p
+            JOIN collection_prompts cp ON p.id = cp.prompt_id
+            {joins}
+            WHERE cp.collection_id = ?
+            ORDER BY cp.position
         """,
-            (prompt["id"],),
+            (id,),
         )
 
-        prompt["variables"] = [dict(variable) for variable in cursor.fetchall()]
+        prompts = [dict(row) for row in cursor.fetchall()]
+
+        # 요청한 태그와 변수를 일괄 조회로 채움
+        hydrate_prompts(
+            conn,
+            prompts,
+            tags="tags" in projection["include"],
+            variables="variables" in projection["include"],
+        )
+        overlay_usage(prompts, projection["fields"])
 
-        prompts.append(prompt)
+        if projection["format"] == "normalized":
+            return jsonify(normalize_prompts(conn, prompts, projection["folders"]))
 
-    conn.close()
     return jsonify(prompts)
 
 
@@ -165,55 +187,50 @@ def get_collection_prompts(id):
     "/api/collections/<int:id>/prompts/<int:prompt_id>", methods=["POST"]
 )
 def add_prompt_to_collection(id, prompt_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # 컬렉션 존재 여부 확인
-        cursor.execute("SELECT id FROM collections WHERE id = ?", (id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"error": "컬렉션을 찾을 수 없습니다."}), 404
+        try:
+            # 컬렉션 존재 여부 확인
+            cursor.execute("SELECT id FROM collections WHERE id = ?", (id,))
+            if not cursor.fetchone():
+                return jsonify({"error": "컬렉션을 찾을 수 없습니다."}), 404
 
-        # 프롬프트 존재 여부 확인
-        cursor.execute("SELECT id FROM prompts WHERE id = ?", (prompt_id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
+            # 프롬프트 존재 여부 확인
+            cursor.execute("SELECT id FROM prompts WHERE id = ?", (prompt_id,))
+            if not cursor.fetchone():
+                return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
 
-        # 이미 컬렉션에 있는지 확인
-        cursor.execute(
-            "SELECT 1 FROM collection_prompts WHERE collection_id = ? AND prompt_id = ?",
-            (id, prompt_id),
-        )
-        if cursor.fetchone():
-            conn.close()
-            return jsonify({"error": "이미 컬렉션에 포함된 프롬프트입니다."}), 400
+            # 이미 컬렉션에 있는지 확인
+            cursor.execute(
+                "SELECT 1 FROM collection_prompts WHERE collection_id = ? AND prompt_id = ?",
+                (id, prompt_id),
+            )
+            if cursor.fetchone():
+                return jsonify({"error": "이미 컬렉션에 포함된 프롬프트입니다."}), 400
 
-        # 현재 컬렉션의 마지막 position 값 조회
-        cursor.execute(
-            "SELECT COALESCE(MAX(position), -1) FROM collection_prompts WHERE collection_id = ?",
-            (id,),
-        )
-        last_position = cursor.fetchone()[0]
+            # 현재 컬렉션의 마지막 position 값 조회
+            cursor.execute(
+                "SELECT COALESCE(MAX(position), -1) FROM collection_prompts WHERE collection_id = ?",
+                (id,),
+            )
+            last_position = cursor.fetchone()[0]
 
-        # 컬렉션에 프롬프트 추가
-        cursor.execute(
-            """
-            INSERT INTO collection_prompts (collection_id, prompt_id, position)
-            VALUES (?, ?, ?)
-        """,
-            (id, prompt_id, last_position + 1),
-        )
+            # 컬렉션에 프롬프트 추가
+            cursor.execute(
+                """
+                INSERT INTO collection_prompts (collection_id, prompt_id, position)
+                VALUES (?, ?, ?)
+            """,
+                (id, prompt_id, last_position + 1),
+            )
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
-        return jsonify({"success": True})
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        return jsonify({"error": f"프롬프트 추가 오류: {str(e)}"}), 500
+            return jsonify({"success": True})
+        except Exception as e:
+            conn.rollback()
+            return jsonify({"error": f"프롬프트 추가 오류: {str(e)}"}), 500
 
 
 # 프롬프트를 컬렉션에서 제거
@@ -221,48 +238,45 @@ def add_prompt_to_collection(id, prompt_id):
     "/api/collections/<int:id>/prompts/<int:prompt_id>", methods=["DELETE"]
 )
 def remove_prompt_from_collection(id, prompt_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
-        # 컬렉션 존재 여부 확인
-        cursor.execute("SELECT id FROM collections WHERE id = ?", (id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"error": "컬렉션을 찾을 수 없습니다."}), 404
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-        # 컬렉션에서 프롬프트 제거
-        cursor.execute(
-            "DELETE FROM collection_prompts WHERE collection_id = ? AND prompt_id = ?",
-            (id, prompt_id),
-        )
+        try:
+            # 컬렉션 존재 여부 확인
+            cursor.execute("SELECT id FROM collections WHERE id = ?", (id,))
+            if not cursor.fetchone():
+                return jsonify({"error": "컬렉션을 찾을 수 없습니다."}), 404
 
-        # 컬렉션의 다른 프롬프트 position 값 재정렬
-        cursor.execute(
-            """
-            SELECT prompt_id, position
-            FROM collection_prompts
-            WHERE collection_id = ?
-            ORDER BY position
-        """,
-            (id,),
-        )
-        prompts = cursor.fetchall()
+            # 컬렉션에서 프롬프트 제거
+            cursor.execute(
+                "DELETE FROM collection_prompts WHERE collection_id = ? AND prompt_id = ?",
+                (id, prompt_id),
+            )
 
-        for i, prompt in enumerate(prompts):
+            # 컬렉션의 다른 프롬프트 position 값 재정렬
             cursor.execute(
-                "UPDATE collection_prompts SET position = ? WHERE collection_id = ? AND prompt_id = ?",
-                (i, id, prompt["prompt_id"]),
+                """
+                SELECT prompt_id, position
+                FROM collection_prompts
+                WHERE collection_id = ?
+                ORDER BY position
+            """,
+                (id,),
             )
+            prompts = cursor.fetchall()
+
+            for i, prompt in enumerate(prompts):
+                cursor.execute(
+                    "UPDATE collection_prompts SET position = ? WHERE collection_id = ? AND prompt_id = ?",
+                    (i, id, prompt["prompt_id"]),
+                )
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
-        return jsonify({"success": True})
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        return jsonify({"error": f"프롬프트 제거 오류: {str(e)}"}), 500
+            return jsonify({"success": True})
+        except Exception as e:
+            conn.rollback()
+            return jsonify({"error": f"프롬프트 제거 오류: {str(e)}"}), 500
 
 
 # 컬렉션 내 프롬프트 위치 변경
@@ -274,114 +288,92 @@ def reorder_collection_prompts(id):
     if not prompt_ids:
         return jsonify({"error": "프롬프트 ID 목록이 필요합니다."}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # 컬렉션 존재 여부 확인
-        cursor.execute("SELECT id FROM collections WHERE id = ?", (id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"error": "컬렉션을 찾을 수 없습니다."}), 404
+        try:
+            # 컬렉션 존재 여부 확인
+            cursor.execute("SELECT id FROM collections WHERE id = ?", (id,))
+            if not cursor.fetchone():
+                return jsonify({"error": "컬렉션을 찾을 수 없습니다."}), 404
 
-        # 위치 업데이트
-        for position, prompt_id in enumerate(prompt_ids):
-            cursor.execute(
-                "UPDATE collection_prompts SET position = ? WHERE collection_id = ? AND prompt_id = ?",
-                (position, id, prompt_id),
-            )
+            # 위치 업데이트
+            for position, prompt_id in enumerate(prompt_ids):
+                cursor.execute(
+                    "UPDATE collection_prompts SET position = ? WHERE collection_id = ? AND prompt_id = ?",
+                    (position, id, prompt_id),
+                )
 
-        conn.commit()
-        conn.close()
+            conn.commit()
 
-        return jsonify({"success": True})
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        return jsonify({"error": f"위치 변경 오류: {str(e)}"}), 500
+            return jsonify({"success": True})
+        except Exception as e:
+            conn.rollback()
+            return jsonify({"error": f"위치 변경 오류: {str(e)}"}), 500
 
 
 # 유사 프롬프트 가져오기
 @collection_bp.route("/api/prompts/<int:id>/similar", methods=["GET"])
 def get_similar_prompts(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # 프롬프트 존재 여부 확인
-    cursor.execute("SELECT id, folder_id FROM prompts WHERE id = ?", (id,))
-    prompt = cursor.fetchone()
-    if not prompt:
-        conn.close()
-        return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
-
-    prompt_id = prompt["id"]
-    folder_id = prompt["folder_id"]
-
-    # 프롬프트의 태그 가져오기
-    cursor.execute("SELECT tag_id FROM prompt_tags WHERE prompt_id = ?", (prompt_id,))
-    tag_ids = [row["tag_id"] for row in cursor.fetchall()]
-
-    # 유사 프롬프트 조회 (태그 및 폴더 기반)
-    query = """
-        SELECT p.id, p.title, p.content, p.folder_id, f.name as folder,
-            p.is_favorite, p.use_count, 
-            (
-                -- 태그 유사도 (50%)
-                (CASE WHEN pt.tag_match_count IS NOT NULL THEN pt.tag_match_count * 50.0 / CASE WHEN ? = 0 THEN 1 ELSE ? END ELSE 0 END) +
-                
-                -- 폴더 유사도 (30%)
-                (CASE WHEN p.folder_id = ? THEN 30 ELSE 0 END) +
-                
-                -- 사용 빈도 유사도 (20%)
-                (p.use_count * 20.0 / CASE WHEN (SELECT MAX(use_count) FROM prompts) = 0 THEN 1 ELSE (SELECT MAX(use_count) FROM prompts) END)
-            ) as similarity_score
-        FROM prompts p
-        LEFT JOIN folders f ON p.folder_id = f.id
-        LEFT JOIN (
-            SELECT pt.prompt_id, COUNT(*) as tag_match_count
-            FROM prompt_tags pt
-            WHERE pt.tag_id IN ({})
-            GROUP BY pt.prompt_id
-        ) pt ON p.id = pt.prompt_id
-        WHERE p.id != ?
-        ORDER BY similarity_score DESC
-        LIMIT 10
-    """
-
-    # 태그 ID 플레이스홀더 생성
-    placeholders = ", ".join(["?"] * len(tag_ids))
-    if not tag_ids:
-        placeholders = "0"  # 태그가 없는 경우 대비 (SQL 오류 방지)
-        tag_ids = []
-
-    # 쿼리에 태그 플레이스홀더 삽입
-    query = query.format(placeholders)
+    mode = request.args.get("mode", "metadata")
+    if mode not in SIMILAR_MODES:
+        return jsonify({"error": "mode는 metadata 또는 semantic이어야 합니다."}), 400
+    if mode == "semantic" and not embeddings_available():
+        return jsonify({"error": "의미 기반 검색에는 numpy가 필요합니다."}), 503
 
-    # 파라미터 준비
-    params = [len(tag_ids), len(tag_ids), folder_id] + tag_ids + [prompt_id]
-
-    cursor.execute(query, params)
-
-    similar_prompts = []
-    for row in cursor.fetchall():
-        similar_prompt = dict(row)
-
-        # 태그 조회
-        cursor.execute(
-            """
-            SELECT t.id, t.name, t.color
-            FROM tags t
-            JOIN prompt_tags pt ON t.id = pt.tag_id
-            WHERE pt.prompt_id = ?
-        """,
-            (similar_prompt["id"],),
-        )
+    try:
+        response_format = parse_format(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        similar_prompt["tags"] = [dict(tag) for tag in cursor.fetchall()]
-        similar_prompts.append(similar_prompt)
+    status = None
+    with get_db() as conn:
+        # 프롬프트 존재 여부 확인
+        row = conn.execute("SELECT id FROM prompts WHERE id = ?", (id,)).fetchone()
+        if not row:
+            return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
 
-    conn.close()
-    return jsonify(similar_prompts)
+        if mode == "semantic":
+            # 제목/내용 임베딩의 코사인 유사도 순 (태그·폴더와 무관)
+            # 임베딩 파일은 백그라운드에서만 갱신 (상태는 같은 헤더로 알림)
+            status = embedding_status(conn)
+            similar_prompts = fetch_scored_prompts(
+                conn, semantic_similar(id, SIMILARITY_TOP_K)
+            )
+        else:
+            # 목록은 백그라운드에서만 계산하므로, 최신이 아니면 갱신을 예약하고
+            # 저장된 목록을 그대로 반환 (상태는 X-Similarity-Status 헤더로 알림)
+            status = similarity_status(conn, id)
+
+            # 미리 계산된 유사 프롬프트 목록 조회 (태그 일치, 폴더, 내용 유사도 기준)
+            similar_prompts = [
+                dict(row)
+                for row in conn.execute(
+                    """
+                    SELECT p.id, p.title, p.content, p.folder_id, f.name as folder,
+                           p.is_favorite, p.use_count, s.score as similarity_score
+                    FROM prompt_similarity s
+                    JOIN prompts p ON p.id = s.similar_id
+                    LEFT JOIN folders f ON p.folder_id = f.id
+                    WHERE s.prompt_id = ?
+                    ORDER BY s.score DESC, s.similar_id
+                """,
+                    (id,),
+                )
+            ]
+
+        # 태그를 일괄 조회로 채움
+        hydrate_prompts(conn, similar_prompts, variables=False)
+        overlay_usage(similar_prompts)
+
+        if response_format == "normalized":
+            response = jsonify(normalize_prompts(conn, similar_prompts))
+        else:
+            response = jsonify(similar_prompts)
+
+    if status:
+        response.headers["X-Similarity-Status"] = status
+    return response
 
 
 # 최근 사용 프롬프트 가져오기
@@ -390,44 +382,110 @@ def get_recent_prompts():
     limit = request.args.get("limit", 10, type=int)
     excluded_id = request.args.get("excluded_id", 0, type=int)
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-        SELECT p.id, p.title, p.content, p.folder_id, f.name as folder,
-               p.is_favorite, p.use_count, p.last_used_at
+    try:
+        projection = parse_projection(request.args, RECENT_PROMPT_FIELDS, ("tags",))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # 정렬 기준인 last_used_at은 요청하지 않아도 읽고 응답에서만 뺌
+    fields = projection["fields"]
+    internal = {"last_used_at"} - set(fields)
+    select, joins = projection_sql(fields + tuple(internal))
+    columns = f"""
+        SELECT {select}
         FROM prompts p
-        LEFT JOIN folders f ON p.folder_id = f.id
-        WHERE p.id != ? AND p.last_used_at IS NOT NULL
-        ORDER BY p.last_used_at DESC
-        LIMIT ?
-    """,
-        (excluded_id, limit),
-    )
-
-    recent_prompts = []
-    for row in cursor.fetchall():
-        recent_prompt = dict(row)
-
-        # 태그 조회
+        {joins}
+    """
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+
         cursor.execute(
-            """
-            SELECT t.id, t.name, t.color
-            FROM tags t
-            JOIN prompt_tags pt ON t.id = pt.tag_id
-            WHERE pt.prompt_id = ?
+            f"""
+            {columns}
+            WHERE p.id != ? AND p.last_used_at IS NOT NULL
+            ORDER BY p.last_used_at DESC
+            LIMIT ?
         """,
-            (recent_prompt["id"],),
+            (excluded_id, limit),
         )
 
-        recent_prompt["tags"] = [dict(tag) for tag in cursor.fetchall()]
-        recent_prompts.append(recent_prompt)
+        recent_prompts = [dict(row) for row in cursor.fetchall()]
+
+        # 아직 기록되지 않은 사용 내역이 있는 프롬프트도 후보에 추가
+        # (사용 시간은 늘어나기만 하므로 나머지 프롬프트의 순위는 위 결과로 충분)
+        pending = pending_usage()
+        fetched_ids = {prompt["id"] for prompt in recent_prompts}
+        missing_ids = [
+            prompt_id
+            for prompt_id in pending
+            if prompt_id not in fetched_ids and prompt_id != excluded_id
+        ]
+        if missing_ids:
+            placeholders = ", ".join(["?"] * len(missing_ids))
+            cursor.execute(f"{columns} WHERE p.id IN ({placeholders})", missing_ids)
+            recent_prompts.extend(dict(row) for row in cursor.fetchall())
+
+        if pending:
+            overlay_usage(recent_prompts, fields + tuple(internal))
+            recent_prompts.sort(key=lambda prompt: prompt["last_used_at"], reverse=True)
+            if limit >= 0:
+                recent_prompts = recent_prompts[:limit]
+
+        # 요청한 태그와 변수를 일괄 조회로 채움
+        hydrate_prompts(
+            conn,
+            recent_prompts,
+            tags="tags" in projection["include"],
+            variables="variables" in projection["include"],
+        )
+        drop_fields(recent_prompts, internal)
+
+        if projection["format"] == "normalized":
+            return jsonify(
+                normalize_prompts(conn, recent_prompts, projection["folders"])
+            )
 
-    conn.close()
     return jsonify(recent_prompts)
 
 
+# 인기(감쇠 점수 기준) 프롬프트 가져오기
+@collection_bp.route("/api/prompts/trending", methods=["GET"])
+def get_trending_prompts():
+    limit = request.args.get("limit", 10, type=int)
+    if not 1 <= limit <= MAX_TRENDING_LIMIT:
+        return (
+            jsonify({"error": f"limit은 1에서 {MAX_TRENDING_LIMIT} 사이여야 합니다."}),
+            400,
+        )
+
+    with get_db() as conn:
+        # idx_prompts_hot_score를 역순으로 읽어 상위 limit개만 조회
+        trending_prompts = [
+            dict(row)
+            for row in conn.execute(
+                """
+                SELECT p.id, p.title, p.content, p.folder_id, f.name as folder,
+                       p.is_favorite, p.use_count, p.last_used_at, p.hot_score
+                FROM prompts p
+                LEFT JOIN folders f ON p.folder_id = f.id
+                WHERE p.hot_score IS NOT NULL
+                ORDER BY p.hot_score DESC
+                LIMIT ?
+            """,
+                (limit,),
+            )
+        ]
+
+        # 태그를 일괄 조회로 채움
+        hydrate_prompts(conn, trending_prompts, variables=False)
+
+    for prompt in trending_prompts:
+        prompt["hot_score"] = current_hot_score(prompt["hot_score"])
+
+    return jsonify(overlay_usage(trending_prompts))
+
+
 # 컬렉션 이름 변경
 @collection_bp.route("/api/collections/<int:id>", methods=["PATCH"])
 def rename_collection(id):
@@ -437,42 +495,39 @@ def rename_collection(id):
     if not new_name:
         return jsonify({"error": "새 컬렉션 이름은 필수입니다."}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # 컬렉션 존재 여부 확인
-        cursor.execute("SELECT id FROM collections WHERE id = ?", (id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"error": "컬렉션을 찾을 수 없습니다."}), 404
+        try:
+            # 컬렉션 존재 여부 확인
+            cursor.execute("SELECT id FROM collections WHERE id = ?", (id,))
+            if not cursor.fetchone():
+                return jsonify({"error": "컬렉션을 찾을 수 없습니다."}), 404
 
-        # 컬렉션 이름 업데이트
-        cursor.execute(
-            """
-            UPDATE collections 
-            SET name = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """,
-            (new_name, id),
-        )
+            # 컬렉션 이름 업데이트
+            cursor.execute(
+                """
+                UPDATE collections 
+                SET name = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """,
+                (new_name, id),
+            )
 
-        # 업데이트된 컬렉션 정보 조회
-        cursor.execute(
-            """
-            SELECT id, name, created_at, updated_at
-            FROM collections
-            WHERE id = ?
-        """,
-            (id,),
-        )
+            # 업데이트된 컬렉션 정보 조회
+            cursor.execute(
+                """
+                SELECT id, name, created_at, updated_at
+                FROM collections
+                WHERE id = ?
+            """,
+                (id,),
+            )
 
-        collection = dict(cursor.fetchone())
-        conn.commit()
-        conn.close()
+            collection = dict(cursor.fetchone())
+            conn.commit()
 
-        return jsonify(collection)
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        return jsonify({"error": f"컬렉션 이름 변경 오류: {str(e)}"}), 500
+            return jsonify(collection)
+        except Exception as e:
+            conn.rollback()
+            return jsonify({"error": f"컬렉션 이름 변경 오류: {str(e)}"}), 500
@@ -1,171 +1,387 @@
 from flask import Blueprint, jsonify, request
-from db.database import get_db_connection
+from db.catalog import catalog
+from db.data_versions import PROMPT_LIST_VERSIONS, conditional_get
+from db.database import get_db
+from db.embeddings import (
+    MAX_SEMANTIC_LIMIT,
+    embeddings_available,
+    embedding_status,
+    schedule_embedding_refresh,
+    semantic_search,
+)
+from db.hydration import IN_BATCH_SIZE, fetch_scored_prompts, hydrate_prompts
+from db.json_stream import JSONArrayStream, stream_json_response
+from db.near_duplicates import (
+    DUPLICATE_THRESHOLD,
+    copy_prompt_index,
+    duplicate_clusters,
+    find_similar_content,
+    index_prompt_content,
+)
+from db.search import MAX_SEARCH_LIMIT, search_prompts
+from db.similarity import schedule_similarity_refresh
+from db.projection import (
+    PROMPT_LIST_FIELDS,
+    drop_fields,
+    normalize_prompts,
+    parse_projection,
+)
+from db.prompt_query import (
+    LIST_QUERY_ARGS,
+    encode_cursor,
+    parse_filter_args,
+    parse_list_args,
+)
+from db.usage_buffer import (
+    flush_usage,
+    overlay_usage,
+    pending_usage,
+    record_usage,
+    usage_generation,
+)
 import datetime
+import time
 
 prompt_bp = Blueprint("prompts", __name__)
 
 
-# 모든 프롬프트 가져오기
-@prompt_bp.route("/api/prompts", methods=["GET"])
-def get_prompts():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def format_last_used(last_used_at):
+    """last_used_at을 "n분 전" 같은 보기 좋은 문자열로 변환합니다."""
+    if not last_used_at:
+        return "사용 이력 없음"
+
+    try:
+        # ISO 형식 문자열을 datetime 객체로 변환
+        # 타임존 정보가 있는 경우와 없는 경우를 모두 처리
+        if "Z" in last_used_at:
+            last_used_date = datetime.datetime.fromisoformat(
+                last_used_at.replace("Z", "+00:00")
+            )
+        else:
+            last_used_date = datetime.datetime.fromisoformat(last_used_at)
+
+        # 타임존 정보가 없는 경우, UTC로 가정
+        if last_used_date.tzinfo is None:
+            last_used_date = last_used_date.replace(tzinfo=datetime.timezone.utc)
+
+        # 현재 UTC 시간 가져오기 (tzinfo 유지)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        delta = now - last_used_date
+
+        if delta.days == 0:
+            if delta.seconds < 60:
+                return "방금 전"
+            elif delta.seconds < 3600:
+                return f"{delta.seconds // 60}분 전"
+            else:
+                return f"{delta.seconds // 3600}시간 전"
+        elif delta.days == 1:
+            return "어제"
+        elif delta.days < 7:
+            return f"{delta.days}일 전"
+        elif delta.days < 30:
+            return f"{delta.days // 7}주 전"
+        else:
+            return last_used_date.strftime("%Y-%m-%d")
+    except Exception as e:
+        # 형식 변환 오류 발생 시 기본값 표시
+        print(f"시간 변환 오류: {e}, last_used_at: {last_used_at}")
+        return "날짜 형식 오류"
 
-    # 프롬프트 기본 정보 조회
-    cursor.execute(
+
+def fetch_prompt(conn, id):
+    """태그와 변수를 포함한 프롬프트 하나를 조회합니다. 없으면 None을 반환합니다."""
+    row = conn.execute(
         """
         SELECT p.id, p.title, p.content, p.folder_id, f.name as folder,
                p.created_at, p.updated_at, p.is_favorite, 
                p.use_count, p.last_used_at, p.memo
         FROM prompts p
         LEFT JOIN folders f ON p.folder_id = f.id
+        WHERE p.id = ?
+    """,
+        (id,),
+    ).fetchone()
+
+    if not row:
+        return None
+
+    return overlay_usage(hydrate_prompts(conn, [dict(row)]))[0]
+
+
+def prompt_list_etag_parts():
+    """목록 응답을 바꾸지만 테이블 버전에는 없는 값을 반환합니다.
+
+    아직 기록되지 않은 사용 내역과, 커밋 뒤에 갱신되는 카탈로그의 상태를
+    포함하고, last_used("n분 전")를 응답하면 현재 시각(분 단위)도 포함합니다.
     """
-    )
+    parts = [usage_generation(), catalog.version]
+    fields = request.args.get("fields")
+    if fields is None or "last_used" in [field.strip() for field in fields.split(",")]:
+        parts.append(int(time.time() // 60))
+    return parts
 
-    prompts = []
-    for row in cursor.fetchall():
-        prompt = dict(row)
-
-        # 태그 조회
-        cursor.execute(
-            """
-            SELECT t.id, t.name, t.color
-            FROM tags t
-            JOIN prompt_tags pt ON t.id = pt.tag_id
-            WHERE pt.prompt_id = ?
-        """,
-            (prompt["id"],),
-        )
 
-        prompt["tags"] = [dict(tag) for tag in cursor.fetchall()]
+def is_unfiltered_list():
+    """필터/정렬/페이지 파라미터가 없는 전체 목록 요청인지 반환합니다 (응답 캐시 대상)."""
+    return not any(arg in request.args for arg in LIST_QUERY_ARGS)
+
 
-        # 변수 조회
-        cursor.execute(
-            """
-            SELECT id, name, default_value
-            FROM variables
-            WHERE prompt_id = ?
-        """,
-            (prompt["id"],),
+# 모든 프롬프트 가져오기
+@prompt_bp.route("/api/prompts", methods=["GET"])
+@conditional_get(
+    PROMPT_LIST_VERSIONS, extra=prompt_list_etag_parts, cache=is_unfiltered_list
+)
+def get_prompts():
+    try:
+        projection = parse_projection(
+            request.args,
+            PROMPT_LIST_FIELDS + ("last_used",),
+            ("tags", "variables"),
+            extra_fields=("last_used",),
         )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        prompt["variables"] = [dict(variable) for variable in cursor.fetchall()]
-
-        # last_used_at을 보기 좋게 포맷팅
-        if prompt["last_used_at"]:
-            try:
-                # ISO 형식 문자열을 datetime 객체로 변환
-                # 타임존 정보가 있는 경우와 없는 경우를 모두 처리
-                last_used_at = prompt["last_used_at"]
-                if "Z" in last_used_at:
-                    last_used_date = datetime.datetime.fromisoformat(
-                        last_used_at.replace("Z", "+00:00")
-                    )
-                elif "+" in last_used_at or "-" in last_used_at and "T" in last_used_at:
-                    # 이미 타임존 정보가 있는 경우
-                    last_used_date = datetime.datetime.fromisoformat(last_used_at)
-                else:
-                    # 타임존 정보가 없는 경우, UTC로 가정
-                    last_used_date = datetime.datetime.fromisoformat(last_used_at)
-                    last_used_date = last_used_date.replace(
-                        tzinfo=datetime.timezone.utc
-                    )
+    # 필터/정렬/페이지 파라미터가 있으면 서버 측 목록 조회 경로 사용
+    if any(arg in request.args for arg in LIST_QUERY_ARGS):
+        return query_prompts(projection)
 
-                # 현재 UTC 시간 가져오기 (tzinfo 유지)
-                now = datetime.datetime.now(datetime.timezone.utc)
+    # 메타데이터는 카탈로그에서, 내용/메모/변수만 데이터베이스에서 읽음
+    records = catalog.all_records()
+    if projection["format"] == "normalized":
+        with get_db() as conn:
+            prompts = materialize_prompts(conn, records, projection)
+            return jsonify(normalize_prompts(conn, prompts, projection["folders"]))
 
-                # 시간대 정보 확인을 위한 디버깅 출력
-                print(f"Last used: {last_used_date}, tzinfo: {last_used_date.tzinfo}")
-                print(f"Now: {now}, tzinfo: {now.tzinfo}")
+    return stream_prompts(records, projection)
 
-                # 두 시간 모두 tzinfo가 있는지 확인하고 비교
-                if last_used_date.tzinfo is None:
-                    last_used_date = last_used_date.replace(
-                        tzinfo=datetime.timezone.utc
-                    )
 
-                delta = now - last_used_date
+def materialize_prompts(conn, records, projection):
+    """카탈로그 레코드를 요청한 필드만 담은 목록 응답으로 바꿉니다."""
+    fields = [field for field in projection["fields"] if field != "last_used"]
+    # last_used는 last_used_at으로 계산하므로 요청하지 않았어도 읽고 응답에서만 뺌
+    internal = set()
+    if "last_used" in projection["fields"] and "last_used_at" not in fields:
+        internal.add("last_used_at")
+        fields.append("last_used_at")
 
-                if delta.days == 0:
-                    if delta.seconds < 60:
-                        prompt["last_used"] = "방금 전"
-                    elif delta.seconds < 3600:
-                        prompt["last_used"] = f"{delta.seconds // 60}분 전"
-                    else:
-                        prompt["last_used"] = f"{delta.seconds // 3600}시간 전"
-                elif delta.days == 1:
-                    prompt["last_used"] = "어제"
-                elif delta.days < 7:
-                    prompt["last_used"] = f"{delta.days}일 전"
-                elif delta.days < 30:
-                    prompt["last_used"] = f"{delta.days // 7}주 전"
-                else:
-                    prompt["last_used"] = last_used_date.strftime("%Y-%m-%d")
-            except Exception as e:
-                # 형식 변환 오류 발생 시 기본값 표시
-                print(f"시간 변환 오류: {e}, last_used_at: {prompt['last_used_at']}")
-                prompt["last_used"] = "날짜 형식 오류"
+    include = projection["include"]
+    if projection["format"] == "normalized" and "tags" in include:
+        # 태그 객체는 응답 최상위에 한 번만 담으므로 ID 목록만 채움
+        include = (include - {"tags"}) | {"tag_ids"}
+
+    prompts = catalog.materialize(conn, records, fields, include)
+
+    # 아직 기록되지 않은 사용 내역 반영
+    overlay_usage(prompts, fields)
+
+    if "last_used" in projection["fields"]:
+        for prompt in prompts:
+            prompt["last_used"] = format_last_used(prompt["last_used_at"])
+
+    return drop_fields(prompts, internal)
+
+
+def stream_prompts(records, projection):
+    """레코드를 배치 단위로 채우면서 배열 응답으로 스트리밍합니다.
+
+    전체 목록을 한 번에 만들지 않으며, 연결은 배치마다 빌렸다가 반환해 느린
+    클라이언트가 풀 연결을 붙잡지 않게 합니다.
+    """
+
+    def iter_prompts():
+        for start in range(0, len(records), IN_BATCH_SIZE):
+            with get_db() as conn:
+                batch = records[start : start + IN_BATCH_SIZE]
+                prompts = materialize_prompts(conn, batch, projection)
+            yield from prompts
+
+    return stream_json_response(JSONArrayStream(iter_prompts()))
+
+
+def query_prompts(projection):
+    """필터와 정렬을 카탈로그에서 적용해 보이는 범위의 프롬프트만 반환합니다.
+
+    limit/cursor가 있으면 {prompts, next_cursor, total_estimate} 형태로,
+    없으면 기존과 같은 배열 형태로 응답합니다.
+    """
+    try:
+        query = parse_list_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    filters = query["filters"]
+    cursor = query["cursor"]
+    limit = query["limit"]
+
+    # 필터/정렬/개수는 카탈로그에서 처리하고 보이는 범위만 데이터베이스에서 채움
+    total_estimate = None
+    if query["paginated"]:
+        # 전체 개수는 첫 페이지에서만 계산하고 이후에는 커서에 담긴 값을 사용
+        if cursor and cursor["total_estimate"] is not None:
+            total_estimate = cursor["total_estimate"]
         else:
-            prompt["last_used"] = "사용 이력 없음"
+            total_estimate = catalog.count(filters)
 
-        prompts.append(prompt)
+    try:
+        records = catalog.query(
+            filters, query["sort"], query["direction"], limit, cursor
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    next_cursor = None
+    if limit is not None and len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(
+            query["sort"],
+            query["direction"],
+            {
+                "_sort_key": catalog.sort_key(records[-1], query["sort"]),
+                "id": records[-1].id,
+            },
+            total_estimate,
+        )
 
-    conn.close()
-    return jsonify(prompts)
+    # 사용 횟수/시간 정렬 순서는 버퍼가 기록될 때(최대 USAGE_FLUSH_INTERVAL) 반영됨
+    if not query["paginated"] and projection["format"] != "normalized":
+        return stream_prompts(records, projection)
 
+    with get_db() as conn:
+        rows = materialize_prompts(conn, records, projection)
+        if projection["format"] == "normalized":
+            body = normalize_prompts(conn, rows, projection["folders"])
+        else:
+            body = {"prompts": rows}
 
-# 특정 프롬프트 가져오기
-@prompt_bp.route("/api/prompts/<int:id>", methods=["GET"])
-def get_prompt(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    if query["paginated"]:
+        body["next_cursor"] = next_cursor
+        body["total_estimate"] = total_estimate
+    return jsonify(body)
 
-    # 프롬프트 기본 정보 조회
-    cursor.execute(
-        """
-        SELECT p.id, p.title, p.content, p.folder_id, f.name as folder,
-               p.created_at, p.updated_at, p.is_favorite, 
-               p.use_count, p.last_used_at, p.memo
-        FROM prompts p
-        LEFT JOIN folders f ON p.folder_id = f.id
-        WHERE p.id = ?
-    """,
-        (id,),
-    )
 
-    row = cursor.fetchone()
-    if not row:
-        conn.close()
-        return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
+# 목록 필터에 맞는 프롬프트의 태그/폴더/즐겨찾기/사용 여부별 개수
+@prompt_bp.route("/api/prompts/facets", methods=["GET"])
+def get_prompt_facets():
+    try:
+        filters = parse_filter_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    prompt = dict(row)
+    return jsonify(catalog.facets(filters, pending_usage()))
 
-    # 태그 조회
-    cursor.execute(
-        """
-        SELECT t.id, t.name, t.color
-        FROM tags t
-        JOIN prompt_tags pt ON t.id = pt.tag_id
-        WHERE pt.prompt_id = ?
-    """,
-        (id,),
-    )
 
-    prompt["tags"] = [dict(tag) for tag in cursor.fetchall()]
+# 프롬프트 전문 검색
+@prompt_bp.route("/api/prompts/search", methods=["GET"])
+def search_prompts_route():
+    query = request.args.get("q", "").strip()
+    limit = request.args.get("limit", 20, type=int)
 
-    # 변수 조회
-    cursor.execute(
-        """
-        SELECT id, name, default_value
-        FROM variables
-        WHERE prompt_id = ?
-    """,
-        (id,),
+    if not query:
+        return jsonify({"error": "검색어(q)는 필수입니다."}), 400
+    if not 1 <= limit <= MAX_SEARCH_LIMIT:
+        return (
+            jsonify({"error": f"limit은 1에서 {MAX_SEARCH_LIMIT} 사이여야 합니다."}),
+            400,
+        )
+
+    with get_db() as conn:
+        results = search_prompts(conn, query, limit)
+
+        # 태그를 일괄 조회로 채움
+        hydrate_prompts(conn, results, variables=False)
+
+    return jsonify(overlay_usage(results))
+
+
+# 자유 텍스트와 의미가 비슷한 프롬프트 검색 (로컬 임베딩 기준)
+@prompt_bp.route("/api/prompts/semantic", methods=["GET"])
+def semantic_search_route():
+    query = request.args.get("q", "").strip()
+    limit = request.args.get("limit", 20, type=int)
+
+    if not query:
+        return jsonify({"error": "검색어(q)는 필수입니다."}), 400
+    if not 1 <= limit <= MAX_SEMANTIC_LIMIT:
+        return (
+            jsonify({"error": f"limit은 1에서 {MAX_SEMANTIC_LIMIT} 사이여야 합니다."}),
+            400,
+        )
+    if not embeddings_available():
+        return jsonify({"error": "의미 기반 검색에는 numpy가 필요합니다."}), 503
+
+    with get_db() as conn:
+        # 임베딩 파일은 백그라운드에서만 갱신하므로, 최신이 아니면 갱신을 예약하고
+        # 지금 행렬로 검색 (상태는 X-Embedding-Status 헤더로 알림)
+        status = embedding_status(conn)
+        results = fetch_scored_prompts(conn, semantic_search(query, limit))
+
+        # 태그를 일괄 조회로 채움
+        hydrate_prompts(conn, results, variables=False)
+
+    response = jsonify(overlay_usage(results))
+    response.headers["X-Embedding-Status"] = status
+    return response
+
+
+# 내용이 거의 같은 프롬프트 묶음 찾기
+@prompt_bp.route("/api/prompts/duplicates", methods=["GET"])
+def get_duplicate_prompts():
+    threshold = request.args.get("threshold", DUPLICATE_THRESHOLD, type=float)
+    if not 0.5 <= threshold <= 1:
+        return jsonify({"error": "threshold는 0.5에서 1 사이여야 합니다."}), 400
+
+    with get_db() as conn:
+        clusters = duplicate_clusters(conn.cursor(), threshold)
+        if not clusters:
+            return jsonify({"threshold": threshold, "clusters": []})
+
+        prompt_ids = [
+            prompt_id for cluster in clusters for prompt_id in cluster["prompt_ids"]
+        ]
+        placeholders = ", ".join(["?"] * len(prompt_ids))
+        prompts = {
+            row["id"]: dict(row)
+            for row in conn.execute(
+                f"""
+                SELECT p.id, p.title, p.folder_id, f.name as folder,
+                       p.created_at, p.updated_at, p.use_count
+                FROM prompts p
+                LEFT JOIN folders f ON p.folder_id = f.id
+                WHERE p.id IN ({placeholders})
+            """,
+                prompt_ids,
+            )
+        }
+
+    overlay_usage(list(prompts.values()))
+
+    return jsonify(
+        {
+            "threshold": threshold,
+            "clusters": [
+                {
+                    "similarity": cluster["similarity"],
+                    "prompts": [
+                        prompts[prompt_id] for prompt_id in cluster["prompt_ids"]
+                    ],
+                }
+                for cluster in clusters
+            ],
+        }
     )
 
-    prompt["variables"] = [dict(variable) for variable in cursor.fetchall()]
 
-    conn.close()
+# 특정 프롬프트 가져오기
+@prompt_bp.route("/api/prompts/<int:id>", methods=["GET"])
+def get_prompt(id):
+    with get_db() as conn:
+        prompt = fetch_prompt(conn, id)
+
+    if not prompt:
+        return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
+
     return jsonify(prompt)
 
 
@@ -178,83 +394,103 @@ def create_prompt():
     if not data.get("title") or not data.get("content"):
         return jsonify({"error": "제목과 내용은 필수입니다."}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-    try:
-        conn.execute("BEGIN")
-
-        # 프롬프트 기본 정보 저장
-        cursor.execute(
-            """
-            INSERT INTO prompts (title, content, folder_id, is_favorite)
-            VALUES (?, ?, ?, ?)
-        """,
-            (
-                data["title"],
-                data["content"],
-                data.get("folder_id"),
-                1 if data.get("is_favorite") else 0,
-            ),
-        )
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+
+            # 프롬프트 기본 정보 저장
+            cursor.execute(
+                """
+                INSERT INTO prompts (title, content, folder_id, is_favorite)
+                VALUES (?, ?, ?, ?)
+            """,
+                (
+                    data["title"],
+                    data["content"],
+                    data.get("folder_id"),
+                    1 if data.get("is_favorite") else 0,
+                ),
+            )
 
-        prompt_id = cursor.lastrowid
+            prompt_id = cursor.lastrowid
 
-        # 태그 처리
-        if "tags" in data and data["tags"]:
-            for tag in data["tags"]:
-                # 태그 ID가 없으면 새로 생성
-                if "id" not in tag:
+            # 내용이 거의 같은 기존 프롬프트 확인 후 새 프롬프트 색인
+            duplicates = find_similar_content(
+                cursor, data["content"], exclude_id=prompt_id
+            )
+            index_prompt_content(cursor, prompt_id, data["content"])
+
+            # 태그 처리
+            if "tags" in data and data["tags"]:
+                for tag in data["tags"]:
+                    # 태그 ID가 없으면 새로 생성
+                    if "id" not in tag:
+                        cursor.execute(
+                            """
+                            INSERT OR IGNORE INTO tags (name, color)
+                            VALUES (?, ?)
+                        """,
+                            (tag["name"], tag.get("color", "blue")),
+                        )
+
+                        cursor.execute(
+                            """
+                            SELECT id FROM tags WHERE name = ?
+                        """,
+                            (tag["name"],),
+                        )
+
+                        tag_id = cursor.fetchone()["id"]
+                    else:
+                        tag_id = tag["id"]
+
+                    # 프롬프트-태그 연결
                     cursor.execute(
                         """
-                        INSERT OR IGNORE INTO tags (name, color)
+                        INSERT INTO prompt_tags (prompt_id, tag_id)
                         VALUES (?, ?)
                     """,
-                        (tag["name"], tag.get("color", "blue")),
+                        (prompt_id, tag_id),
                     )
 
+            # 변수 처리
+            if "variables" in data and data["variables"]:
+                for variable in data["variables"]:
                     cursor.execute(
                         """
-                        SELECT id FROM tags WHERE name = ?
+                        INSERT INTO variables (prompt_id, name, default_value)
+                        VALUES (?, ?, ?)
                     """,
-                        (tag["name"],),
+                        (
+                            prompt_id,
+                            variable["name"],
+                            variable.get("default_value", ""),
+                        ),
                     )
 
-                    tag_id = cursor.fetchone()["id"]
-                else:
-                    tag_id = tag["id"]
-
-                # 프롬프트-태그 연결
-                cursor.execute(
-                    """
-                    INSERT INTO prompt_tags (prompt_id, tag_id)
-                    VALUES (?, ?)
-                """,
-                    (prompt_id, tag_id),
-                )
+            conn.commit()
+            catalog.refresh_prompts(conn, [prompt_id])
 
-        # 변수 처리
-        if "variables" in data and data["variables"]:
-            for variable in data["variables"]:
-                cursor.execute(
-                    """
-                    INSERT INTO variables (prompt_id, name, default_value)
-                    VALUES (?, ?, ?)
-                """,
-                    (prompt_id, variable["name"], variable.get("default_value", "")),
-                )
+        except Exception as e:
+            conn.rollback()
+            return jsonify({"error": str(e)}), 500
 
-        conn.commit()
+    # 유사 프롬프트 목록과 임베딩 갱신은 백그라운드에서 처리
+    schedule_similarity_refresh()
+    schedule_embedding_refresh()
 
-        # 새로 생성된 프롬프트 정보 반환
-        return get_prompt(prompt_id)
+    # 새로 생성된 프롬프트 정보 반환
+    with get_db() as conn:
+        prompt = fetch_prompt(conn, prompt_id)
 
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": str(e)}), 500
+    # 생성은 그대로 하되 비슷한 내용이 이미 있으면 경고를 함께 반환
+    if duplicates:
+        prompt["warning"] = "비슷한 내용의 프롬프트가 이미 있습니다."
+        prompt["duplicates"] = duplicates
 
-    finally:
-        conn.close()
+    return jsonify(prompt)
 
 
 # 프롬프트 업데이트
@@ -266,355 +502,344 @@ def update_prompt(id):
     if not data.get("title") or not data.get("content"):
         return jsonify({"error": "제목과 내용은 필수입니다."}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # 프롬프트 존재 여부 확인
-        cursor.execute("SELECT id FROM prompts WHERE id = ?", (id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
+        try:
+            # 프롬프트 존재 여부 확인
+            cursor.execute("SELECT id FROM prompts WHERE id = ?", (id,))
+            if not cursor.fetchone():
+                return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
 
-        conn.execute("BEGIN")
-
-        # 프롬프트 기본 정보 업데이트
-        cursor.execute(
-            """
-            UPDATE prompts
-            SET title = ?, content = ?, folder_id = ?, is_favorite = ?, updated_at = datetime('now')
-            WHERE id = ?
-        """,
-            (
-                data["title"],
-                data["content"],
-                data.get("folder_id"),
-                1 if data.get("is_favorite") else 0,
-                id,
-            ),
-        )
+            conn.execute("BEGIN IMMEDIATE")
 
-        # 기존 태그 연결 제거
-        cursor.execute("DELETE FROM prompt_tags WHERE prompt_id = ?", (id,))
+            # 프롬프트 기본 정보 업데이트
+            cursor.execute(
+                """
+                UPDATE prompts
+                SET title = ?, content = ?, folder_id = ?, is_favorite = ?, updated_at = datetime('now')
+                WHERE id = ?
+            """,
+                (
+                    data["title"],
+                    data["content"],
+                    data.get("folder_id"),
+                    1 if data.get("is_favorite") else 0,
+                    id,
+                ),
+            )
+
+            # 내용 중복 검사용 색인 갱신
+            index_prompt_content(cursor, id, data["content"])
+
+            # 기존 태그 연결 제거
+            cursor.execute("DELETE FROM prompt_tags WHERE prompt_id = ?", (id,))
+
+            # 새 태그 연결
+            if "tags" in data and data["tags"]:
+                for tag in data["tags"]:
+                    # 태그 ID가 없으면 새로 생성
+                    if "id" not in tag:
+                        cursor.execute(
+                            """
+                            INSERT OR IGNORE INTO tags (name, color)
+                            VALUES (?, ?)
+                        """,
+                            (tag["name"], tag.get("color", "blue")),
+                        )
+
+                        cursor.execute(
+                            """
+                            SELECT id FROM tags WHERE name = ?
+                        """,
+                            (tag["name"],),
+                        )
+
+                        tag_id = cursor.fetchone()["id"]
+                    else:
+                        tag_id = tag["id"]
 
-        # 새 태그 연결
-        if "tags" in data and data["tags"]:
-            for tag in data["tags"]:
-                # 태그 ID가 없으면 새로 생성
-                if "id" not in tag:
+                    # 프롬프트-태그 연결
                     cursor.execute(
                         """
-                        INSERT OR IGNORE INTO tags (name, color)
+                        INSERT INTO prompt_tags (prompt_id, tag_id)
                         VALUES (?, ?)
                     """,
-                        (tag["name"], tag.get("color", "blue")),
+                        (id, tag_id),
                     )
 
+            # 기존 변수 제거
+            cursor.execute("DELETE FROM variables WHERE prompt_id = ?", (id,))
+
+            # 새 변수 추가
+            if "variables" in data and data["variables"]:
+                for variable in data["variables"]:
                     cursor.execute(
                         """
-                        SELECT id FROM tags WHERE name = ?
+                        INSERT INTO variables (prompt_id, name, default_value)
+                        VALUES (?, ?, ?)
                     """,
-                        (tag["name"],),
+                        (id, variable["name"], variable.get("default_value", "")),
                     )
 
-                    tag_id = cursor.fetchone()["id"]
-                else:
-                    tag_id = tag["id"]
-
-                # 프롬프트-태그 연결
-                cursor.execute(
-                    """
-                    INSERT INTO prompt_tags (prompt_id, tag_id)
-                    VALUES (?, ?)
-                """,
-                    (id, tag_id),
-                )
-
-        # 기존 변수 제거
-        cursor.execute("DELETE FROM variables WHERE prompt_id = ?", (id,))
-
-        # 새 변수 추가
-        if "variables" in data and data["variables"]:
-            for variable in data["variables"]:
-                cursor.execute(
-                    """
-                    INSERT INTO variables (prompt_id, name, default_value)
-                    VALUES (?, ?, ?)
-                """,
-                    (id, variable["name"], variable.get("default_value", "")),
-                )
-
-        conn.commit()
+            conn.commit()
+            catalog.refresh_prompts(conn, [id])
 
-        # 업데이트된 프롬프트 정보 반환
-        return get_prompt(id)
+        except Exception as e:
+            conn.rollback()
+            return jsonify({"error": str(e)}), 500
 
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": str(e)}), 500
+    # 유사 프롬프트 목록과 임베딩 갱신은 백그라운드에서 처리
+    schedule_similarity_refresh()
+    schedule_embedding_refresh()
 
-    finally:
-        conn.close()
+    # 업데이트된 프롬프트 정보 반환
+    return get_prompt(id)
 
 
 # 프롬프트 삭제
 @prompt_bp.route("/api/prompts/<int:id>", methods=["DELETE"])
 def delete_prompt(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # 프롬프트 존재 여부 확인
-        cursor.execute("SELECT id FROM prompts WHERE id = ?", (id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
+        try:
+            # 프롬프트 존재 여부 확인
+            cursor.execute("SELECT id FROM prompts WHERE id = ?", (id,))
+            if not cursor.fetchone():
+                return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
 
-        conn.execute("BEGIN")
+            conn.execute("BEGIN IMMEDIATE")
 
-        # 관련 데이터 삭제 (CASCADE로 처리되지만 명시적으로 작성)
-        cursor.execute("DELETE FROM variables WHERE prompt_id = ?", (id,))
-        cursor.execute("DELETE FROM prompt_tags WHERE prompt_id = ?", (id,))
-        cursor.execute("DELETE FROM prompts WHERE id = ?", (id,))
+            # 관련 데이터 삭제 (CASCADE로 처리되지만 명시적으로 작성)
+            cursor.execute("DELETE FROM variables WHERE prompt_id = ?", (id,))
+            cursor.execute("DELETE FROM prompt_tags WHERE prompt_id = ?", (id,))
+            cursor.execute("DELETE FROM prompts WHERE id = ?", (id,))
 
-        conn.commit()
+            conn.commit()
+            catalog.refresh_prompts(conn, [id])
+            # 삭제된 프롬프트를 목록에 가지고 있던 프롬프트의 목록을 다시 채우고
+            # 임베딩 파일에서 삭제된 행을 비움
+            schedule_similarity_refresh()
+            schedule_embedding_refresh()
 
-        return jsonify({"message": "프롬프트가 삭제되었습니다.", "id": id})
-
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": str(e)}), 500
+            return jsonify({"message": "프롬프트가 삭제되었습니다.", "id": id})
 
-    finally:
-        conn.close()
+        except Exception as e:
+            conn.rollback()
+            return jsonify({"error": str(e)}), 500
 
 
 # 프롬프트 사용 횟수 증가
 @prompt_bp.route("/api/prompts/<int:id>/use", methods=["POST"])
 def increment_use_count(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
+    with get_db() as conn:
         # 프롬프트 존재 여부 확인
-        cursor.execute("SELECT id FROM prompts WHERE id = ?", (id,))
-        if not cursor.fetchone():
-            conn.close()
+        row = conn.execute("SELECT id FROM prompts WHERE id = ?", (id,)).fetchone()
+        if not row:
             return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
 
-        # 현재 UTC 시간을 ISO 포맷으로 생성 (Z 포맷 대신 +00:00 사용)
-        current_utc_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    # 현재 UTC 시간을 ISO 포맷으로 생성 (Z 포맷 대신 +00:00 사용)
+    current_utc_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
 
-        # 디버깅용 로그
-        print(f"저장할 시간: {current_utc_time}")
+    # 사용 횟수 증가 및 마지막 사용 시간 업데이트는 버퍼에 모아 주기적으로 한 번에 기록
+    record_usage(id, current_utc_time)
 
-        # 사용 횟수 증가 및 마지막 사용 시간 업데이트
-        cursor.execute(
-            """
-            UPDATE prompts
-            SET use_count = use_count + 1, last_used_at = ?
-            WHERE id = ?
-        """,
-            (current_utc_time, id),
-        )
-
-        conn.commit()
-
-        return jsonify({"message": "프롬프트 사용 횟수가 증가되었습니다.", "id": id})
-
-    except Exception as e:
-        conn.rollback()
-        print(f"프롬프트 사용 기록 오류: {e}")
-        return jsonify({"error": str(e)}), 500
-
-    finally:
-        conn.close()
+    return jsonify({"message": "프롬프트 사용 횟수가 증가되었습니다.", "id": id})
 
 
 # 즐겨찾기 토글
 @prompt_bp.route("/api/prompts/<int:id>/favorite", methods=["POST"])
 def toggle_favorite(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # 프롬프트 존재 여부 및 현재 즐겨찾기 상태 확인
-        cursor.execute("SELECT id, is_favorite FROM prompts WHERE id = ?", (id,))
-        prompt = cursor.fetchone()
+        try:
+            # 프롬프트 존재 여부 및 현재 즐겨찾기 상태 확인
+            cursor.execute("SELECT id, is_favorite FROM prompts WHERE id = ?", (id,))
+            prompt = cursor.fetchone()
 
-        if not prompt:
-            conn.close()
-            return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
-
-        # 즐겨찾기 상태 토글
-        new_state = 0 if prompt["is_favorite"] else 1
+            if not prompt:
+                return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
 
-        cursor.execute(
-            """
-            UPDATE prompts
-            SET is_favorite = ?
-            WHERE id = ?
-        """,
-            (new_state, id),
-        )
+            # 즐겨찾기 상태 토글
+            new_state = 0 if prompt["is_favorite"] else 1
 
-        conn.commit()
+            cursor.execute(
+                """
+                UPDATE prompts
+                SET is_favorite = ?
+                WHERE id = ?
+            """,
+                (new_state, id),
+            )
 
-        return jsonify(
-            {
-                "message": "즐겨찾기 상태가 변경되었습니다.",
-                "id": id,
-                "is_favorite": new_state,
-            }
-        )
+            conn.commit()
+            catalog.refresh_prompts(conn, [id])
 
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": str(e)}), 500
+            return jsonify(
+                {
+                    "message": "즐겨찾기 상태가 변경되었습니다.",
+                    "id": id,
+                    "is_favorite": new_state,
+                }
+            )
 
-    finally:
-        conn.close()
+        except Exception as e:
+            conn.rollback()
+            return jsonify({"error": str(e)}), 500
 
 
 # 모든 프롬프트의 시간 필드 수정 (관리 도구)
 @prompt_bp.route("/api/prompts/fix-timestamps", methods=["POST"])
 def fix_timestamps():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    # 버퍼에 남은 사용 기록이 나중에 덮어쓰지 않도록 먼저 기록
+    flush_usage()
 
-    try:
-        # 현재 UTC 시간을 ISO 형식으로 가져오기
-        current_utc_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
-        print(f"기존 시간 데이터 업데이트: {current_utc_time}")
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-        # 마지막 사용 시간이 있는 모든 프롬프트 조회
-        cursor.execute("SELECT id FROM prompts WHERE last_used_at IS NOT NULL")
-        prompts = cursor.fetchall()
+        try:
+            # 현재 UTC 시간을 ISO 형식으로 가져오기
+            current_utc_time = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            print(f"기존 시간 데이터 업데이트: {current_utc_time}")
 
-        # 각 프롬프트의 last_used_at 필드 업데이트
-        for prompt in prompts:
-            cursor.execute(
-                """
-                UPDATE prompts
-                SET last_used_at = ?
-                WHERE id = ?
-            """,
-                (current_utc_time, prompt["id"]),
-            )
+            # 마지막 사용 시간이 있는 모든 프롬프트 조회
+            cursor.execute("SELECT id FROM prompts WHERE last_used_at IS NOT NULL")
+            prompts = cursor.fetchall()
 
-        conn.commit()
+            # 각 프롬프트의 last_used_at 필드 업데이트
+            for prompt in prompts:
+                cursor.execute(
+                    """
+                    UPDATE prompts
+                    SET last_used_at = ?
+                    WHERE id = ?
+                """,
+                    (current_utc_time, prompt["id"]),
+                )
 
-        updated_count = len(prompts)
-        return jsonify(
-            {
-                "message": f"{updated_count}개의 프롬프트 시간 정보가 업데이트되었습니다.",
-                "count": updated_count,
-            }
-        )
+            conn.commit()
+            catalog.refresh_prompts(conn, [prompt["id"] for prompt in prompts])
 
-    except Exception as e:
-        conn.rollback()
-        print(f"시간 데이터 수정 오류: {e}")
-        return jsonify({"error": str(e)}), 500
+            updated_count = len(prompts)
+            return jsonify(
+                {
+                    "message": f"{updated_count}개의 프롬프트 시간 정보가 업데이트되었습니다.",
+                    "count": updated_count,
+                }
+            )
 
-    finally:
-        conn.close()
+        except Exception as e:
+            conn.rollback()
+            print(f"시간 데이터 수정 오류: {e}")
+            return jsonify({"error": str(e)}), 500
 
 
 # 프롬프트 복제
 @prompt_bp.route("/api/prompts/<int:id>/duplicate", methods=["POST"])
 def duplicate_prompt(id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # 원본 프롬프트 정보 가져오기
-        cursor.execute(
-            """
-            SELECT title, content, folder_id, is_favorite
-            FROM prompts
-            WHERE id = ?
-        """,
-            (id,),
-        )
+        try:
+            # 원본 프롬프트 정보 가져오기
+            cursor.execute(
+                """
+                SELECT title, content, folder_id, is_favorite
+                FROM prompts
+                WHERE id = ?
+            """,
+                (id,),
+            )
 
-        prompt = cursor.fetchone()
-        if not prompt:
-            conn.close()
-            return jsonify({"error": "복제할 프롬프트를 찾을 수 없습니다."}), 404
+            prompt = cursor.fetchone()
+            if not prompt:
+                return jsonify({"error": "복제할 프롬프트를 찾을 수 없습니다."}), 404
 
-        # 제목에 '복사본' 추가
-        new_title = f"{prompt['title']} - 복사본"
+            # 제목에 '복사본' 추가
+            new_title = f"{prompt['title']} - 복사본"
 
-        # 트랜잭션 시작
-        conn.execute("BEGIN")
+            # 트랜잭션 시작
+            conn.execute("BEGIN IMMEDIATE")
 
-        # 새 프롬프트 생성
-        cursor.execute(
-            """
-            INSERT INTO prompts (title, content, folder_id, is_favorite)
-            VALUES (?, ?, ?, ?)
-        """,
-            (new_title, prompt["content"], prompt["folder_id"], prompt["is_favorite"]),
-        )
+            # 새 프롬프트 생성
+            cursor.execute(
+                """
+                INSERT INTO prompts (title, content, folder_id, is_favorite)
+                VALUES (?, ?, ?, ?)
+            """,
+                (
+                    new_title,
+                    prompt["content"],
+                    prompt["folder_id"],
+                    prompt["is_favorite"],
+                ),
+            )
 
-        new_prompt_id = cursor.lastrowid
+            new_prompt_id = cursor.lastrowid
 
-        # 원본 프롬프트의 태그 정보 복사
-        cursor.execute(
-            """
-            SELECT tag_id
-            FROM prompt_tags
-            WHERE prompt_id = ?
-        """,
-            (id,),
-        )
+            # 내용이 같으므로 원본의 중복 검사용 색인을 그대로 복사
+            copy_prompt_index(cursor, id, new_prompt_id)
 
-        tags = cursor.fetchall()
-        for tag in tags:
+            # 원본 프롬프트의 태그 정보 복사
             cursor.execute(
                 """
-                INSERT INTO prompt_tags (prompt_id, tag_id)
-                VALUES (?, ?)
+                SELECT tag_id
+                FROM prompt_tags
+                WHERE prompt_id = ?
             """,
-                (new_prompt_id, tag["tag_id"]),
+                (id,),
             )
 
-        # 원본 프롬프트의 변수 정보 복사
-        cursor.execute(
-            """
-            SELECT name, default_value
-            FROM variables
-            WHERE prompt_id = ?
-        """,
-            (id,),
-        )
+            tags = cursor.fetchall()
+            for tag in tags:
+                cursor.execute(
+                    """
+                    INSERT INTO prompt_tags (prompt_id, tag_id)
+                    VALUES (?, ?)
+                """,
+                    (new_prompt_id, tag["tag_id"]),
+                )
 
-        variables = cursor.fetchall()
-        for variable in variables:
+            # 원본 프롬프트의 변수 정보 복사
             cursor.execute(
                 """
-                INSERT INTO variables (prompt_id, name, default_value)
-                VALUES (?, ?, ?)
+                SELECT name, default_value
+                FROM variables
+                WHERE prompt_id = ?
             """,
-                (new_prompt_id, variable["name"], variable["default_value"]),
+                (id,),
             )
 
-        # 변경사항 저장
-        conn.commit()
+            variables = cursor.fetchall()
+            for variable in variables:
+                cursor.execute(
+                    """
+                    INSERT INTO variables (prompt_id, name, default_value)
+                    VALUES (?, ?, ?)
+                """,
+                    (new_prompt_id, variable["name"], variable["default_value"]),
+                )
+
+            # 변경사항 저장
+            conn.commit()
+            catalog.refresh_prompts(conn, [new_prompt_id])
 
-        # 새로 생성된 프롬프트 정보 반환
-        return get_prompt(new_prompt_id)
+        except Exception as e:
+            conn.rollback()
+            print(f"프롬프트 복제 오류: {e}")
+            return (
+                jsonify({"error": f"프롬프트 복제 중 오류가 발생했습니다: {str(e)}"}),
+                500,
+            )
 
-    except Exception as e:
-        conn.rollback()
-        print(f"프롬프트 복제 오류: {e}")
-        return (
-            jsonify({"error": f"프롬프트 복제 중 오류가 발생했습니다: {str(e)}"}),
-            500,
-        )
-    finally:
-        conn.close()
+    # 유사 프롬프트 목록과 임베딩 갱신은 백그라운드에서 처리
+    schedule_similarity_refresh()
+    schedule_embedding_refresh()
+
+    # 새로 생성된 프롬프트 정보 반환
+    return get_prompt(new_prompt_id)
 
 
 # 변수 기본값 업데이트
@@ -628,76 +853,74 @@ def update_variable_default_value(id, variable_name):
     if "default_value" not in data:
         return jsonify({"error": "기본값은 필수입니다."}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # 프롬프트 존재 여부 확인
-        cursor.execute("SELECT id FROM prompts WHERE id = ?", (id,))
-        if not cursor.fetchone():
-            conn.close()
-            return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
+        try:
+            # 프롬프트 존재 여부 확인
+            cursor.execute("SELECT id FROM prompts WHERE id = ?", (id,))
+            if not cursor.fetchone():
+                return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
 
-        # 변수 존재 여부 확인
-        cursor.execute(
-            """
-            SELECT id FROM variables 
-            WHERE prompt_id = ? AND name = ?
-            """,
-            (id, variable_name),
-        )
-        variable = cursor.fetchone()
-
-        # 트랜잭션 시작
-        conn.execute("BEGIN")
-
-        if variable:
-            # 기존 변수 업데이트 (updated_at 컬럼 참조 제거)
+            # 변수 존재 여부 확인
             cursor.execute(
                 """
-                UPDATE variables 
-                SET default_value = ?
-                WHERE id = ?
+                SELECT id FROM variables 
+                WHERE prompt_id = ? AND name = ?
                 """,
-                (data["default_value"], variable["id"]),
+                (id, variable_name),
             )
-        else:
-            # 변수가 없는 경우 새로 생성
+            variable = cursor.fetchone()
+
+            # 트랜잭션 시작
+            conn.execute("BEGIN IMMEDIATE")
+
+            if variable:
+                # 기존 변수 업데이트 (updated_at 컬럼 참조 제거)
+                cursor.execute(
+                    """
+                    UPDATE variables 
+                    SET default_value = ?
+                    WHERE id = ?
+                    """,
+                    (data["default_value"], variable["id"]),
+                )
+            else:
+                # 변수가 없는 경우 새로 생성
+                cursor.execute(
+                    """
+                    INSERT INTO variables (prompt_id, name, default_value)
+                    VALUES (?, ?, ?)
+                    """,
+                    (id, variable_name, data["default_value"]),
+                )
+
+            # 프롬프트의 업데이트 시간도 갱신
             cursor.execute(
                 """
-                INSERT INTO variables (prompt_id, name, default_value)
-                VALUES (?, ?, ?)
+                UPDATE prompts
+                SET updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
                 """,
-                (id, variable_name, data["default_value"]),
+                (id,),
             )
 
-        # 프롬프트의 업데이트 시간도 갱신
-        cursor.execute(
-            """
-            UPDATE prompts
-            SET updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-            """,
-            (id,),
-        )
-
-        # 변경사항 저장
-        conn.commit()
+            # 변경사항 저장
+            conn.commit()
+            catalog.refresh_prompts(conn, [id])
+
+        except Exception as e:
+            conn.rollback()
+            print(f"변수 기본값 업데이트 오류: {e}")
+            return (
+                jsonify(
+                    {"error": f"변수 기본값 업데이트 중 오류가 발생했습니다: {str(e)}"}
+                ),
+                500,
+            )
 
-        # 업데이트된 프롬프트 정보 반환
-        return get_prompt(id)
-
-    except Exception as e:
-        conn.rollback()
-        print(f"변수 기본값 업데이트 오류: {e}")
-        return (
-            jsonify(
-                {"error": f"변수 기본값 업데이트 중 오류가 발생했습니다: {str(e)}"}
-            ),
-            500,
-        )
-    finally:
-        conn.close()
+    # 업데이트된 프롬프트 정보 반환
+    return get_prompt(id)
 
 
 # 프롬프트 메모 업데이트
@@ -706,53 +929,43 @@ def update_prompt_memo(id):
     data = request.json
     memo = data.get("memo", "")
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
 
-    try:
-        # memo 컬럼이 존재하는지 확인
-        cursor.execute("PRAGMA table_info(prompts)")
-        columns = [column[1] for column in cursor.fetchall()]
-
-        if "memo" not in columns:
-            # memo 컬럼이 없으면 추가
-            cursor.execute("ALTER TABLE prompts ADD COLUMN memo TEXT")
-
-        # 프롬프트 메모 업데이트
-        cursor.execute(
-            """
-            UPDATE prompts SET memo = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-            """,
-            (memo, id),
-        )
+        try:
+            # 프롬프트 메모 업데이트 (memo 컬럼은 시작 시 스키마 마이그레이션에서 추가됨)
+            cursor.execute(
+                """
+                UPDATE prompts SET memo = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+                """,
+                (memo, id),
+            )
 
-        if cursor.rowcount == 0:
-            conn.close()
-            return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
+            if cursor.rowcount == 0:
+                return jsonify({"error": "프롬프트를 찾을 수 없습니다."}), 404
 
-        conn.commit()
+            conn.commit()
+            catalog.refresh_prompts(conn, [id])
 
-        # 업데이트된 프롬프트 정보 반환
-        cursor.execute(
-            """
-            SELECT id, title, content, folder_id, is_favorite, memo, updated_at
-            FROM prompts
-            WHERE id = ?
-            """,
-            (id,),
-        )
+            # 업데이트된 프롬프트 정보 반환
+            cursor.execute(
+                """
+                SELECT id, title, content, folder_id, is_favorite, memo, updated_at
+                FROM prompts
+                WHERE id = ?
+                """,
+                (id,),
+            )
 
-        updated_prompt = dict(cursor.fetchone())
-        conn.close()
+            updated_prompt = dict(cursor.fetchone())
 
-        return jsonify(updated_prompt)
+            return jsonify(updated_prompt)
 
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        print(f"메모 업데이트 오류: {e}")
-        return (
-            jsonify({"error": f"메모 업데이트 중 오류가 발생했습니다: {str(e)}"}),
-            500,
-        )
+        except Exception as e:
+            conn.rollback()
+            print(f"메모 업데이트 오류: {e}")
+            return (
+                jsonify({"error": f"메모 업데이트 중 오류가 발생했습니다: {str(e)}"}),
+                500,
+            )
@@ -1,8 +1,16 @@
 from flask import Blueprint, jsonify, request
-from db.database import get_db_connection
+from db.catalog import catalog, load_catalog
+from db.data_versions import renew_data_epoch
+from db.background import wait_for_tasks
+from db.database import get_db, backup_database_to, restore_database_from, migrate_schema, DB_PATH
+from db.embeddings import schedule_embedding_refresh
+from db.hydration import IN_BATCH_SIZE, hydrate_prompts
+from db.json_stream import JSONArrayStream, stream_json_response
+from db.near_duplicates import find_similar_content, index_prompt_content
+from db.similarity import schedule_similarity_refresh
+from db.usage_buffer import flush_usage
 import os
 import json
-import shutil
 import datetime
 
 settings_bp = Blueprint('settings', __name__)
@@ -10,59 +18,56 @@ settings_bp = Blueprint('settings', __name__)
 # 앱 설정 가져오기
 @settings_bp.route('/api/settings', methods=['GET'])
 def get_settings():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute('SELECT * FROM settings WHERE id = 1')
-    settings = cursor.fetchone()
-    
-    if not settings:
-        # 기본 설정 생성
-        cursor.execute(
-            'INSERT INTO settings (theme, backup_path, auto_backup, backup_interval) VALUES (?, ?, ?, ?)',
-            ('light', None, 0, 7)
-        )
-        conn.commit()
-        
         cursor.execute('SELECT * FROM settings WHERE id = 1')
         settings = cursor.fetchone()
     
-    conn.close()
-    return jsonify(dict(settings))
+        if not settings:
+            # 기본 설정 생성
+            cursor.execute(
+                'INSERT INTO settings (theme, backup_path, auto_backup, backup_interval) VALUES (?, ?, ?, ?)',
+                ('light', None, 0, 7)
+            )
+            conn.commit()
+        
+            cursor.execute('SELECT * FROM settings WHERE id = 1')
+            settings = cursor.fetchone()
+    
+        return jsonify(dict(settings))
 
 # 앱 설정 업데이트
 @settings_bp.route('/api/settings', methods=['PUT'])
 def update_settings():
     data = request.json
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
     
-    try:
-        cursor.execute('''
-            UPDATE settings
-            SET theme = ?, backup_path = ?, auto_backup = ?, backup_interval = ?
-            WHERE id = 1
-        ''', (
-            data.get('theme', 'light'),
-            data.get('backup_path'),
-            1 if data.get('auto_backup') else 0,
-            data.get('backup_interval', 7)
-        ))
+        try:
+            cursor.execute('''
+                UPDATE settings
+                SET theme = ?, backup_path = ?, auto_backup = ?, backup_interval = ?
+                WHERE id = 1
+            ''', (
+                data.get('theme', 'light'),
+                data.get('backup_path'),
+                1 if data.get('auto_backup') else 0,
+                data.get('backup_interval', 7)
+            ))
         
-        conn.commit()
+            conn.commit()
         
-        # 업데이트된 설정 반환
-        cursor.execute('SELECT * FROM settings WHERE id = 1')
-        updated_settings = dict(cursor.fetchone())
+            # 업데이트된 설정 반환
+            cursor.execute('SELECT * FROM settings WHERE id = 1')
+            updated_settings = dict(cursor.fetchone())
         
-        conn.close()
-        return jsonify(updated_settings)
+            return jsonify(updated_settings)
     
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        return jsonify({"error": str(e)}), 500
+        except Exception as e:
+            conn.rollback()
+            return jsonify({"error": str(e)}), 500
 
 # 데이터베이스 백업
 @settings_bp.route('/api/backup', methods=['POST'])
@@ -81,9 +86,11 @@ def backup_database():
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_file = os.path.join(backup_path, f'prompt_manager_backup_{timestamp}.db')
         
-        # 데이터베이스 파일 복사
-        from db.database import DB_PATH
-        shutil.copy2(DB_PATH, backup_file)
+        # 버퍼에 모아 둔 사용 기록까지 백업되도록 먼저 기록
+        flush_usage()
+        
+        # WAL 모드에서는 파일 복사만으로 최신 내용이 보장되지 않으므로 백업 API 사용
+        backup_database_to(backup_file)
         
         return jsonify({
             "message": "데이터베이스가 성공적으로 백업되었습니다.",
@@ -107,13 +114,22 @@ def restore_database():
     
     try:
         # 현재 데이터베이스 백업
-        from db.database import DB_PATH
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_file = f'{DB_PATH}.bak_{timestamp}'
-        shutil.copy2(DB_PATH, backup_file)
+        # 버퍼의 사용 기록은 복원 전 데이터베이스에 기록해 백업에 남김
+        flush_usage()
+        backup_database_to(backup_file)
         
-        # 복원 파일로 대체
-        shutil.copy2(restore_file, DB_PATH)
+        # 예약된 백그라운드 작업이 이전 데이터로 계산한 결과를 복원한 데이터에 쓰지 않도록 먼저 마침
+        wait_for_tasks()
+        # 파일을 바꾸지 않고 백업 API로 복원 (빌려 간 연결이 있어도 안전)
+        restore_database_from(restore_file)
+        
+        # 이전 버전에서 만든 백업이라면 현재 스키마로 마이그레이션
+        migrate_schema()
+        load_catalog()
+        # 복원한 파일의 데이터 버전은 이전 값으로 돌아갈 수 있으므로 발급한 ETag를 무효화
+        renew_data_epoch()
         
         return jsonify({
             "message": "데이터베이스가 성공적으로 복원되었습니다.",
@@ -126,62 +142,67 @@ def restore_database():
 # 프롬프트 내보내기
 @settings_bp.route('/api/export', methods=['GET'])
 def export_prompts():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    # 버퍼에 모아 둔 사용 기록까지 내보내지도록 먼저 기록
+    flush_usage()
     
-    try:
-        # 모든 데이터 수집
-        # 1. 폴더
-        cursor.execute('SELECT * FROM folders')
-        folders = [dict(row) for row in cursor.fetchall()]
-        
-        # 2. 태그
-        cursor.execute('SELECT * FROM tags')
-        tags = [dict(row) for row in cursor.fetchall()]
+    with get_db() as conn:
+        cursor = conn.cursor()
+    
+        try:
+            # 모든 데이터 수집
+            # 1. 폴더
+            cursor.execute('SELECT * FROM folders')
+            folders = [dict(row) for row in cursor.fetchall()]
         
-        # 3. 프롬프트와 관련 데이터
-        cursor.execute('SELECT * FROM prompts')
-        prompts = []
+            # 2. 태그
+            cursor.execute('SELECT * FROM tags')
+            tags = [dict(row) for row in cursor.fetchall()]
         
-        for row in cursor.fetchall():
-            prompt = dict(row)
-            
-            # 프롬프트에 연결된 태그
-            cursor.execute('''
-                SELECT t.id, t.name, t.color
-                FROM tags t
-                JOIN prompt_tags pt ON t.id = pt.tag_id
-                WHERE pt.prompt_id = ?
-            ''', (prompt['id'],))
-            
-            prompt['tags'] = [dict(tag) for tag in cursor.fetchall()]
-            
-            # 프롬프트에 포함된 변수
-            cursor.execute('''
-                SELECT id, name, default_value
-                FROM variables
-                WHERE prompt_id = ?
-            ''', (prompt['id'],))
-            
-            prompt['variables'] = [dict(variable) for variable in cursor.fetchall()]
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+    
+    # 3. 프롬프트는 전체 목록을 만들지 않고 읽는 대로 스트리밍
+    # 내보내기 데이터 구성
+    export_data = {
+        'version': '1.0',
+        'timestamp': datetime.datetime.now().isoformat(),
+        'folders': folders,
+        'tags': tags,
+        'prompts': JSONArrayStream(_iter_export_prompts())
+    }
+    
+    return stream_json_response(export_data)
+
+# 내보내기 파일에 쓰는 프롬프트 컬럼 (hot_score 같은 내부 컬럼은 가져오기 형식에 없음)
+EXPORT_PROMPT_COLUMNS = 'id, title, content, folder_id, created_at, updated_at, is_favorite, use_count, last_used_at, memo'
+
+def _iter_export_prompts():
+    """프롬프트를 ID 순으로 IN_BATCH_SIZE개씩 읽어 태그와 변수를 채운 뒤 하나씩 반환합니다.
+    
+    배치마다 연결을 빌렸다가 돌려주므로, 응답을 느리게 받는 클라이언트가 풀의 연결과
+    WAL 읽기 스냅샷을 응답이 끝날 때까지 붙잡지 않습니다. (stream_prompts와 같은 방식)
+    """
+    last_id = 0
+    while True:
+        with get_db() as conn:
+            cursor = conn.execute(
+                f'SELECT {EXPORT_PROMPT_COLUMNS} FROM prompts WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, IN_BATCH_SIZE)
+            )
+            prompts = [dict(row) for row in cursor.fetchall()]
+            if not prompts:
+                break
             
-            prompts.append(prompt)
-        
-        # 내보내기 데이터 구성
-        export_data = {
-            'version': '1.0',
-            'timestamp': datetime.datetime.now().isoformat(),
-            'folders': folders,
-            'tags': tags,
-            'prompts': prompts
-        }
+            # 프롬프트에 연결된 태그와 변수를 일괄 조회로 채움
+            hydrate_prompts(conn, prompts)
         
-        conn.close()
-        return jsonify(export_data)
-    
-    except Exception as e:
-        conn.close()
-        return jsonify({"error": str(e)}), 500
+        last_id = prompts[-1]['id']
+        yield from prompts
+
+def _row_exists(cursor, table, row_id):
+    """주어진 테이블에 해당 ID의 행이 있는지 확인합니다."""
+    cursor.execute(f'SELECT 1 FROM {table} WHERE id = ?', (row_id,))
+    return cursor.fetchone() is not None
 
 # 프롬프트 가져오기
 @settings_bp.route('/api/import', methods=['POST'])
@@ -194,117 +215,143 @@ def import_prompts():
     if 'version' not in data:
         return jsonify({"error": "유효하지 않은 가져오기 파일 형식입니다."}), 400
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_db() as conn:
+        cursor = conn.cursor()
     
-    try:
-        conn.execute('BEGIN')
+        try:
+            # 조회 후 쓰기를 하므로 쓰기 잠금을 먼저 잡아, 그사이 백그라운드 작업이
+            # 기록해 트랜잭션을 이어 가지 못하는(database is locked) 경우를 막음
+            conn.execute('BEGIN IMMEDIATE')
         
-        # 1. 폴더 가져오기
-        if 'folders' in data:
-            for folder in data['folders']:
-                # 이미 존재하는 폴더인지 확인
-                cursor.execute('SELECT id FROM folders WHERE name = ?', (folder['name'],))
-                existing = cursor.fetchone()
+            # 1. 폴더 가져오기
+            if 'folders' in data:
+                for folder in data['folders']:
+                    # 이미 존재하는 폴더인지 확인
+                    cursor.execute('SELECT id FROM folders WHERE name = ?', (folder['name'],))
+                    existing = cursor.fetchone()
                 
-                if not existing:
-                    cursor.execute(
-                        'INSERT INTO folders (name, parent_id) VALUES (?, ?)',
-                        (folder['name'], folder.get('parent_id'))
-                    )
+                    if not existing:
+                        # 외래 키 제약을 위반하지 않도록 존재하는 부모 폴더만 연결
+                        parent_id = folder.get('parent_id')
+                        if parent_id is not None and not _row_exists(cursor, 'folders', parent_id):
+                            parent_id = None
+                        
+                        cursor.execute(
+                            'INSERT INTO folders (name, parent_id) VALUES (?, ?)',
+                            (folder['name'], parent_id)
+                        )
         
-        # 2. 태그 가져오기
-        if 'tags' in data:
-            for tag in data['tags']:
-                # 이미 존재하는 태그인지 확인
-                cursor.execute('SELECT id FROM tags WHERE name = ?', (tag['name'],))
-                existing = cursor.fetchone()
+            # 2. 태그 가져오기
+            if 'tags' in data:
+                for tag in data['tags']:
+                    # 이미 존재하는 태그인지 확인
+                    cursor.execute('SELECT id FROM tags WHERE name = ?', (tag['name'],))
+                    existing = cursor.fetchone()
                 
-                if not existing:
-                    cursor.execute(
-                        'INSERT INTO tags (name, color) VALUES (?, ?)',
-                        (tag['name'], tag.get('color', 'blue'))
-                    )
+                    if not existing:
+                        cursor.execute(
+                            'INSERT INTO tags (name, color) VALUES (?, ?)',
+                            (tag['name'], tag.get('color', 'blue'))
+                        )
         
-        # 3. 프롬프트 가져오기
-        imported_count = 0
+            # 3. 프롬프트 가져오기
+            imported_count = 0
+            duplicate_warnings = []
         
-        if 'prompts' in data:
-            for prompt in data['prompts']:
-                # 폴더 이름으로 ID 조회
-                folder_id = None
-                if 'folder_name' in prompt:
-                    cursor.execute('SELECT id FROM folders WHERE name = ?', (prompt['folder_name'],))
-                    folder_result = cursor.fetchone()
-                    if folder_result:
-                        folder_id = folder_result['id']
-                elif 'folder_id' in prompt:
-                    folder_id = prompt['folder_id']
+            if 'prompts' in data:
+                for prompt in data['prompts']:
+                    # 폴더 이름으로 ID 조회
+                    folder_id = None
+                    if 'folder_name' in prompt:
+                        cursor.execute('SELECT id FROM folders WHERE name = ?', (prompt['folder_name'],))
+                        folder_result = cursor.fetchone()
+                        if folder_result:
+                            folder_id = folder_result['id']
+                    elif 'folder_id' in prompt and _row_exists(cursor, 'folders', prompt['folder_id']):
+                        folder_id = prompt['folder_id']
                 
-                # 프롬프트 추가
-                cursor.execute('''
-                    INSERT INTO prompts (title, content, folder_id, is_favorite)
-                    VALUES (?, ?, ?, ?)
-                ''', (
-                    prompt['title'],
-                    prompt['content'],
-                    folder_id,
-                    prompt.get('is_favorite', 0)
-                ))
+                    # 내용이 거의 같은 프롬프트가 이미 있으면 경고 (가져오기는 그대로 진행)
+                    duplicates = find_similar_content(cursor, prompt['content'])
+                    if duplicates:
+                        duplicate_warnings.append({
+                            'title': prompt['title'],
+                            'duplicates': duplicates
+                        })
                 
-                prompt_id = cursor.lastrowid
-                imported_count += 1
+                    # 프롬프트 추가
+                    cursor.execute('''
+                        INSERT INTO prompts (title, content, folder_id, is_favorite)
+                        VALUES (?, ?, ?, ?)
+                    ''', (
+                        prompt['title'],
+                        prompt['content'],
+                        folder_id,
+                        prompt.get('is_favorite', 0)
+                    ))
                 
-                # 태그 연결
-                if 'tags' in prompt:
-                    for tag in prompt['tags']:
-                        tag_id = None
+                    prompt_id = cursor.lastrowid
+                    imported_count += 1
+                    index_prompt_content(cursor, prompt_id, prompt['content'])
+                
+                    # 태그 연결
+                    if 'tags' in prompt:
+                        for tag in prompt['tags']:
+                            tag_id = None
                         
-                        if 'id' in tag:
-                            tag_id = tag['id']
-                        else:
-                            # 태그 이름으로 ID 조회
-                            cursor.execute('SELECT id FROM tags WHERE name = ?', (tag['name'],))
-                            tag_result = cursor.fetchone()
-                            
-                            if tag_result:
-                                tag_id = tag_result['id']
+                            if 'id' in tag and _row_exists(cursor, 'tags', tag['id']):
+                                tag_id = tag['id']
                             else:
-                                # 새 태그 생성
+                                # 태그 이름으로 ID 조회
+                                cursor.execute('SELECT id FROM tags WHERE name = ?', (tag['name'],))
+                                tag_result = cursor.fetchone()
+                            
+                                if tag_result:
+                                    tag_id = tag_result['id']
+                                else:
+                                    # 새 태그 생성
+                                    cursor.execute(
+                                        'INSERT INTO tags (name, color) VALUES (?, ?)',
+                                        (tag['name'], tag.get('color', 'blue'))
+                                    )
+                                    tag_id = cursor.lastrowid
+                        
+                            # 프롬프트-태그 연결
+                            if tag_id:
                                 cursor.execute(
-                                    'INSERT INTO tags (name, color) VALUES (?, ?)',
-                                    (tag['name'], tag.get('color', 'blue'))
+                                    'INSERT INTO prompt_tags (prompt_id, tag_id) VALUES (?, ?)',
+                                    (prompt_id, tag_id)
                                 )
-                                tag_id = cursor.lastrowid
-                        
-                        # 프롬프트-태그 연결
-                        if tag_id:
-                            cursor.execute(
-                                'INSERT INTO prompt_tags (prompt_id, tag_id) VALUES (?, ?)',
-                                (prompt_id, tag_id)
-                            )
                 
-                # 변수 추가
-                if 'variables' in prompt:
-                    for variable in prompt['variables']:
-                        cursor.execute(
-                            'INSERT INTO variables (prompt_id, name, default_value) VALUES (?, ?, ?)',
-                            (
-                                prompt_id,
-                                variable['name'],
-                                variable.get('default_value', '')
+                    # 변수 추가
+                    if 'variables' in prompt:
+                        for variable in prompt['variables']:
+                            cursor.execute(
+                                'INSERT INTO variables (prompt_id, name, default_value) VALUES (?, ?, ?)',
+                                (
+                                    prompt_id,
+                                    variable['name'],
+                                    variable.get('default_value', '')
+                                )
                             )
-                        )
         
-        conn.commit()
-        conn.close()
+            conn.commit()
+            # 폴더, 태그, 프롬프트가 함께 추가되므로 카탈로그를 다시 읽음
+            catalog.load(conn)
         
-        return jsonify({
-            "message": "데이터 가져오기가 완료되었습니다.",
-            "imported_count": imported_count
-        })
+            # 가져온 프롬프트의 유사 프롬프트 목록과 임베딩은 백그라운드에서 갱신
+            schedule_similarity_refresh()
+            schedule_embedding_refresh()
+        
+            result = {
+                "message": "데이터 가져오기가 완료되었습니다.",
+                "imported_count": imported_count
+            }
+            if duplicate_warnings:
+                result["warning"] = "비슷한 내용의 프롬프트가 이미 있는 항목이 있습니다."
+                result["duplicates"] = duplicate_warnings
+        
+            return jsonify(result)
     
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        except Exception as e:
+            conn.rollback()
+            return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,56 @@
+from flask import Blueprint, jsonify, request
+from db.database import get_db, get_pool_stats
+from db.response_cache import get_response_cache_stats
+from db.usage_stats import parse_usage_args, usage_series
+
+stats_bp = Blueprint("stats", __name__)
+
+# 통계 대상 파라미터별 (테이블, 없을 때 오류 메시지)
+USAGE_TARGETS = {
+    "prompt_id": ("prompts", "프롬프트를 찾을 수 없습니다."),
+    "folder_id": ("folders", "폴더를 찾을 수 없습니다."),
+    "tag_id": ("tags", "태그를 찾을 수 없습니다."),
+}
+
+
+# 데이터베이스 연결 풀 통계
+@stats_bp.route("/api/stats/pool", methods=["GET"])
+def get_db_pool_stats():
+    return jsonify(get_pool_stats())
+
+
+# 조회 API 응답 캐시 통계 (적중/실패, 무효화, 크기)
+@stats_bp.route("/api/stats/response-cache", methods=["GET"])
+def response_cache_stats():
+    return jsonify(get_response_cache_stats())
+
+
+# 프롬프트/폴더/태그별 사용량 시계열 (집계 테이블 기준)
+@stats_bp.route("/api/stats/usage", methods=["GET"])
+def get_usage_stats():
+    try:
+        query = parse_usage_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with get_db() as conn:
+        if query["target"] is not None:
+            name, target_id = query["target"]
+            table, message = USAGE_TARGETS[name]
+            row = conn.execute(
+                f"SELECT id FROM {table} WHERE id = ?", (target_id,)
+            ).fetchone()
+            if not row:
+                return jsonify({"error": message}), 404
+
+        series = usage_series(conn, query)
+
+    return jsonify(
+        {
+            "granularity": query["granularity"],
+            "start": series[0]["bucket"],
+            "end": series[-1]["bucket"],
+            "total": sum(point["count"] for point in series),
+            "series": series,
+        }
+    )
@@ -0,0 +1,68 @@
+"""요청 처리와 분리해 백그라운드 스레드에서 실행하는 데이터베이스 작업"""
+
+import queue
+import threading
+
+from db.database import get_db
+
+
+class BackgroundWorker:
+    """키가 같은 작업을 합쳐 하나의 데몬 스레드에서 순서대로 실행합니다.
+
+    작업 함수는 풀에서 빌린 연결을 첫 번째 인자로 받습니다.
+    """
+
+    def __init__(self, name="db-background"):
+        self.name = name
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, key, func, *args):
+        """작업을 예약합니다. 같은 키의 작업이 이미 대기 중이면 False를 반환합니다."""
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+
+        self._queue.put((key, func, args))
+        return True
+
+    def join(self):
+        """대기 중인 작업이 모두 끝날 때까지 기다립니다."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            key, func, args = self._queue.get()
+            # 실행 중에 들어온 같은 키의 요청은 다시 예약될 수 있도록 먼저 해제
+            with self._lock:
+                self._pending.discard(key)
+
+            try:
+                with get_db() as conn:
+                    func(conn, *args)
+            except Exception as e:
+                print(f"백그라운드 작업 오류 ({key}): {str(e)}")
+            finally:
+                self._queue.task_done()
+
+
+_worker = BackgroundWorker()
+
+
+def submit_task(key, func, *args):
+    """기본 백그라운드 작업자에 작업을 예약합니다."""
+    return _worker.submit(key, func, *args)
+
+
+def wait_for_tasks():
+    """기본 백그라운드 작업자의 대기 작업이 모두 끝날 때까지 기다립니다."""
+    _worker.join()
@@ -0,0 +1,614 @@
+"""프로세스 전체에서 공유하는 메모리 내 프롬프트 메타데이터 카탈로그
+
+목록 API는 요청마다 prompts/folders/prompt_tags를 조인하고 행을 dict로 바꾸는 대신,
+시작 시 한 번 읽어 둔 카탈로그에서 필터·정렬·개수 계산·키셋 페이지네이션을 처리하고
+응답에 들어갈 범위의 내용(content, memo)과 변수만 데이터베이스에서 읽습니다.
+
+프롬프트마다 __slots__ 레코드 하나(ID, 제목, 폴더, 태그 ID, 즐겨찾기, 사용 횟수,
+시간 필드)를 두고, 정렬 기준별 (정렬 키, ID) 순서 목록은 처음 필요할 때 만들어
+레코드가 바뀔 때까지 재사용합니다.
+
+레코드마다 빈틈없이 매긴 순번(ordinal)을 두고, 태그마다 그 태그를 가진 프롬프트의
+순번 비트를 켠 파이썬 정수 비트셋을 유지합니다. 태그 필터와 태그 식
+(db.tag_expression)은 비트셋의 AND/OR/NOT으로, 개수는 bit_count()로 계산하므로
+프롬프트 수가 많아도 태그별로 정수 연산 몇 번이면 됩니다.
+
+쓰기 API는 커밋 뒤 refresh_prompts(바뀐 프롬프트), reload_folders, reload_tags로
+바뀐 부분만 다시 읽어 제자리에서 갱신합니다. 다시 읽기는 카탈로그 잠금 안에서
+하므로 여러 요청이 동시에 갱신해도 나중에 읽은 값이 남습니다.
+"""
+
+import bisect
+import threading
+
+from db.database import get_db
+from db.hydration import batched, fetch_variables_by_prompt
+from db.projection import PROMPT_LIST_FIELDS, projection_sql
+from db.tag_expression import evaluate_tag_expression
+
+# 레코드 필드 -> 정렬 키. SQL 정렬(prompt_query.SORT_FIELDS)과 같은 순서가 되도록
+# last_used_at의 NULL은 빈 문자열로 취급합니다.
+SORT_KEYS = {
+    "updated_at": lambda record: record.updated_at,
+    "created_at": lambda record: record.created_at,
+    "use_count": lambda record: record.use_count,
+    "last_used_at": lambda record: record.last_used_at or "",
+    "title": lambda record: record.title,
+}
+
+_RECORD_QUERY = """
+    SELECT p.id, p.title, p.folder_id, p.is_favorite, p.use_count,
+           p.last_used_at, p.created_at, p.updated_at,
+           GROUP_CONCAT(pt.tag_id) AS tag_ids
+    FROM prompts p
+    LEFT JOIN prompt_tags pt ON pt.prompt_id = p.id
+"""
+
+
+def _bits_from_ordinals(ordinals, size):
+    """순번 목록으로 비트셋을 만듭니다. (1 << n을 반복해 OR하는 것보다 빠름)"""
+    buffer = bytearray(size // 8 + 1)
+    for ordinal in ordinals:
+        buffer[ordinal >> 3] |= 1 << (ordinal & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _set_bits(bits):
+    """비트셋에서 켜진 비트의 위치를 오름차순으로 반환합니다."""
+    # 이진 문자열을 뒤집어 0번 비트부터 1을 찾음
+    digits = bin(bits)[:1:-1]
+    positions = []
+    position = digits.find("1")
+    while position >= 0:
+        positions.append(position)
+        position = digits.find("1", position + 1)
+    return positions
+
+
+# 카탈로그 레코드에서 바로 채우는 응답 필드 (나머지는 데이터베이스에서 읽음)
+_RECORD_FIELDS = (
+    "id",
+    "title",
+    "folder_id",
+    "created_at",
+    "updated_at",
+    "is_favorite",
+    "use_count",
+    "last_used_at",
+)
+
+
+class PromptRecord:
+    """카탈로그의 프롬프트 한 건 (내용과 메모는 담지 않음)"""
+
+    __slots__ = (
+        "id",
+        "title",
+        "folder_id",
+        "tag_ids",
+        "is_favorite",
+        "use_count",
+        "last_used_at",
+        "created_at",
+        "updated_at",
+        "ordinal",
+    )
+
+    def __init__(self, row):
+        self.id = row["id"]
+        self.title = row["title"]
+        self.folder_id = row["folder_id"]
+        # hydration과 같은 태그 순서(태그 ID 오름차순)
+        self.tag_ids = (
+            tuple(sorted(int(tag_id) for tag_id in row["tag_ids"].split(",")))
+            if row["tag_ids"]
+            else ()
+        )
+        self.is_favorite = row["is_favorite"]
+        self.use_count = row["use_count"]
+        self.last_used_at = row["last_used_at"]
+        self.created_at = row["created_at"]
+        self.updated_at = row["updated_at"]
+        self.ordinal = None
+
+
+class PromptCatalog:
+    """프롬프트 레코드, 폴더(이름, 상위 폴더), 태그를 메모리에 유지합니다."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._records = None
+        self._folders = {}
+        self._folders_bottom_up = []
+        self._tags = {}
+        self._tag_names = {}
+        # 정렬 기준 -> 오름차순 [(정렬 키, ID), ...]
+        self._orders = {}
+        # 순번 -> 프롬프트 ID (삭제된 순번은 None, 다음 추가 때 재사용)
+        self._ordinal_ids = []
+        self._free_ordinals = []
+        # 모든 프롬프트 / 즐겨찾기 / 사용한 프롬프트 / 폴더 ID별(미분류는 None) /
+        # 태그 ID별 비트셋
+        self._live_bits = 0
+        self._favorite_bits = 0
+        self._used_bits = 0
+        self._folder_bits = {}
+        self._tag_bits = {}
+        # 내용이 바뀔 때마다 올리는 값 (목록 API의 ETag에 포함)
+        self.version = 0
+
+    def load(self, conn):
+        """데이터베이스에서 카탈로그 전체를 다시 읽습니다."""
+        with self._lock:
+            records = [
+                PromptRecord(row)
+                for row in conn.execute(_RECORD_QUERY + " GROUP BY p.id ORDER BY p.id")
+            ]
+            self._records = {record.id: record for record in records}
+            self._orders = {}
+
+            # ID 순서로 순번을 매기고 폴더/태그별 비트셋을 한 번에 만듦
+            ordinals_by_folder = {}
+            ordinals_by_tag = {}
+            for ordinal, record in enumerate(records):
+                record.ordinal = ordinal
+                ordinals_by_folder.setdefault(record.folder_id, []).append(ordinal)
+                for tag_id in record.tag_ids:
+                    ordinals_by_tag.setdefault(tag_id, []).append(ordinal)
+            self._ordinal_ids = [record.id for record in records]
+            self._free_ordinals = []
+            self._live_bits = _bits_from_ordinals(range(len(records)), len(records))
+            self._favorite_bits = _bits_from_ordinals(
+                (record.ordinal for record in records if record.is_favorite),
+                len(records),
+            )
+            self._used_bits = _bits_from_ordinals(
+                (record.ordinal for record in records if record.use_count),
+                len(records),
+            )
+            self._folder_bits = {
+                folder_id: _bits_from_ordinals(ordinals, len(records))
+                for folder_id, ordinals in ordinals_by_folder.items()
+            }
+            self._tag_bits = {
+                tag_id: _bits_from_ordinals(ordinals, len(records))
+                for tag_id, ordinals in ordinals_by_tag.items()
+            }
+
+            self._load_folders(conn)
+            self._load_tags(conn)
+        return len(self._records)
+
+    def _ensure_loaded(self):
+        if self._records is None:
+            with get_db() as conn:
+                self.load(conn)
+
+    def _load_folders(self, conn):
+        self._folders = {
+            row["id"]: (row["name"], row["parent_id"])
+            for row in conn.execute("SELECT id, name, parent_id FROM folders")
+        }
+        self.version += 1
+
+        # 하위 폴더가 상위 폴더보다 먼저 오는 순서 (하위 폴더 포함 개수 합산용)
+        children = {}
+        for folder_id, (_, parent_id) in self._folders.items():
+            children.setdefault(parent_id, []).append(folder_id)
+        order = []
+        stack = list(children.get(None, ()))
+        while stack:
+            folder_id = stack.pop()
+            order.append(folder_id)
+            stack.extend(children.get(folder_id, ()))
+        self._folders_bottom_up = order[::-1]
+
+    def _load_tags(self, conn):
+        self._tags = {
+            row["id"]: {"id": row["id"], "name": row["name"], "color": row["color"]}
+            for row in conn.execute("SELECT id, name, color FROM tags")
+        }
+        self._tag_names = {tag["name"]: tag_id for tag_id, tag in self._tags.items()}
+        self.version += 1
+
+    def _put_record(self, record):
+        """레코드를 추가하거나 바꾸고 비트셋을 갱신합니다."""
+        old = self._records.get(record.id)
+        if old is None:
+            if self._free_ordinals:
+                record.ordinal = self._free_ordinals.pop()
+                self._ordinal_ids[record.ordinal] = record.id
+            else:
+                record.ordinal = len(self._ordinal_ids)
+                self._ordinal_ids.append(record.id)
+            self._live_bits |= 1 << record.ordinal
+            old_tag_ids = ()
+        else:
+            record.ordinal = old.ordinal
+            old_tag_ids = old.tag_ids
+
+        bit = 1 << record.ordinal
+        if old is not None and old.folder_id != record.folder_id:
+            self._folder_bits[old.folder_id] &= ~bit
+        if old is None or old.folder_id != record.folder_id:
+            self._folder_bits[record.folder_id] = (
+                self._folder_bits.get(record.folder_id, 0) | bit
+            )
+        if record.is_favorite:
+            self._favorite_bits |= bit
+        else:
+            self._favorite_bits &= ~bit
+        if record.use_count:
+            self._used_bits |= bit
+        else:
+            self._used_bits &= ~bit
+        for tag_id in set(old_tag_ids) - set(record.tag_ids):
+            self._tag_bits[tag_id] &= ~bit
+        for tag_id in set(record.tag_ids) - set(old_tag_ids):
+            self._tag_bits[tag_id] = self._tag_bits.get(tag_id, 0) | bit
+        self._records[record.id] = record
+
+    def _remove_record(self, prompt_id):
+        """레코드를 지우고 순번을 다음 추가에 쓰도록 돌려놓습니다."""
+        record = self._records.pop(prompt_id, None)
+        if record is None:
+            return
+
+        bit = 1 << record.ordinal
+        for tag_id in record.tag_ids:
+            self._tag_bits[tag_id] &= ~bit
+        self._live_bits &= ~bit
+        self._favorite_bits &= ~bit
+        self._used_bits &= ~bit
+        self._folder_bits[record.folder_id] &= ~bit
+        self._ordinal_ids[record.ordinal] = None
+        self._free_ordinals.append(record.ordinal)
+
+    def refresh_prompts(self, conn, prompt_ids):
+        """prompt_ids의 레코드를 데이터베이스에서 다시 읽습니다. 없어진 프롬프트는 제거합니다."""
+        prompt_ids = list(prompt_ids)
+        with self._lock:
+            if self._records is None:
+                self.load(conn)
+                return
+
+            for batch in batched(prompt_ids):
+                placeholders = ", ".join(["?"] * len(batch))
+                rows = {
+                    row["id"]: row
+                    for row in conn.execute(
+                        _RECORD_QUERY
+                        + f" WHERE p.id IN ({placeholders}) GROUP BY p.id",
+                        batch,
+                    )
+                }
+                for prompt_id in batch:
+                    if prompt_id in rows:
+                        self._put_record(PromptRecord(rows[prompt_id]))
+                    else:
+                        self._remove_record(prompt_id)
+            self._orders = {}
+            self.version += 1
+
+            # 프롬프트 저장 중 새로 만든 태그
+            if any(
+                tag_id not in self._tags
+                for prompt_id in prompt_ids
+                if prompt_id in self._records
+                for tag_id in self._records[prompt_id].tag_ids
+            ):
+                self._load_tags(conn)
+
+    def reload_folders(self, conn):
+        """폴더 이름과 계층을 다시 읽습니다."""
+        with self._lock:
+            if self._records is None:
+                self.load(conn)
+            else:
+                self._load_folders(conn)
+
+    def reload_tags(self, conn):
+        """태그를 다시 읽고 삭제된 태그를 레코드에서 뺍니다."""
+        with self._lock:
+            if self._records is None:
+                self.load(conn)
+                return
+
+            self._load_tags(conn)
+            for tag_id in [
+                tag_id for tag_id in self._tag_bits if tag_id not in self._tags
+            ]:
+                # 삭제된 태그: 그 태그를 가진 프롬프트의 레코드에서만 뺌
+                for ordinal in _set_bits(self._tag_bits.pop(tag_id)):
+                    record = self._records[self._ordinal_ids[ordinal]]
+                    record.tag_ids = tuple(
+                        other for other in record.tag_ids if other != tag_id
+                    )
+
+    def _order(self, sort):
+        order = self._orders.get(sort)
+        if order is None:
+            key = SORT_KEYS[sort]
+            order = sorted(
+                (key(record), record.id) for record in self._records.values()
+            )
+            self._orders[sort] = order
+        return order
+
+    def _descendants(self, folder_id):
+        children = {}
+        for child_id, (_, parent_id) in self._folders.items():
+            children.setdefault(parent_id, []).append(child_id)
+
+        found = {folder_id}
+        stack = [folder_id]
+        while stack:
+            for child_id in children.get(stack.pop(), ()):
+                if child_id not in found:
+                    found.add(child_id)
+                    stack.append(child_id)
+        return found
+
+    def _tag_name_bits(self, name):
+        # 없는 태그 이름은 없는 tag_ids처럼 빈 집합으로 취급 (SQL 조건과 같음)
+        return self._tag_bits.get(self._tag_names.get(name), 0)
+
+    def _match_bits(self, filters):
+        """필터에 맞는 프롬프트의 비트셋을 반환합니다.
+
+        모든 필터가 비트셋 연산이므로 프롬프트 수와 관계없이 조건마다 정수 연산
+        몇 번으로 계산됩니다.
+        """
+        mask = self._live_bits
+
+        if filters["folder_id"] is not None:
+            if filters["include_descendants"]:
+                folder_ids = self._descendants(filters["folder_id"])
+            else:
+                folder_ids = (filters["folder_id"],)
+            folder_mask = 0
+            for folder_id in folder_ids:
+                folder_mask |= self._folder_bits.get(folder_id, 0)
+            mask &= folder_mask
+        elif filters["unfiled"]:
+            mask &= self._folder_bits.get(None, 0)
+
+        if filters["is_favorite"] is not None:
+            if filters["is_favorite"]:
+                mask &= self._favorite_bits
+            else:
+                mask &= ~self._favorite_bits
+
+        tag_ids = filters["tag_ids"]
+        if tag_ids:
+            bits = [self._tag_bits.get(tag_id, 0) for tag_id in tag_ids]
+            tag_mask = bits[0]
+            for other in bits[1:]:
+                if filters["tag_mode"] == "all":
+                    tag_mask &= other
+                else:
+                    tag_mask |= other
+            mask &= tag_mask
+
+        if filters.get("tag_expr") is not None:
+            mask &= evaluate_tag_expression(
+                filters["tag_expr"], self._tag_name_bits, self._live_bits
+            )
+
+        return mask
+
+    def count(self, filters):
+        """필터에 맞는 프롬프트 수를 반환합니다."""
+        self._ensure_loaded()
+        with self._lock:
+            return self._match_bits(filters).bit_count()
+
+    def facets(self, filters, pending_ids=()):
+        """필터에 맞는 프롬프트 집합의 태그/폴더/즐겨찾기/사용 여부별 개수를 반환합니다.
+
+        모든 개수는 맞는 프롬프트 비트셋과 각 비트셋의 교집합 비트 수이므로
+        레코드를 훑지 않습니다. 폴더의 total_count는 하위 폴더를 포함한 개수입니다.
+        pending_ids(아직 기록되지 않은 사용 내역이 있는 프롬프트 ID)는 사용 횟수가
+        0이어도 사용한 것으로 셉니다.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            matched = self._match_bits(filters)
+
+            direct_counts = {
+                folder_id: (bits & matched).bit_count()
+                for folder_id, bits in self._folder_bits.items()
+            }
+
+            used_bits = self._used_bits
+            for prompt_id in pending_ids:
+                record = self._records.get(prompt_id)
+                if record is not None:
+                    used_bits |= 1 << record.ordinal
+
+            # 하위 폴더부터 부모 폴더로 개수를 더해 하위 폴더 포함 개수를 만듦
+            subtree_counts = {
+                folder_id: direct_counts.get(folder_id, 0)
+                for folder_id in self._folders
+            }
+            for folder_id in self._folders_bottom_up:
+                parent_id = self._folders[folder_id][1]
+                if parent_id is not None:
+                    subtree_counts[parent_id] += subtree_counts[folder_id]
+
+            total = matched.bit_count()
+            favorites = (matched & self._favorite_bits).bit_count()
+            used = (matched & used_bits).bit_count()
+            return {
+                "total": total,
+                "tags": sorted(
+                    (
+                        dict(
+                            tag,
+                            count=(self._tag_bits.get(tag_id, 0) & matched).bit_count(),
+                        )
+                        for tag_id, tag in self._tags.items()
+                    ),
+                    key=lambda tag: tag["name"],
+                ),
+                "folders": [
+                    {
+                        "id": folder_id,
+                        "name": name,
+                        "parent_id": parent_id,
+                        "count": direct_counts.get(folder_id, 0),
+                        "total_count": subtree_counts[folder_id],
+                    }
+                    for folder_id, (name, parent_id) in sorted(self._folders.items())
+                ],
+                "unfiled": direct_counts.get(None, 0),
+                "favorites": {"favorite": favorites, "not_favorite": total - favorites},
+                "usage": {"used": used, "unused": total - used},
+            }
+
+    def query(self, filters, sort, direction, limit=None, cursor=None):
+        """필터에 맞는 레코드를 정렬 순서대로 반환합니다.
+
+        cursor가 있으면 그 (정렬 키, ID) 다음부터 읽고, limit이 있으면 다음 페이지
+        존재 여부를 알 수 있도록 limit + 1개까지 반환합니다. 커서 값의 형식이 정렬
+        키와 맞지 않으면 ValueError를 발생시킵니다.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            matched = self._match_bits(filters)
+            if matched == self._live_bits:
+                # 필터가 없으면 비트 검사 생략
+                matched = None
+            else:
+                # 큰 정수의 시프트는 길이에 비례하므로 바이트열로 바꿔 비트를 검사
+                matched = matched.to_bytes(len(self._ordinal_ids) // 8 + 1, "little")
+            order = self._order(sort)
+
+            try:
+                if direction == "desc":
+                    end = len(order)
+                    if cursor:
+                        end = bisect.bisect_left(order, (cursor["value"], cursor["id"]))
+                    positions = range(end - 1, -1, -1)
+                else:
+                    start = 0
+                    if cursor:
+                        start = bisect.bisect_right(
+                            order, (cursor["value"], cursor["id"])
+                        )
+                    positions = range(start, len(order))
+            except TypeError as e:
+                raise ValueError("유효하지 않은 커서입니다.") from e
+
+            records = []
+            for position in positions:
+                record = self._records[order[position][1]]
+                if (
+                    matched is None
+                    or matched[record.ordinal >> 3] >> (record.ordinal & 7) & 1
+                ):
+                    records.append(record)
+                    if limit is not None and len(records) > limit:
+                        break
+            return records
+
+    def all_records(self):
+        """모든 레코드를 ID 순서로 반환합니다."""
+        self._ensure_loaded()
+        with self._lock:
+            return [self._records[prompt_id] for prompt_id in sorted(self._records)]
+
+    def sort_key(self, record, sort):
+        """커서에 담을 레코드의 정렬 키를 반환합니다."""
+        return SORT_KEYS[sort](record)
+
+    def materialize(
+        self, conn, records, fields=PROMPT_LIST_FIELDS, include=("tags", "variables")
+    ):
+        """레코드를 목록 API 응답 형식의 dict로 바꿉니다.
+
+        카탈로그에 없는 필드(내용, 메모, 미리보기)와 변수만 해당 프롬프트 ID로
+        데이터베이스에서 읽으며, fields/include에 없는 것은 읽지 않습니다.
+        """
+        record_fields = [field for field in fields if field in _RECORD_FIELDS]
+        stored_fields = [
+            field
+            for field in fields
+            if field not in _RECORD_FIELDS and field != "folder"
+        ]
+        all_record_fields = len(record_fields) == len(_RECORD_FIELDS)
+        with_folder = "folder" in fields
+        with_tags = "tags" in include
+        # 정규화 형식 응답은 태그 객체 대신 ID 목록만 채움
+        with_tag_ids = "tag_ids" in include
+
+        prompts = []
+        with self._lock:
+            for record in records:
+                if all_record_fields:
+                    # 기본 목록 응답 (dict 리터럴이 필드별 getattr보다 빠름)
+                    prompt = {
+                        "id": record.id,
+                        "title": record.title,
+                        "folder_id": record.folder_id,
+                        "created_at": record.created_at,
+                        "updated_at": record.updated_at,
+                        "is_favorite": record.is_favorite,
+                        "use_count": record.use_count,
+                        "last_used_at": record.last_used_at,
+                    }
+                else:
+                    prompt = {field: getattr(record, field) for field in record_fields}
+                if with_folder:
+                    folder = self._folders.get(record.folder_id)
+                    prompt["folder"] = folder[0] if folder else None
+                if with_tags:
+                    prompt["tags"] = [
+                        dict(self._tags[tag_id])
+                        for tag_id in record.tag_ids
+                        if tag_id in self._tags
+                    ]
+                elif with_tag_ids:
+                    prompt["tag_ids"] = [
+                        tag_id for tag_id in record.tag_ids if tag_id in self._tags
+                    ]
+                prompts.append(prompt)
+
+        if stored_fields:
+            columns, joins = projection_sql(stored_fields)
+            stored = {}
+            for batch in batched([prompt["id"] for prompt in prompts]):
+                placeholders = ", ".join(["?"] * len(batch))
+                for row in conn.execute(
+                    f"""
+                    SELECT p.id, {columns} FROM prompts p {joins}
+                    WHERE p.id IN ({placeholders})
+                    """,
+                    batch,
+                ):
+                    stored[row[0]] = row
+
+            # 읽는 사이 삭제된 프롬프트는 제외
+            prompts = [prompt for prompt in prompts if prompt["id"] in stored]
+            for prompt in prompts:
+                row = stored[prompt["id"]]
+                for position, field in enumerate(stored_fields, 1):
+                    prompt[field] = row[position]
+
+        if "variables" in include:
+            variables_by_prompt = fetch_variables_by_prompt(
+                conn, [prompt["id"] for prompt in prompts]
+            )
+            for prompt in prompts:
+                prompt["variables"] = variables_by_prompt.get(prompt["id"], [])
+
+        return prompts
+
+
+catalog = PromptCatalog()
+
+
+def load_catalog():
+    """시작 시 카탈로그를 만들고 읽은 프롬프트 수를 반환합니다."""
+    with get_db() as conn:
+        return catalog.load(conn)
@@ -0,0 +1,148 @@
+"""폴더 계층의 모든 (상위 폴더, 하위 폴더) 쌍을 저장하는 클로저 테이블
+
+folder_closure에는 폴더마다 자기 자신(depth 0)과 모든 하위 폴더가 한 행씩 들어
+있어, 순환 참조 확인·하위 트리 조회·상위 폴더 조회를 트리 깊이와 상관없이 인덱스
+조회 한 번으로 처리할 수 있습니다. 폴더 생성/이동/삭제 시 트리거가 갱신합니다.
+"""
+
+CLOSURE_COLUMNS = ("ancestor", "descendant", "depth")
+
+# folders.parent_id로부터 클로저를 처음부터 계산하는 쿼리
+# (잘못된 순환 참조가 있어도 끝나도록 깊이를 폴더 수로 제한)
+EXPECTED_CLOSURE = """
+    WITH RECURSIVE closure(ancestor, descendant, depth) AS (
+        SELECT id, id, 0 FROM folders
+        UNION
+        SELECT c.ancestor, f.id, c.depth + 1
+        FROM closure c
+        JOIN folders f ON f.parent_id = c.descendant
+        WHERE c.depth < (SELECT COUNT(*) FROM folders)
+    )
+    SELECT ancestor, descendant, MIN(depth)
+    FROM closure
+    GROUP BY ancestor, descendant
+"""
+
+CLOSURE_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS folders_closure_ai
+    AFTER INSERT ON folders BEGIN
+        INSERT INTO folder_closure (ancestor, descendant, depth)
+        SELECT ancestor, new.id, depth + 1
+        FROM folder_closure
+        WHERE descendant = new.parent_id
+        UNION ALL
+        SELECT new.id, new.id, 0;
+    END
+    """,
+    # 자기 자신이나 하위 폴더 아래로 옮기는 변경은 데이터베이스에서도 거부
+    """
+    CREATE TRIGGER IF NOT EXISTS folders_closure_bu
+    BEFORE UPDATE OF parent_id ON folders
+    WHEN new.parent_id IS NOT NULL AND EXISTS (
+        SELECT 1 FROM folder_closure
+        WHERE ancestor = new.id AND descendant = new.parent_id
+    ) BEGIN
+        SELECT RAISE(ABORT, '폴더 구조에 순환 참조가 발생합니다.');
+    END
+    """,
+    # 옮긴 하위 트리와 이전 상위 폴더들의 연결을 끊고 새 상위 폴더들과 연결
+    """
+    CREATE TRIGGER IF NOT EXISTS folders_closure_au
+    AFTER UPDATE OF parent_id ON folders
+    WHEN old.parent_id IS NOT new.parent_id BEGIN
+        DELETE FROM folder_closure
+        WHERE descendant IN (
+            SELECT descendant FROM folder_closure WHERE ancestor = new.id
+        )
+        AND ancestor IN (
+            SELECT ancestor FROM folder_closure
+            WHERE descendant = new.id AND ancestor != new.id
+        );
+        INSERT INTO folder_closure (ancestor, descendant, depth)
+        SELECT a.ancestor, d.descendant, a.depth + d.depth + 1
+        FROM folder_closure a
+        JOIN folder_closure d ON d.ancestor = new.id
+        WHERE a.descendant = new.parent_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS folders_closure_ad
+    AFTER DELETE ON folders BEGIN
+        DELETE FROM folder_closure WHERE descendant = old.id OR ancestor = old.id;
+    END
+    """,
+)
+
+
+def create_folder_closure(cursor):
+    """folder_closure 테이블과 유지 트리거를 만들고 현재 폴더 구조로 채웁니다."""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS folder_closure (
+            ancestor INTEGER NOT NULL,
+            descendant INTEGER NOT NULL,
+            depth INTEGER NOT NULL,
+            PRIMARY KEY (ancestor, descendant)
+        ) WITHOUT ROWID
+        """
+    )
+    # 상위 폴더 조회용 (기본 키는 하위 트리 조회용)
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_folder_closure_descendant
+        ON folder_closure(descendant, depth)
+        """
+    )
+
+    for trigger in CLOSURE_TRIGGERS:
+        cursor.execute(trigger)
+
+    rebuild_folder_closure(cursor)
+
+
+def rebuild_folder_closure(cursor):
+    """folder_closure를 folders 테이블로 다시 계산하고 어긋나 있던 행 수를 반환합니다.
+
+    트랜잭션은 호출하는 쪽에서 관리합니다.
+    """
+    column_list = ", ".join(CLOSURE_COLUMNS)
+    cursor.execute("DROP TABLE IF EXISTS temp.expected_closure")
+    cursor.execute(f"CREATE TEMP TABLE expected_closure ({column_list})")
+    cursor.execute(f"INSERT INTO temp.expected_closure {EXPECTED_CLOSURE}")
+    cursor.execute(
+        f"""
+        SELECT COUNT(*) FROM (
+            SELECT ancestor, descendant FROM (
+                SELECT {column_list} FROM temp.expected_closure
+                EXCEPT SELECT {column_list} FROM folder_closure
+                UNION ALL
+                SELECT * FROM (
+                    SELECT {column_list} FROM folder_closure
+                    EXCEPT SELECT {column_list} FROM temp.expected_closure
+                )
+            )
+            GROUP BY ancestor, descendant
+        )
+        """
+    )
+    mismatched = cursor.fetchone()[0]
+
+    if mismatched:
+        cursor.execute("DELETE FROM folder_closure")
+        cursor.execute(
+            f"INSERT INTO folder_closure ({column_list}) "
+            "SELECT * FROM temp.expected_closure"
+        )
+
+    cursor.execute("DROP TABLE temp.expected_closure")
+    return mismatched
+
+
+def is_same_or_descendant(cursor, folder_id, ancestor_id):
+    """folder_id가 ancestor_id 자신이거나 그 하위 폴더인지 확인합니다."""
+    cursor.execute(
+        "SELECT 1 FROM folder_closure WHERE ancestor = ? AND descendant = ?",
+        (ancestor_id, folder_id),
+    )
+    return cursor.fetchone() is not None
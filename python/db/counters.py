@@ -0,0 +1,336 @@
+"""폴더, 태그, 컬렉션별 프롬프트 개수를 트리거로 유지하는 집계 테이블
+
+prompts, prompt_tags, collection_prompts, folders가 바뀔 때마다 트리거가
+folder_stats, tag_stats, collection_stats의 값을 증감하므로 조회 API는 개수를
+다시 세지 않고 이 테이블을 그대로 읽습니다. 값이 어긋난 경우에는
+python manage.py repair-counters로 처음부터 다시 계산할 수 있습니다.
+"""
+
+import re
+
+# 폴더가 없는(미분류) 프롬프트를 집계하는 folder_stats의 키
+UNFILED_FOLDER_ID = 0
+
+# 집계 테이블의 키 컬럼과 값 컬럼
+COUNTER_COLUMNS = {
+    "folder_stats": (
+        "folder_id",
+        (
+            "prompt_count",
+            "favorite_count",
+            "use_count",
+            "subtree_prompt_count",
+            "subtree_favorite_count",
+            "subtree_use_count",
+        ),
+    ),
+    "tag_stats": ("tag_id", ("prompt_count", "favorite_count", "use_count")),
+    "collection_stats": (
+        "collection_id",
+        ("prompt_count", "favorite_count", "use_count"),
+    ),
+}
+
+
+def _folder_key(ref):
+    return f"IFNULL({ref}.folder_id, {UNFILED_FOLDER_ID})"
+
+
+def _favorite(ref):
+    return f"IFNULL({ref}.is_favorite = 1, 0)"
+
+
+def _use_count(ref):
+    return f"IFNULL({ref}.use_count, 0)"
+
+
+def _ancestors(folder_expr):
+    """folder_expr 폴더와 모든 상위 폴더의 ID를 돌려주는 서브쿼리 (folder_closure 사용)"""
+    return f"""(
+        SELECT {folder_expr}
+        UNION
+        SELECT ancestor FROM folder_closure WHERE descendant = {folder_expr}
+    )"""
+
+
+def _apply_prompt_to_folders(ref, sign):
+    """ref(new/old) 프롬프트를 소속 폴더와 상위 폴더 집계에 더하거나(+) 뺍니다(-)."""
+    key = _folder_key(ref)
+    return f"""
+        INSERT OR IGNORE INTO folder_stats (folder_id) VALUES ({key});
+        UPDATE folder_stats SET
+            prompt_count = prompt_count {sign} (folder_id = {key}),
+            favorite_count = favorite_count {sign} (folder_id = {key}) * {_favorite(ref)},
+            use_count = use_count {sign} (folder_id = {key}) * {_use_count(ref)},
+            subtree_prompt_count = subtree_prompt_count {sign} 1,
+            subtree_favorite_count = subtree_favorite_count {sign} {_favorite(ref)},
+            subtree_use_count = subtree_use_count {sign} {_use_count(ref)}
+        WHERE folder_id IN {_ancestors(key)};
+    """
+
+
+def _move_subtree(folder_id, parent_expr, sign):
+    """folder_id 폴더의 하위 트리 집계를 parent_expr와 그 상위 폴더에 더하거나 뺍니다."""
+    moved = "(SELECT {column} FROM folder_stats WHERE folder_id = " + folder_id + ")"
+    return f"""
+        UPDATE folder_stats SET
+            subtree_prompt_count = subtree_prompt_count {sign}
+                {moved.format(column="subtree_prompt_count")},
+            subtree_favorite_count = subtree_favorite_count {sign}
+                {moved.format(column="subtree_favorite_count")},
+            subtree_use_count = subtree_use_count {sign}
+                {moved.format(column="subtree_use_count")}
+        WHERE folder_id IN {_ancestors(parent_expr)};
+    """
+
+
+def _link_triggers(link_table, stats_table, key, parent_table):
+    """프롬프트 연결 테이블(prompt_tags, collection_prompts)의 집계 트리거 SQL"""
+    prompt = "(SELECT {expr} FROM prompts p WHERE p.id = {ref}.prompt_id)"
+
+    def delta(ref, sign):
+        favorite = prompt.format(expr=_favorite("p"), ref=ref)
+        use_count = prompt.format(expr=_use_count("p"), ref=ref)
+        return f"""
+            UPDATE {stats_table} SET
+                prompt_count = prompt_count {sign} 1,
+                favorite_count = favorite_count {sign} IFNULL({favorite}, 0),
+                use_count = use_count {sign} IFNULL({use_count}, 0)
+            WHERE {key} = {ref}.{key};
+        """
+
+    return (
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {parent_table}_stats_ai
+        AFTER INSERT ON {parent_table} BEGIN
+            INSERT OR IGNORE INTO {stats_table} ({key}) VALUES (new.id);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {parent_table}_stats_ad
+        AFTER DELETE ON {parent_table} BEGIN
+            DELETE FROM {stats_table} WHERE {key} = old.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {link_table}_stats_ai
+        AFTER INSERT ON {link_table} BEGIN
+            {delta("new", "+")}
+        END
+        """,
+        # 프롬프트 삭제로 연쇄 삭제될 때는 프롬프트 행이 이미 보이지 않으므로
+        # 즐겨찾기/사용 횟수는 prompts_stats_bd에서 미리 빼고 여기서는 0이 됨
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {link_table}_stats_ad
+        AFTER DELETE ON {link_table} BEGIN
+            {delta("old", "-")}
+        END
+        """,
+    )
+
+
+def _prompt_link_updates(prompt_id, favorite_delta, use_delta):
+    """프롬프트의 즐겨찾기/사용 횟수 변화를 연결된 태그와 컬렉션 집계에 반영하는 SQL"""
+    statements = []
+    for link_table, stats_table, key in (
+        ("prompt_tags", "tag_stats", "tag_id"),
+        ("collection_prompts", "collection_stats", "collection_id"),
+    ):
+        statements.append(
+            f"""
+            UPDATE {stats_table} SET
+                favorite_count = favorite_count + ({favorite_delta}),
+                use_count = use_count + ({use_delta})
+            WHERE {key} IN (
+                SELECT {key} FROM {link_table} WHERE prompt_id = {prompt_id}
+            );
+            """
+        )
+    return "".join(statements)
+
+
+def _counter_triggers():
+    triggers = [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS prompts_stats_ai
+        AFTER INSERT ON prompts BEGIN
+            {_apply_prompt_to_folders("new", "+")}
+        END
+        """,
+        # 연결 행이 연쇄 삭제되기 전에 태그/컬렉션의 즐겨찾기·사용 횟수 합계를 뺌
+        f"""
+        CREATE TRIGGER IF NOT EXISTS prompts_stats_bd
+        BEFORE DELETE ON prompts BEGIN
+            {_prompt_link_updates(
+                "old.id", f"-{_favorite('old')}", f"-{_use_count('old')}"
+            )}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS prompts_stats_ad
+        AFTER DELETE ON prompts BEGIN
+            {_apply_prompt_to_folders("old", "-")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS prompts_stats_au
+        AFTER UPDATE OF folder_id, is_favorite, use_count ON prompts BEGIN
+            {_apply_prompt_to_folders("old", "-")}
+            {_apply_prompt_to_folders("new", "+")}
+            {_prompt_link_updates(
+                "new.id",
+                f"{_favorite('new')} - {_favorite('old')}",
+                f"{_use_count('new')} - {_use_count('old')}",
+            )}
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS folders_stats_ai
+        AFTER INSERT ON folders BEGIN
+            INSERT OR IGNORE INTO folder_stats (folder_id) VALUES (new.id);
+        END
+        """,
+        # 하위 폴더나 프롬프트가 있는 폴더는 외래 키 때문에 삭제할 수 없으므로 행만 지움
+        """
+        CREATE TRIGGER IF NOT EXISTS folders_stats_ad
+        AFTER DELETE ON folders BEGIN
+            DELETE FROM folder_stats WHERE folder_id = old.id;
+        END
+        """,
+        # 폴더를 옮기면 하위 트리 집계를 이전 상위 폴더에서 빼고 새 상위 폴더에 더함
+        # (이전/새 상위 폴더의 조상 목록은 옮긴 하위 트리의 클로저 갱신과 무관하므로
+        # folders_closure_au와의 실행 순서에 영향을 받지 않음)
+        f"""
+        CREATE TRIGGER IF NOT EXISTS folders_stats_au
+        AFTER UPDATE OF parent_id ON folders
+        WHEN old.parent_id IS NOT new.parent_id BEGIN
+            {_move_subtree("new.id", "old.parent_id", "-")}
+            {_move_subtree("new.id", "new.parent_id", "+")}
+        END
+        """,
+    ]
+    triggers += _link_triggers("prompt_tags", "tag_stats", "tag_id", "tags")
+    triggers += _link_triggers(
+        "collection_prompts", "collection_stats", "collection_id", "collections"
+    )
+    return triggers
+
+
+# 집계 값을 처음부터 계산하는 쿼리 (COUNTER_COLUMNS와 같은 컬럼 순서)
+EXPECTED_COUNTERS = {
+    "folder_stats": f"""
+        WITH RECURSIVE
+            direct(folder_id, prompt_count, favorite_count, use_count) AS (
+                SELECT {_folder_key("p")}, COUNT(*),
+                       SUM({_favorite("p")}), SUM({_use_count("p")})
+                FROM prompts p
+                GROUP BY 1
+            ),
+            keys(folder_id) AS (
+                SELECT id FROM folders
+                UNION SELECT folder_id FROM direct
+                UNION SELECT {UNFILED_FOLDER_ID}
+            ),
+            subtree(root_id, folder_id) AS (
+                SELECT folder_id, folder_id FROM keys
+                UNION
+                SELECT s.root_id, f.id
+                FROM subtree s
+                JOIN folders f ON f.parent_id = s.folder_id
+            )
+        SELECT k.folder_id,
+               IFNULL(d.prompt_count, 0),
+               IFNULL(d.favorite_count, 0),
+               IFNULL(d.use_count, 0),
+               IFNULL(SUM(sd.prompt_count), 0),
+               IFNULL(SUM(sd.favorite_count), 0),
+               IFNULL(SUM(sd.use_count), 0)
+        FROM keys k
+        LEFT JOIN direct d ON d.folder_id = k.folder_id
+        JOIN subtree s ON s.root_id = k.folder_id
+        LEFT JOIN direct sd ON sd.folder_id = s.folder_id
+        GROUP BY k.folder_id
+    """,
+    "tag_stats": f"""
+        SELECT t.id, COUNT(pt.prompt_id),
+               IFNULL(SUM({_favorite("p")}), 0), IFNULL(SUM({_use_count("p")}), 0)
+        FROM tags t
+        LEFT JOIN prompt_tags pt ON pt.tag_id = t.id
+        LEFT JOIN prompts p ON p.id = pt.prompt_id
+        GROUP BY t.id
+    """,
+    "collection_stats": f"""
+        SELECT c.id, COUNT(cp.prompt_id),
+               IFNULL(SUM({_favorite("p")}), 0), IFNULL(SUM({_use_count("p")}), 0)
+        FROM collections c
+        LEFT JOIN collection_prompts cp ON cp.collection_id = c.id
+        LEFT JOIN prompts p ON p.id = cp.prompt_id
+        GROUP BY c.id
+    """,
+}
+
+
+def create_counter_tables(cursor):
+    """집계 테이블과 유지 트리거를 만들고 현재 데이터로 값을 채웁니다."""
+    for table, (key, columns) in COUNTER_COLUMNS.items():
+        values = ",\n".join(
+            f"{column} INTEGER NOT NULL DEFAULT 0" for column in columns
+        )
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key} INTEGER PRIMARY KEY,
+                {values}
+            )
+            """
+        )
+
+    for trigger in _counter_triggers():
+        cursor.execute(trigger)
+
+    rebuild_counters(cursor)
+
+
+def replace_counter_triggers(cursor):
+    """이미 만들어진 집계 트리거를 현재 정의로 다시 만듭니다."""
+    for trigger in _counter_triggers():
+        name = re.search(r"CREATE TRIGGER IF NOT EXISTS (\w+)", trigger).group(1)
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(trigger)
+
+
+def rebuild_counters(cursor):
+    """집계 테이블을 원본 데이터로 다시 계산하고 테이블별로 어긋나 있던 행 수를 반환합니다.
+
+    트랜잭션은 호출하는 쪽에서 관리합니다.
+    """
+    mismatched = {}
+
+    for table, (key, columns) in COUNTER_COLUMNS.items():
+        column_list = ", ".join((key,) + columns)
+        cursor.execute("DROP TABLE IF EXISTS temp.expected_stats")
+        cursor.execute(f"CREATE TEMP TABLE expected_stats ({column_list})")
+        cursor.execute(f"INSERT INTO temp.expected_stats {EXPECTED_COUNTERS[table]}")
+        cursor.execute(
+            f"""
+            SELECT COUNT(DISTINCT {key}) FROM (
+                SELECT {column_list} FROM temp.expected_stats
+                EXCEPT SELECT {column_list} FROM {table}
+                UNION ALL
+                SELECT * FROM (
+                    SELECT {column_list} FROM {table}
+                    EXCEPT SELECT {column_list} FROM temp.expected_stats
+                )
+            )
+            """
+        )
+        mismatched[table] = cursor.fetchone()[0]
+
+        if mismatched[table]:
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(
+                f"INSERT INTO {table} ({column_list}) SELECT * FROM temp.expected_stats"
+            )
+
+    cursor.execute("DROP TABLE IF EXISTS temp.expected_stats")
+    return mismatched
@@ -0,0 +1,164 @@
+"""테이블별 데이터 버전과 조회 API의 조건부 요청(ETag / If-None-Match)
+
+data_versions에는 버전 이름마다 변경 횟수가 있고, 트리거가 해당 테이블의 행을
+추가/수정/삭제할 때마다 같은 트랜잭션 안에서 1씩 올립니다 (manage.py 등 다른
+프로세스의 쓰기도 포함). prompt_counts는 폴더별 개수에 영향을 주는 프롬프트
+변경(추가/삭제, 폴더/즐겨찾기 변경)만 세므로, 사용 기록이나 내용 수정은 폴더
+목록의 ETag를 바꾸지 않습니다. 집계 테이블(folder_stats 등)은 사용 횟수 변경도
+빼고 더하는 두 번의 수정으로 반영되므로 버전의 기준으로 쓰지 않습니다.
+
+conditional_get으로 감싼 조회 API는 응답이 의존하는 버전으로 ETag를 만들고,
+요청의 If-None-Match와 같으면 뷰를 실행하지 않고 304를 반환합니다. 이때 읽는
+것은 data_versions의 몇 행뿐입니다. ETag에는 프로세스마다(그리고 복원할 때마다)
+새로 만드는 값이 들어가므로, 재시작이나 복원으로 버전이 예전 값으로 돌아가도
+다른 데이터에 같은 ETag를 주지 않습니다.
+"""
+
+import functools
+import uuid
+
+from flask import current_app, make_response, request
+
+from db.response_cache import response_cache
+
+# 버전 이름 -> (테이블, 버전을 올리는 수정 컬럼, None이면 모든 수정)
+DATA_VERSIONS = {
+    "prompts": ("prompts", None),
+    "prompt_counts": ("prompts", ("folder_id", "is_favorite")),
+    "folders": ("folders", None),
+    "tags": ("tags", None),
+    "collections": ("collections", None),
+    "prompt_tags": ("prompt_tags", None),
+    "collection_prompts": ("collection_prompts", None),
+    "variables": ("variables", None),
+}
+
+# 조회 API별로 응답이 의존하는 버전
+PROMPT_LIST_VERSIONS = ("prompts", "folders", "tags", "prompt_tags", "variables")
+FOLDER_LIST_VERSIONS = ("folders", "prompt_counts")
+TAG_LIST_VERSIONS = ("tags", "prompt_tags")
+COLLECTION_LIST_VERSIONS = ("collections", "collection_prompts")
+
+_epoch = uuid.uuid4().hex[:8]
+
+
+def _version_triggers():
+    triggers = []
+    for name, (table, columns) in DATA_VERSIONS.items():
+        condition = ""
+        if columns:
+            changed = " OR ".join(
+                f"old.{column} IS NOT new.{column}" for column in columns
+            )
+            condition = f"WHEN {changed}"
+
+        for suffix, event, when in (
+            ("ai", "INSERT", ""),
+            ("au", "UPDATE", condition),
+            ("ad", "DELETE", ""),
+        ):
+            triggers.append(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS {name}_version_{suffix}
+                AFTER {event} ON {table} {when} BEGIN
+                    UPDATE data_versions SET version = version + 1
+                    WHERE name = '{name}';
+                END
+                """
+            )
+    return triggers
+
+
+def create_data_versions_table(cursor):
+    """데이터 버전 테이블과 버전을 올리는 트리거를 만듭니다."""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """
+    )
+    cursor.executemany(
+        "INSERT OR IGNORE INTO data_versions (name) VALUES (?)",
+        [(name,) for name in DATA_VERSIONS],
+    )
+
+    for trigger in _version_triggers():
+        cursor.execute(trigger)
+
+
+def read_data_versions(conn, names):
+    """names의 현재 버전을 같은 순서의 튜플로 반환합니다."""
+    versions = dict(conn.execute("SELECT name, version FROM data_versions").fetchall())
+    return tuple(versions.get(name, 0) for name in names)
+
+
+def renew_data_epoch():
+    """데이터베이스 파일을 바꾼 뒤(복원) 이전에 발급한 ETag를 모두 무효로 만듭니다."""
+    global _epoch
+    _epoch = uuid.uuid4().hex[:8]
+    # 이전 ETag로 저장한 응답 본문은 더 이상 쓰이지 않음
+    response_cache.clear()
+
+
+def data_etag(names, extra=()):
+    """names의 버전과 extra 값으로 만든 ETag 값을 반환합니다."""
+    from db.database import get_db
+
+    with get_db() as conn:
+        versions = read_data_versions(conn, names)
+    return "-".join(str(part) for part in (_epoch, *versions, *extra))
+
+
+def _cached_view(view, etag, args, kwargs):
+    """응답 캐시에 etag로 만든 본문이 있으면 그대로, 없으면 뷰를 실행해 저장합니다."""
+    key = (request.path, tuple(sorted(request.args.items(multi=True))))
+    cached = response_cache.get(key, etag)
+    if cached is not None:
+        body, mimetype = cached
+        return current_app.response_class(body, mimetype=mimetype)
+
+    response = make_response(view(*args, **kwargs))
+    if response.status_code == 200:
+        if response.is_streamed:
+            response.response = response_cache.store_stream(
+                key, etag, response.response, response.mimetype
+            )
+        else:
+            response_cache.put(key, etag, response.get_data(), response.mimetype)
+    return response
+
+
+def conditional_get(names, extra=None, cache=False):
+    """조회 뷰에 데이터 버전 기반 ETag와 304 응답을 붙이는 데코레이터
+
+    names는 응답이 의존하는 버전 이름 목록이고, extra는 데이터 버전 외에 응답을
+    바꾸는 값(메모리 버퍼 상태 등)의 목록을 반환하는 함수입니다. cache가 참이면
+    (함수라면 요청마다 호출한 결과가 참이면) 응답 본문을 db.response_cache에
+    ETag와 함께 저장해 다시 씁니다. 응답에는 Cache-Control: no-cache를 붙여
+    브라우저가 매번 If-None-Match로 다시 확인하게 합니다.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = data_etag(names, extra() if extra else ())
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                use_cache = cache() if callable(cache) else cache
+                if use_cache and response_cache.max_bytes:
+                    response = _cached_view(view, etag, args, kwargs)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
+
+    return decorator
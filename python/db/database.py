@@ -1,29 +1,268 @@
 import sqlite3
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from db.closure import create_folder_closure
+from db.counters import create_counter_tables, replace_counter_triggers
+from db.data_versions import create_data_versions_table
+from db.embeddings import create_embedding_tables
+from db.folder_order import spread_folder_positions
+from db.hot_score import add_hot_score
+from db.near_duplicates import create_minhash_tables, index_missing_prompts
+from db.projection import create_preview_table
+from db.similarity import create_similarity_tables
+from db.usage_stats import create_usage_tables
 
 # 상대 경로에서 절대 경로로 변경
 DB_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "../../data/prompt_manager.db")
 )
 
+# 연결 풀 최대 크기 (환경 변수로 조정 가능)
+POOL_SIZE = int(os.environ.get("PROMPT_MANAGER_DB_POOL_SIZE", "8"))
 
-def get_db_connection():
-    """데이터베이스 연결을 반환합니다."""
+# 빈 연결을 기다리는 최대 시간 (초)
+POOL_TIMEOUT = float(os.environ.get("PROMPT_MANAGER_DB_POOL_TIMEOUT", "10"))
+
+# 연결 생성 시 한 번만 적용되는 PRAGMA 프로필
+# configure_pool()로 값을 덮어쓸 수 있습니다.
+PRAGMA_PROFILE = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,  # 음수는 KiB 단위 (약 16MB)
+    "mmap_size": 268435456,  # 256MB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,  # 밀리초
+    "foreign_keys": "ON",
+}
+
+
+def _open_connection(pragmas=None):
+    """PRAGMA 프로필이 적용된 새 연결을 생성합니다."""
     # 데이터 디렉토리가 없으면 생성
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    # 쓰기 트랜잭션을 IMMEDIATE로 시작해, 백그라운드 작업이 먼저 기록한 경우에도
+    # 바로 database is locked로 실패하지 않고 busy_timeout만큼 기다리도록 함
+    conn = sqlite3.connect(
+        DB_PATH, check_same_thread=False, isolation_level="IMMEDIATE"
+    )
     conn.row_factory = sqlite3.Row
+
+    for name, value in (pragmas or PRAGMA_PROFILE).items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
     return conn
 
 
-def init_db():
-    """데이터베이스 및 테이블 초기화"""
-    # DB 파일이 이미 존재하는지 확인
-    db_exists = os.path.exists(DB_PATH)
+class ConnectionPool:
+    """미리 튜닝된 SQLite 연결을 재사용하는 스레드 안전 연결 풀"""
+
+    def __init__(self, max_size=POOL_SIZE, timeout=POOL_TIMEOUT, pragmas=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = dict(pragmas or PRAGMA_PROFILE)
+        # LIFO로 꺼내서 최근에 사용한(캐시가 따뜻한) 연결을 우선 재사용
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open_count = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._closed = False
+
+    def acquire(self):
+        """풀에서 연결을 하나 꺼냅니다. 필요하면 새 연결을 생성합니다."""
+        started = time.perf_counter()
+        conn = None
+        waited = False
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._open_count < self.max_size
+                if can_open:
+                    self._open_count += 1
+
+            if can_open:
+                try:
+                    conn = _open_connection(self.pragmas)
+                except Exception:
+                    with self._lock:
+                        self._open_count -= 1
+                    raise
+            else:
+                waited = True
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(
+                        f"데이터베이스 연결 대기 시간 초과 ({self.timeout}초)"
+                    )
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            if waited:
+                self._waits += 1
+            self._wait_time += elapsed
+            self._max_wait_time = max(self._max_wait_time, elapsed)
+
+        return conn
+
+    def release(self, conn):
+        """사용이 끝난 연결을 풀에 반환합니다."""
+        # 커밋되지 않은 트랜잭션이 다음 사용자에게 넘어가지 않도록 정리
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        # 이미 닫힌 풀이면 반환 대신 연결을 닫음
+        if self._closed:
+            self._discard(conn)
+            return
+
+        with self._lock:
+            self._in_use -= 1
+
+        self._idle.put(conn)
+
+    def _discard(self, conn):
+        """손상된 연결을 닫고 풀에서 제외합니다."""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+        with self._lock:
+            self._in_use -= 1
+            self._open_count -= 1
+
+    def close_all(self):
+        """유휴 연결을 모두 닫고, 사용 중인 연결은 반환될 때 닫히도록 합니다."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+
+            conn.close()
+            with self._lock:
+                self._open_count -= 1
+
+    def stats(self):
+        """풀 사용 통계를 반환합니다."""
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "open": self._open_count,
+                "in_use": self._in_use,
+                "idle": self._open_count - self._in_use,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "total_wait_ms": round(self._wait_time * 1000, 3),
+                "avg_wait_ms": (
+                    round(self._wait_time * 1000 / self._checkouts, 3)
+                    if self._checkouts
+                    else 0.0
+                ),
+                "max_wait_ms": round(self._max_wait_time * 1000, 3),
+                "pragmas": dict(self.pragmas),
+            }
+
+
+_pool = ConnectionPool()
+
+
+def configure_pool(max_size=None, timeout=None, **pragmas):
+    """연결 풀 설정과 PRAGMA 프로필을 변경합니다. 기존 유휴 연결은 닫힙니다."""
+    global _pool
+
+    old_pool = _pool
+    _pool = ConnectionPool(
+        max_size=max_size or old_pool.max_size,
+        timeout=timeout or old_pool.timeout,
+        pragmas={**old_pool.pragmas, **pragmas},
+    )
+    old_pool.close_all()
+    return _pool
+
+
+def close_pool():
+    """현재 풀의 연결을 모두 닫고 같은 설정의 새 풀로 교체합니다. (DB 파일 교체 시 호출)"""
+    return configure_pool()
+
+
+def get_pool_stats():
+    """연결 풀 통계를 반환합니다."""
+    return _pool.stats()
+
+
+@contextmanager
+def get_db():
+    """풀에서 연결을 빌려주고, 블록이 끝나면 자동으로 반환하는 컨텍스트 매니저"""
+    pool = _pool
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def get_db_connection():
+    """풀을 거치지 않는 단독 연결을 반환합니다. (초기화/마이그레이션용)"""
+    return _open_connection()
+
+
+def backup_database_to(backup_file):
+    """SQLite 백업 API로 현재 데이터베이스의 일관된 사본을 만듭니다."""
+    with get_db() as conn:
+        target = sqlite3.connect(backup_file)
+        try:
+            conn.backup(target)
+        finally:
+            target.close()
+
+
+def restore_database_from(restore_file):
+    """SQLite 백업 API로 restore_file의 내용을 현재 데이터베이스에 덮어씁니다.
 
+    데이터베이스 파일과 -wal/-shm 파일을 직접 바꾸지 않으므로, 스트리밍 응답이나
+    백그라운드 작업이 빌려 간 연결이 있어도 파일이 손상되지 않습니다. 읽는 중인
+    연결은 자신의 트랜잭션이 끝난 뒤부터 복원된 내용을 봅니다.
+    """
+    source = sqlite3.connect(restore_file)
+    try:
+        with get_db() as conn:
+            source.backup(conn)
+    finally:
+        source.close()
+
+
+def _table_exists(cursor, name):
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    )
+    return cursor.fetchone() is not None
+
+
+def _column_exists(cursor, table, column):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+
+
+def _create_core_tables(cursor):
+    """기본 테이블(프롬프트, 폴더, 태그, 변수, 설정)을 생성합니다."""
     # 프롬프트 테이블
     cursor.execute(
         """
@@ -107,44 +346,84 @@ def init_db():
     """
     )
 
-    # 컬렉션 테이블 추가
+
+def _init_folder_positions(cursor):
+    """형제 폴더끼리 고유한 position 값을 갖도록 이름순으로 초기화합니다."""
+    # 먼저 기본 폴더(모든 프롬프트, 즐겨찾기)의 position 값을 명시적으로 설정
     cursor.execute(
         """
-    CREATE TABLE IF NOT EXISTS collections (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """
+        UPDATE folders
+        SET position = CASE
+            WHEN name = '모든 프롬프트' THEN 0
+            WHEN name = '즐겨찾기' THEN 1
+            ELSE position
+        END
+        WHERE name IN ('모든 프롬프트', '즐겨찾기')
+        """
     )
 
-    # 컬렉션-프롬프트 관계 테이블 추가
+    # 다음으로 다른 최상위 폴더 정렬
     cursor.execute(
         """
-    CREATE TABLE IF NOT EXISTS collection_prompts (
-        collection_id INTEGER,
-        prompt_id INTEGER,
-        position INTEGER DEFAULT 0,
-        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        PRIMARY KEY (collection_id, prompt_id),
-        FOREIGN KEY (collection_id) REFERENCES collections(id) ON DELETE CASCADE,
-        FOREIGN KEY (prompt_id) REFERENCES prompts(id) ON DELETE CASCADE
+        SELECT id FROM folders 
+        WHERE parent_id IS NULL AND name NOT IN ('모든 프롬프트', '즐겨찾기')
+        ORDER BY name
+        """
     )
-    """
+    root_folders = cursor.fetchall()
+
+    # 기본 폴더 다음 위치부터 시작 (position 2부터)
+    start_position = 2
+    for idx, folder in enumerate(root_folders):
+        cursor.execute(
+            "UPDATE folders SET position = ? WHERE id = ?",
+            (start_position + idx, folder["id"]),
+        )
+
+    # 그 다음 하위 폴더들 정렬
+    cursor.execute(
+        """
+        SELECT DISTINCT parent_id FROM folders 
+        WHERE parent_id IS NOT NULL
+        """
     )
+    parent_ids = cursor.fetchall()
 
-    conn.commit()
+    for parent in parent_ids:
+        parent_id = parent["parent_id"]
+
+        cursor.execute(
+            """
+            SELECT id FROM folders 
+            WHERE parent_id = ? 
+            ORDER BY name
+            """,
+            (parent_id,),
+        )
+        child_folders = cursor.fetchall()
+
+        for idx, folder in enumerate(child_folders):
+            cursor.execute(
+                "UPDATE folders SET position = ? WHERE id = ?",
+                (idx, folder["id"]),
+            )
 
-    # 기존 DB가 없는 경우에만 기본 데이터 추가
-    if not db_exists:
-        create_default_data(conn)
-        migrate_folder_positions(conn)
-    else:
-        # 기졸 DB에는 폴더 위치 속성만 마이그레이션
-        migrate_folder_positions(conn)
 
-    conn.close()
+def _add_folder_positions(cursor):
+    """folders 테이블에 position 필드를 추가하고 값이 없으면 초기화합니다."""
+    column_added = not _column_exists(cursor, "folders", "position")
+    if column_added:
+        cursor.execute("ALTER TABLE folders ADD COLUMN position INTEGER DEFAULT 0")
+        print("폴더 테이블에 position 필드가 추가되었습니다.")
+
+    # 이전 버전은 시작할 때마다 position이 0인 폴더가 하나라도 있으면 이름순으로
+    # 다시 매겼으므로, 업그레이드할 때 한 번 같은 기준으로 초기화
+    cursor.execute(
+        "SELECT COUNT(*) FROM folders WHERE position IS NULL OR position = 0"
+    )
+    if column_added or cursor.fetchone()[0] > 0:
+        _init_folder_positions(cursor)
+        print("폴더의 position 값이 성공적으로 초기화되었습니다.")
 
 
 def migrate_folder_positions(conn=None):
@@ -158,89 +437,15 @@ def migrate_folder_positions(conn=None):
     cursor = conn.cursor()
 
     try:
-        # position 칼럼이 존재하는지 확인
-        cursor.execute("PRAGMA table_info(folders)")
-        columns = [column["name"] for column in cursor.fetchall()]
-
-        # position 필드가 없다면 추가
-        if "position" not in columns:
-            try:
-                cursor.execute(
-                    "ALTER TABLE folders ADD COLUMN position INTEGER DEFAULT 0"
-                )
-                print("폴더 테이블에 position 필드가 추가되었습니다.")
-            except Exception as e:
-                print(f"position 필드 추가 실패: {str(e)}")
-
-        # 이미 position 값이 설정되어 있는지 확인
-        cursor.execute(
-            "SELECT COUNT(*) FROM folders WHERE position IS NULL OR position = 0"
-        )
-        count = cursor.fetchone()[0]
-
-        # position 값을 초기화 (부모 폴더별로 동일한 레벨의 형제 폴더들에게 고유한 position 값 부여)
-        if count > 0:
-            # 먼저 기본 폴더(모든 프롬프트, 즐겨찾기)의 position 값을 명시적으로 설정
-            cursor.execute(
-                """
-                UPDATE folders
-                SET position = CASE
-                    WHEN name = '모든 프롬프트' THEN 0
-                    WHEN name = '즐겨찾기' THEN 1
-                    ELSE position
-                END
-                WHERE name IN ('모든 프롬프트', '즐겨찾기')
-                """
-            )
-
-            # 다음으로 다른 최상위 폴더 정렬
-            cursor.execute(
-                """
-                SELECT id FROM folders 
-                WHERE parent_id IS NULL AND name NOT IN ('모든 프롬프트', '즐겨찾기')
-                ORDER BY name
-                """
-            )
-            root_folders = cursor.fetchall()
-
-            # 기본 폴더 다음 위치부터 시작 (position 2부터)
-            start_position = 2
-            for idx, folder in enumerate(root_folders):
-                cursor.execute(
-                    "UPDATE folders SET position = ? WHERE id = ?",
-                    (start_position + idx, folder["id"]),
-                )
-
-            # 그 다음 하위 폴더들 정렬
-            cursor.execute(
-                """
-                SELECT DISTINCT parent_id FROM folders 
-                WHERE parent_id IS NOT NULL
-                """
-            )
-            parent_ids = cursor.fetchall()
-
-            for parent in parent_ids:
-                parent_id = parent["parent_id"]
-
-                cursor.execute(
-                    """
-                    SELECT id FROM folders 
-                    WHERE parent_id = ? 
-                    ORDER BY name
-                    """,
-                    (parent_id,),
-                )
-                child_folders = cursor.fetchall()
+        if not _column_exists(cursor, "folders", "position"):
+            cursor.execute("ALTER TABLE folders ADD COLUMN position INTEGER DEFAULT 0")
+            print("폴더 테이블에 position 필드가 추가되었습니다.")
 
-                for idx, folder in enumerate(child_folders):
-                    cursor.execute(
-                        "UPDATE folders SET position = ? WHERE id = ?",
-                        (idx, folder["id"]),
-                    )
-
-            conn.commit()
-            print("폴더의 position 값이 성공적으로 초기화되었습니다.")
+        _init_folder_positions(cursor)
+        # 이름순으로 매긴 0..n 값을 마이그레이션 9와 같은 간격을 둔 값으로 변환
+        spread_folder_positions(cursor)
+        conn.commit()
+        print("폴더의 position 값이 성공적으로 초기화되었습니다.")
 
     except Exception as e:
         conn.rollback()
@@ -330,22 +535,27 @@ def create_default_data(conn=None):
         """
         )
 
-    # 데이터베이스에 변경 사항 반영
-    conn.commit()
-
+    # 연결을 직접 연 경우에만 커밋 (마이그레이션 트랜잭션 안에서 호출될 수 있음)
     if should_close:
+        conn.commit()
         conn.close()
 
 
-def add_sample_prompts():
+def add_sample_prompts(conn=None):
     """샘플 프롬프트 데이터 추가 (데이터가 없는 경우에만)"""
-    conn = get_db_connection()
+    if conn is None:
+        conn = get_db_connection()
+        should_close = True
+    else:
+        should_close = False
+
     cursor = conn.cursor()
 
     # 이미 프롬프트 데이터가 있는지 확인
     cursor.execute("SELECT COUNT(*) FROM prompts")
     if cursor.fetchone()[0] > 0:
-        conn.close()
+        if should_close:
+            conn.close()
         return
 
     # 필요한 폴더와 태그가 있는지 확인하고 없으면 기본 데이터 생성
@@ -447,74 +657,269 @@ def add_sample_prompts():
                 (prompt_id, var_name, default_value),
             )
 
-    conn.commit()
-    conn.close()
+    if should_close:
+        conn.commit()
+        conn.close()
 
 
-def migrate_collections_tables():
+def _create_collection_tables(cursor):
     """collections 및 collection_prompts 테이블이 없으면 추가합니다."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    # collections 테이블이 없으면 추가
+    if not _table_exists(cursor, "collections"):
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS collections (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
 
-    try:
-        # 테이블 목록 확인
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [table[0] for table in cursor.fetchall()]
+        # 기본 컬렉션 추가
+        cursor.execute(
+            """
+            INSERT INTO collections (name)
+            VALUES ('자주 사용하는 프롬프트')
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO collections (name)
+            VALUES ('유용한 템플릿')
+            """
+        )
+        print("collections 테이블과 기본 컬렉션이 추가되었습니다.")
 
-        # collections 테이블이 없으면 추가
-        if "collections" not in tables:
-            print("collections 테이블이 없어 새로 생성합니다.")
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS collections (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-            )
+    # 컬렉션-프롬프트 관계 테이블
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS collection_prompts (
+            collection_id INTEGER,
+            prompt_id INTEGER,
+            position INTEGER DEFAULT 0,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (collection_id, prompt_id),
+            FOREIGN KEY (collection_id) REFERENCES collections(id) ON DELETE CASCADE,
+            FOREIGN KEY (prompt_id) REFERENCES prompts(id) ON DELETE CASCADE
+        )
+        """
+    )
+
+
+def _add_prompt_memo(cursor):
+    """prompts 테이블에 memo 필드가 없으면 추가합니다."""
+    if not _column_exists(cursor, "prompts", "memo"):
+        cursor.execute("ALTER TABLE prompts ADD COLUMN memo TEXT")
+        print("프롬프트 테이블에 memo 필드가 추가되었습니다.")
 
-            # 기본 컬렉션 추가
-            cursor.execute(
-                """
-                INSERT INTO collections (name)
-                VALUES ('자주 사용하는 프롬프트')
-                """
-            )
-            cursor.execute(
-                """
-                INSERT INTO collections (name)
-                VALUES ('유용한 템플릿')
-                """
-            )
-            print("기본 컬렉션이 추가되었습니다.")
 
-        # collection_prompts 테이블이 없으면 추가
-        if "collection_prompts" not in tables:
-            print("collection_prompts 테이블이 없어 새로 생성합니다.")
+# 한국어처럼 띄어쓰기 단위가 검색어와 맞지 않는 텍스트도 부분 일치로 찾을 수 있도록
+# trigram 토크나이저를 사용 (SQLite 3.34 이상). 지원하지 않으면 unicode61로 대체.
+FTS_TOKENIZERS = ("trigram", "unicode61 remove_diacritics 2")
+
+
+def _create_prompts_fts(cursor):
+    """prompts_fts 가상 테이블을 생성하고 사용한 토크나이저를 반환합니다."""
+    for tokenizer in FTS_TOKENIZERS:
+        try:
             cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS collection_prompts (
-                    collection_id INTEGER,
-                    prompt_id INTEGER,
-                    position INTEGER DEFAULT 0,
-                    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (collection_id, prompt_id),
-                    FOREIGN KEY (collection_id) REFERENCES collections(id) ON DELETE CASCADE,
-                    FOREIGN KEY (prompt_id) REFERENCES prompts(id) ON DELETE CASCADE
+                f"""
+                CREATE VIRTUAL TABLE prompts_fts USING fts5(
+                    title, content, memo,
+                    content='prompts', content_rowid='id',
+                    tokenize='{tokenizer}'
                 )
                 """
             )
-            print("collection_prompts 테이블이 추가되었습니다.")
+            return tokenizer
+        except sqlite3.OperationalError as e:
+            last_error = e
+
+    raise last_error
+
+
+def _create_prompts_fts_index(cursor):
+    """prompts_fts 전문 검색 테이블과 동기화 트리거를 생성하고 기존 데이터로 채웁니다."""
+    if not _table_exists(cursor, "prompts_fts"):
+        tokenizer = _create_prompts_fts(cursor)
+        print(f"prompts_fts 테이블이 생성되었습니다. (tokenizer={tokenizer})")
+
+    # prompts 테이블 변경 시 검색 인덱스를 함께 갱신하는 트리거
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS prompts_fts_ai AFTER INSERT ON prompts BEGIN
+            INSERT INTO prompts_fts(rowid, title, content, memo)
+            VALUES (new.id, new.title, new.content, new.memo);
+        END
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS prompts_fts_ad AFTER DELETE ON prompts BEGIN
+            INSERT INTO prompts_fts(prompts_fts, rowid, title, content, memo)
+            VALUES ('delete', old.id, old.title, old.content, old.memo);
+        END
+        """
+    )
+    # 사용 횟수 등 다른 컬럼 변경 시에는 인덱스를 건드리지 않음
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS prompts_fts_au
+        AFTER UPDATE OF title, content, memo ON prompts BEGIN
+            INSERT INTO prompts_fts(prompts_fts, rowid, title, content, memo)
+            VALUES ('delete', old.id, old.title, old.content, old.memo);
+            INSERT INTO prompts_fts(rowid, title, content, memo)
+            VALUES (new.id, new.title, new.content, new.memo);
+        END
+        """
+    )
+
+    # 트리거가 생기기 전의 프롬프트로 인덱스를 채움
+    cursor.execute("INSERT INTO prompts_fts(prompts_fts) VALUES ('rebuild')")
+
+
+def rebuild_prompts_fts(conn=None):
+    """prompts 테이블 내용으로 prompts_fts 검색 인덱스를 처음부터 다시 만듭니다."""
+    if conn is None:
+        conn = get_db_connection()
+        should_close = True
+    else:
+        should_close = False
 
+    try:
+        conn.execute("INSERT INTO prompts_fts(prompts_fts) VALUES ('rebuild')")
         conn.commit()
+    finally:
+        if should_close:
+            conn.close()
+
+
+# 주요 조회 쿼리용 인덱스 (이름, 테이블 및 컬럼/식)
+# 쿼리를 추가/변경할 때는 python manage.py check-query-plans로 실행 계획을 확인하세요.
+INDEXES = (
+    # 폴더별 목록/개수, 폴더 삭제 시 외래 키 확인
+    ("idx_prompts_folder_updated", "prompts(folder_id, updated_at)"),
+    # 즐겨찾기 개수 및 필터
+    ("idx_prompts_favorite_updated", "prompts(is_favorite, updated_at)"),
+    # 키셋 페이지네이션 정렬 키 (rowid=id가 자동으로 보조 키가 됨)
+    ("idx_prompts_updated_at", "prompts(updated_at)"),
+    ("idx_prompts_created_at", "prompts(created_at)"),
+    ("idx_prompts_use_count", "prompts(use_count)"),
+    ("idx_prompts_title", "prompts(title)"),
+    ("idx_prompts_last_used_sort", "prompts(IFNULL(last_used_at, ''))"),
+    # 최근 사용 프롬프트 (NULL 제외 부분 인덱스)
+    (
+        "idx_prompts_last_used_at",
+        "prompts(last_used_at) WHERE last_used_at IS NOT NULL",
+    ),
+    # 태그별 프롬프트 조회와 태그 개수 (prompt_id까지 포함한 커버링 인덱스)
+    ("idx_prompt_tags_tag", "prompt_tags(tag_id, prompt_id)"),
+    # 프롬프트별 변수 조회 및 삭제
+    ("idx_variables_prompt", "variables(prompt_id)"),
+    # 하위 폴더 조회와 형제 폴더 정렬
+    ("idx_folders_parent_position", "folders(parent_id, position)"),
+    # 컬렉션 내 순서 조회
+    ("idx_collection_prompts_position", "collection_prompts(collection_id, position)"),
+    # 프롬프트 삭제 시 컬렉션 연결 정리
+    ("idx_collection_prompts_prompt", "collection_prompts(prompt_id)"),
+)
 
-    except Exception as e:
-        conn.rollback()
-        print(f"컬렉션 테이블 마이그레이션 오류: {str(e)}")
+
+def _create_indexes(cursor):
+    """INDEXES에 정의된 인덱스가 없으면 생성합니다."""
+    for name, definition in INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+
+def _create_folder_closure(cursor):
+    """폴더 클로저 테이블을 만들고 집계 트리거가 이를 사용하도록 다시 만듭니다."""
+    create_folder_closure(cursor)
+    replace_counter_triggers(cursor)
+
+
+# 스키마 마이그레이션 목록 (버전, 설명, 함수)
+# 적용된 마지막 버전은 PRAGMA user_version에 기록되며, 시작 시 그보다 높은 버전만
+# 하나의 트랜잭션으로 실행됩니다. 버전 기록 이전에 만들어진 DB(user_version = 0)에도
+# 안전하도록 각 함수는 이미 적용된 변경을 건너뛰어야 합니다.
+# 스키마를 바꿀 때는 기존 항목을 고치지 말고 목록 끝에 새 버전을 추가하세요.
+MIGRATIONS = (
+    (1, "기본 테이블 생성", _create_core_tables),
+    (2, "폴더 position 필드 추가", _add_folder_positions),
+    (3, "프롬프트 memo 필드 추가", _add_prompt_memo),
+    (4, "컬렉션 테이블 추가", _create_collection_tables),
+    (5, "전문 검색(FTS5) 인덱스 생성", _create_prompts_fts_index),
+    (6, "조회 성능용 인덱스 생성", _create_indexes),
+    (7, "폴더/태그/컬렉션 집계 테이블 생성", create_counter_tables),
+    (8, "폴더 클로저 테이블 생성", _create_folder_closure),
+    (9, "폴더 position을 간격을 둔 값으로 변환", spread_folder_positions),
+    (10, "사용 이벤트 로그와 시간/일 단위 집계 테이블 생성", create_usage_tables),
+    (11, "감쇠 인기 점수(hot_score) 필드 추가", add_hot_score),
+    (12, "유사 프롬프트 인덱스 테이블 생성", create_similarity_tables),
+    (13, "내용 중복 검사용 MinHash/LSH 색인 생성", create_minhash_tables),
+    (14, "의미 기반 검색용 임베딩 상태 테이블 생성", create_embedding_tables),
+    (15, "목록 미리보기용 내용 앞부분 테이블 생성", create_preview_table),
+    (16, "테이블별 데이터 버전과 변경 트리거 생성", create_data_versions_table),
+)
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """데이터베이스에 기록된 스키마 버전(PRAGMA user_version)을 반환합니다."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate_schema(conn=None):
+    """적용되지 않은 마이그레이션을 실행하고 실행한 버전 목록을 반환합니다.
+
+    새 데이터베이스라면 마이그레이션 뒤 기본 데이터와 샘플 프롬프트도 같은
+    트랜잭션 안에서 추가합니다.
+    """
+    if conn is None:
+        conn = get_db_connection()
+        should_close = True
+    else:
+        should_close = False
+
+    try:
+        # 스키마가 최신이면 pragma 한 번만 읽고 끝냄
+        version = get_schema_version(conn)
+        pending = [m for m in MIGRATIONS if m[0] > version]
+        if not pending:
+            return []
+
+        # 다른 연결이 동시에 마이그레이션하지 못하도록 쓰기 잠금을 먼저 잡음
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.cursor()
+            is_new = version == 0 and not _table_exists(cursor, "prompts")
+
+            for target, description, migrate in pending:
+                migrate(cursor)
+                print(f"스키마 마이그레이션 {target} 적용: {description}")
+
+            if is_new:
+                create_default_data(conn)
+                add_sample_prompts(conn)
+                # 기본 폴더도 간격을 둔 position을 갖도록 변환
+                spread_folder_positions(cursor)
+                # 샘플 프롬프트도 내용 중복 검사에 포함
+                index_missing_prompts(cursor)
+
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        # 새 인덱스를 쿼리 플래너가 활용할 수 있도록 통계 갱신
+        conn.execute("PRAGMA optimize")
+        return [m[0] for m in pending]
     finally:
-        conn.close()
+        if should_close:
+            conn.close()
 
 
 # 데이터베이스 초기화 함수 - 애플리케이션 시작 시 호출
@@ -527,18 +932,10 @@ def setup_database():
         # 데이터 디렉토리가 없으면 생성
         os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-        # 데이터베이스 및 테이블 생성
-        init_db()
-
-        # memo 필드 마이그레이션
-        migrate_memo_field()
+        # 테이블 생성, 필드 추가, 인덱스 등 적용되지 않은 마이그레이션 실행
+        migrate_schema()
 
-        # collections 테이블 마이그레이션
-        migrate_collections_tables()
-
-        # 데이터베이스가 새로 생성된 경우에만 샘플 프롬프트 추가
         if not db_exists:
-            add_sample_prompts()
             print(f"새 데이터베이스 생성됨: {DB_PATH}")
         else:
             print(f"기존 데이터베이스 사용 중: {DB_PATH}")
@@ -547,28 +944,3 @@ def setup_database():
     except Exception as e:
         print(f"데이터베이스 설정 오류: {str(e)}")
         return False
-
-
-def migrate_memo_field():
-    """prompts 테이블에 memo 필드가 없으면 추가합니다."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
-        # memo 칼럼이 존재하는지 확인
-        cursor.execute("PRAGMA table_info(prompts)")
-        columns = [column[1] for column in cursor.fetchall()]
-
-        # memo 필드가 없다면 추가
-        if "memo" not in columns:
-            try:
-                cursor.execute("ALTER TABLE prompts ADD COLUMN memo TEXT")
-                conn.commit()
-                print("프롬프트 테이블에 memo 필드가 추가되었습니다.")
-            except Exception as e:
-                print(f"memo 필드 추가 실패: {str(e)}")
-
-    except Exception as e:
-        print(f"memo 필드 마이그레이션 오류: {str(e)}")
-    finally:
-        conn.close()
@@ -0,0 +1,485 @@
+"""문자 n-gram 해싱 벡터로 내용이 비슷한 프롬프트를 찾는 로컬 임베딩 인덱스
+
+네트워크나 학습된 모델 없이, 제목과 내용의 문자 n-gram(EMBEDDING_NGRAMS)을
+crc32로 EMBEDDING_DIM 차원에 해싱해 부호를 붙여 더한 뒤 L2 정규화한 벡터를
+임베딩으로 씁니다. 띄어쓰기나 조사가 달라도 음절 조각이 겹치면 가까워지므로 한국어에
+잘 맞고, 어휘 사전이 없어 프롬프트 하나가 바뀌면 그 행만 다시 계산하면 됩니다.
+
+모든 벡터는 (행 수 × EMBEDDING_DIM) 크기의 float32 행렬 하나로 데이터 폴더의
+embeddings/에 .npy 파일로 저장하고 메모리 매핑으로 읽으며, 질의 벡터와의 행렬 곱
+한 번으로 코사인 유사도를 계산합니다. PROMPT_MANAGER_EMBEDDING_QUANTIZE=int8이면
+행마다 배율을 둔 int8 행렬로 저장해 파일과 메모리를 1/4로 줄입니다.
+
+프롬프트의 제목/내용이 바뀌거나 프롬프트가 삭제되면 트리거가 prompt_embedding_dirty에
+표시하고, 백그라운드 작업(refresh_embeddings)이 표시된 행만 파일에서 고치거나 뒤에
+추가합니다. 파일이 DB의 어느 상태를 담고 있는지는 갱신할 때마다 바꾸는 토큰을
+prompt_embedding_state와 메타 파일에 함께 기록해 확인하며, 둘이 다르면(새 DB,
+백업 복원, 갱신 중 중단 등) 처음부터 다시 만듭니다. 검색 요청은 저장된 토큰의
+파일을 읽기만 하고, 최신이 아니면 갱신을 예약한 뒤 지금 열려 있는 행렬로 검색합니다.
+
+numpy가 설치되어 있지 않으면 테이블과 트리거만 유지되고 검색은 사용할 수 없습니다.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import uuid
+import zlib
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EMBEDDING_DIM = 1024
+EMBEDDING_NGRAMS = (2, 3)
+
+# int8로 설정하면 행마다 배율을 둔 8비트 정수로 저장
+EMBEDDING_QUANTIZE = os.environ.get("PROMPT_MANAGER_EMBEDDING_QUANTIZE", "").lower()
+
+# 삭제로 비워 둔 행이 이 비율을 넘으면 파일을 다시 씀
+EMBEDDING_COMPACT_RATIO = 0.25
+
+# 이 값 이하의 코사인 유사도는 우연히 겹친 조각으로 보고 결과에서 제외
+MIN_SEMANTIC_SCORE = 0.05
+
+# 검색 결과 최대 개수
+MAX_SEMANTIC_LIMIT = 100
+
+EMBEDDING_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS prompts_embedding_ai
+    AFTER INSERT ON prompts BEGIN
+        INSERT OR IGNORE INTO prompt_embedding_dirty (prompt_id) VALUES (new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS prompts_embedding_au
+    AFTER UPDATE OF title, content ON prompts
+    WHEN old.title IS NOT new.title OR old.content IS NOT new.content BEGIN
+        INSERT OR IGNORE INTO prompt_embedding_dirty (prompt_id) VALUES (new.id);
+    END
+    """,
+    # 삭제된 프롬프트의 행은 다음 갱신 때 비움
+    """
+    CREATE TRIGGER IF NOT EXISTS prompts_embedding_ad
+    AFTER DELETE ON prompts BEGIN
+        INSERT OR IGNORE INTO prompt_embedding_dirty (prompt_id) VALUES (old.id);
+    END
+    """,
+)
+
+
+def create_embedding_tables(cursor):
+    """임베딩 파일 상태/변경 표시 테이블과 트리거를 만듭니다. 파일은 백그라운드에서 만들어집니다."""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prompt_embedding_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            token TEXT
+        )
+        """
+    )
+    cursor.execute("INSERT OR IGNORE INTO prompt_embedding_state (id) VALUES (1)")
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prompt_embedding_dirty (
+            prompt_id INTEGER PRIMARY KEY
+        )
+        """
+    )
+
+    for trigger in EMBEDDING_TRIGGERS:
+        cursor.execute(trigger)
+
+
+def embeddings_available():
+    """numpy가 설치되어 있어 임베딩 검색을 사용할 수 있는지 반환합니다."""
+    return np is not None
+
+
+def _ngram_counts(text):
+    text = re.sub(r"\s+", " ", (text or "").lower()).strip()
+    if not text:
+        return Counter()
+
+    # 단어 경계도 조각에 포함되도록 앞뒤에 공백을 붙임
+    text = f" {text} "
+    counts = Counter()
+    for size in EMBEDDING_NGRAMS:
+        counts.update(text[i : i + size] for i in range(len(text) - size + 1))
+    return counts
+
+
+def embed_text(text):
+    """텍스트의 L2 정규화된 해싱 벡터(float32, EMBEDDING_DIM차원)를 반환합니다."""
+    counts = _ngram_counts(text)
+    if not counts:
+        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+
+    indices = []
+    weights = []
+    for gram, count in counts.items():
+        digest = zlib.crc32(gram.encode("utf-8"))
+        indices.append(digest % EMBEDDING_DIM)
+        # 최상위 비트로 부호를 정해 충돌한 조각끼리 상쇄되도록 함
+        weight = 1.0 + math.log(count)
+        weights.append(-weight if digest & 0x80000000 else weight)
+
+    vector = np.bincount(indices, weights=weights, minlength=EMBEDDING_DIM)
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector.astype(np.float32)
+
+
+def prompt_text(title, content):
+    """프롬프트 임베딩에 쓰는 텍스트를 반환합니다."""
+    return f"{title or ''}\n{content or ''}"
+
+
+def _quantize(matrix):
+    """float32 행렬을 (int8 행렬, 행별 배율)로 변환합니다."""
+    scales = np.abs(matrix).max(axis=1) / 127.0 if len(matrix) else np.zeros(0)
+    safe = np.where(scales > 0, scales, 1.0)[:, None]
+    quantized = np.rint(matrix / safe).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class EmbeddingIndex:
+    """embeddings/ 폴더의 행렬 파일과 행 번호별 프롬프트 ID를 관리합니다.
+
+    파일:
+        <이름>.vectors.npy: 행렬 (float32, 양자화 시 int8)
+        <이름>.scales.npy: 양자화 시 행별 배율
+        <이름>.ids.npy: 행 번호 -> 프롬프트 ID (비운 행은 0)
+        <이름>.json: 토큰과 벡터 설정
+    """
+
+    def __init__(self, db_path):
+        directory = os.path.join(os.path.dirname(db_path), "embeddings")
+        name = os.path.splitext(os.path.basename(db_path))[0]
+        self.directory = directory
+        self._base = os.path.join(directory, name)
+        self._lock = threading.Lock()
+        self._token = None
+        self._vectors = None
+        self._scales = None
+        self._ids = None
+        self._rows = {}
+
+    def _path(self, kind):
+        return f"{self._base}.{kind}"
+
+    def _meta(self, token):
+        return {
+            "token": token,
+            "dim": EMBEDDING_DIM,
+            "ngrams": list(EMBEDDING_NGRAMS),
+            "quantize": EMBEDDING_QUANTIZE == "int8",
+        }
+
+    def _write_meta(self, token):
+        path = self._path("json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self._meta(token), f)
+        os.replace(f"{path}.tmp", path)
+
+    def _save_array(self, kind, array):
+        path = self._path(kind)
+        with open(f"{path}.tmp", "wb") as f:
+            np.save(f, array)
+        os.replace(f"{path}.tmp", path)
+
+    def _close(self):
+        # 메모리 매핑을 놓아야 파일을 바꿀 수 있음
+        self._token = None
+        self._vectors = None
+        self._scales = None
+        self._ids = None
+        self._rows = {}
+
+    def _open(self, token):
+        """파일이 token 상태이면 열고 True, 아니면 False를 반환합니다.
+
+        열지 못하면 지금 열려 있는 행렬을 그대로 둡니다.
+        """
+        if self._token == token:
+            return True
+
+        try:
+            with open(self._path("json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta != self._meta(token):
+                return False
+
+            ids = np.load(self._path("ids.npy"))
+            vectors = np.load(self._path("vectors.npy"), mmap_mode="r+")
+            scales = None
+            if meta["quantize"]:
+                scales = np.load(self._path("scales.npy"), mmap_mode="r+")
+        except (OSError, ValueError, KeyError):
+            return False
+
+        if vectors.shape != (len(ids), EMBEDDING_DIM):
+            return False
+
+        self._ids = ids
+        self._vectors = vectors
+        self._scales = scales
+        self._rows = {
+            int(prompt_id): row for row, prompt_id in enumerate(ids) if prompt_id
+        }
+        self._token = token
+        return True
+
+    def _write(self, ids, matrix, token):
+        """전체 행렬을 새 파일로 쓰고 다시 엽니다."""
+        self._close()
+        os.makedirs(self.directory, exist_ok=True)
+        # 쓰는 도중 중단되면 토큰이 맞지 않아 다시 만들어지도록 메타를 먼저 무효화
+        self._write_meta(None)
+
+        if EMBEDDING_QUANTIZE == "int8":
+            matrix, scales = _quantize(matrix)
+            self._save_array("scales.npy", scales)
+        self._save_array("vectors.npy", matrix)
+        self._save_array("ids.npy", np.asarray(ids, dtype=np.int64))
+
+        self._write_meta(token)
+        self._open(token)
+
+    def _dense_rows(self, rows):
+        """저장된 행을 float32 행렬로 읽습니다."""
+        matrix = np.asarray(self._vectors[rows], dtype=np.float32)
+        if self._scales is not None:
+            matrix *= self._scales[rows][:, None]
+        return matrix
+
+    def _rebuild(self, cursor, token):
+        cursor.execute("SELECT id, title, content FROM prompts ORDER BY id")
+        rows = cursor.fetchall()
+        matrix = np.zeros((len(rows), EMBEDDING_DIM), dtype=np.float32)
+        for i, row in enumerate(rows):
+            matrix[i] = embed_text(prompt_text(row[1], row[2]))
+        self._write([row[0] for row in rows], matrix, token)
+        return len(rows)
+
+    def _apply(self, cursor, dirty_ids, token):
+        """변경 표시된 프롬프트의 행만 고치고, 새 프롬프트는 뒤에 추가합니다."""
+        vectors = {}
+        for start in range(0, len(dirty_ids), 500):
+            batch = dirty_ids[start : start + 500]
+            placeholders = ", ".join(["?"] * len(batch))
+            cursor.execute(
+                f"SELECT id, title, content FROM prompts WHERE id IN ({placeholders})",
+                batch,
+            )
+            for row in cursor.fetchall():
+                vectors[row[0]] = embed_text(prompt_text(row[1], row[2]))
+
+        self._write_meta(None)
+
+        appended_ids = []
+        appended = []
+        for prompt_id in dirty_ids:
+            row = self._rows.get(prompt_id)
+            vector = vectors.get(prompt_id)
+            if row is None:
+                if vector is not None:
+                    appended_ids.append(prompt_id)
+                    appended.append(vector)
+                continue
+
+            if vector is None:
+                # 삭제된 프롬프트의 행은 ID를 0으로 비움
+                del self._rows[prompt_id]
+                self._ids[row] = 0
+                vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+
+            if self._scales is not None:
+                quantized, scales = _quantize(vector[None, :])
+                self._vectors[row] = quantized[0]
+                self._scales[row] = scales[0]
+            else:
+                self._vectors[row] = vector
+
+        empty = len(self._ids) - len(self._rows)
+        if appended or empty > len(self._ids) * EMBEDDING_COMPACT_RATIO:
+            # 행 추가나 정리는 파일 전체를 다시 씀
+            keep = np.flatnonzero(self._ids)
+            ids = np.concatenate([self._ids[keep], appended_ids]).astype(np.int64)
+            matrix = np.concatenate(
+                [self._dense_rows(keep)] + ([np.stack(appended)] if appended else [])
+            )
+            self._write(ids, matrix, token)
+            return
+
+        self._vectors.flush()
+        if self._scales is not None:
+            self._scales.flush()
+        self._save_array("ids.npy", self._ids)
+        self._write_meta(token)
+        self._token = token
+
+    def status(self, conn):
+        """저장된 토큰의 파일을 열고 검색에 쓸 행렬의 상태를 반환합니다.
+
+        파일을 고치거나 쓰기 잠금을 얻지 않습니다. "ready"는 DB와 같은 상태,
+        "stale"은 변경이 반영되기 전의 행렬, "pending"은 아직 열 수 있는 행렬이 없는
+        상태(검색 결과 없음)이며, ready가 아니면 백그라운드 갱신을 예약합니다.
+        """
+        token, dirty = conn.execute(
+            """
+            SELECT token, EXISTS (SELECT 1 FROM prompt_embedding_dirty)
+            FROM prompt_embedding_state WHERE id = 1
+            """
+        ).fetchone()
+
+        with self._lock:
+            current = token is not None and self._open(token)
+            loaded = self._vectors is not None
+
+        if current and not dirty:
+            return "ready"
+
+        schedule_embedding_refresh()
+        return "stale" if loaded else "pending"
+
+    def sync(self, conn):
+        """파일을 DB 상태에 맞춥니다. (백그라운드 작업)
+
+        토큰이 다르면 모든 행을 다시 만들고, 같으면 변경 표시된 행만 고칩니다.
+        """
+        row = conn.execute(
+            """
+            SELECT token, EXISTS (SELECT 1 FROM prompt_embedding_dirty)
+            FROM prompt_embedding_state WHERE id = 1
+            """
+        ).fetchone()
+        if row[0] is not None and row[0] == self._token and not row[1]:
+            return
+
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT token FROM prompt_embedding_state WHERE id = 1")
+                token = cursor.fetchone()[0]
+                cursor.execute("SELECT prompt_id FROM prompt_embedding_dirty")
+                dirty_ids = [row[0] for row in cursor.fetchall()]
+
+                if token is not None and self._open(token) and not dirty_ids:
+                    conn.rollback()
+                    return
+
+                new_token = uuid.uuid4().hex
+                if token is None or self._token != token:
+                    count = self._rebuild(cursor, new_token)
+                    message = f"임베딩 인덱스 생성: 프롬프트 {count}개"
+                else:
+                    self._apply(cursor, dirty_ids, new_token)
+                    message = f"임베딩 인덱스 갱신: 변경된 프롬프트 {len(dirty_ids)}개"
+
+                cursor.execute("DELETE FROM prompt_embedding_dirty")
+                cursor.execute(
+                    "UPDATE prompt_embedding_state SET token = ? WHERE id = 1",
+                    (new_token,),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                # 파일과 DB 중 어느 쪽이 반영됐는지 알 수 없으므로 다음에 다시 확인
+                self._close()
+                raise
+
+        print(message)
+
+    def vector(self, prompt_id):
+        """저장된 프롬프트 벡터를 반환합니다. 없으면 None입니다."""
+        with self._lock:
+            row = self._rows.get(prompt_id)
+            if row is None:
+                return None
+            return self._dense_rows([row])[0]
+
+    def search(self, query, limit, exclude_id=None):
+        """query 벡터와 코사인 유사도가 높은 순으로 (프롬프트 ID, 유사도) 목록을 반환합니다."""
+        with self._lock:
+            if self._vectors is None or not len(self._ids):
+                return []
+
+            # 모든 행이 정규화되어 있으므로 내적이 곧 코사인 유사도
+            scores = self._vectors @ query
+            if self._scales is not None:
+                scores *= self._scales
+            if exclude_id in self._rows:
+                scores[self._rows[exclude_id]] = 0
+
+            candidates = np.flatnonzero(scores > MIN_SEMANTIC_SCORE)
+            if len(candidates) > limit:
+                top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+                candidates = candidates[top]
+
+            results = [(int(self._ids[row]), float(scores[row])) for row in candidates]
+
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_embedding_index():
+    """현재 데이터베이스 파일의 임베딩 인덱스를 반환합니다."""
+    # db.database가 마이그레이션용으로 이 모듈을 가져오므로 순환 참조를 피해 여기서 가져옴
+    from db import database
+
+    with _indexes_lock:
+        index = _indexes.get(database.DB_PATH)
+        if index is None:
+            index = _indexes[database.DB_PATH] = EmbeddingIndex(database.DB_PATH)
+        return index
+
+
+def refresh_embeddings(conn):
+    """변경 표시된 프롬프트를 임베딩 파일에 반영합니다. (백그라운드 작업)"""
+    if embeddings_available():
+        get_embedding_index().sync(conn)
+
+
+def schedule_embedding_refresh():
+    """변경 표시된 프롬프트를 반영하는 백그라운드 작업을 예약합니다."""
+    from db.background import submit_task
+
+    submit_task("embedding-refresh", refresh_embeddings)
+
+
+def embedding_status(conn):
+    """검색 전에 임베딩 파일을 열고 상태를 반환합니다. ("ready", "stale", "pending")
+
+    요청 경로에서는 파일을 갱신하지 않으며, 최신이 아니면 백그라운드 갱신을 예약하고
+    지금 열려 있는 행렬로 검색합니다.
+    """
+    return get_embedding_index().status(conn)
+
+
+def semantic_search(text, limit):
+    """자유 텍스트와 비슷한 프롬프트의 (ID, 유사도) 목록을 반환합니다."""
+    query = embed_text(text)
+    if not query.any():
+        return []
+    return get_embedding_index().search(query, limit)
+
+
+def semantic_similar(prompt_id, limit):
+    """prompt_id와 내용이 비슷한 프롬프트의 (ID, 유사도) 목록을 반환합니다."""
+    index = get_embedding_index()
+    query = index.vector(prompt_id)
+    if query is None or not query.any():
+        return []
+    return index.search(query, limit, exclude_id=prompt_id)
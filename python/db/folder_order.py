@@ -0,0 +1,75 @@
+"""간격을 둔 position 값으로 형제 폴더의 순서를 관리하는 도우미
+
+형제 폴더의 position 사이에 POSITION_GAP만큼 간격을 두므로, 폴더를 옮길 때는
+앞뒤 폴더 position의 중간값을 계산해 옮긴 폴더 한 행만 갱신하면 됩니다.
+정수 중간값이 남지 않으면 소수 position을 쓰고, 그 형제 그룹은 백그라운드에서
+다시 간격을 벌립니다(rebalance_sibling_positions).
+"""
+
+import math
+
+POSITION_GAP = 1024
+
+
+def position_between(before, after):
+    """before와 after 사이의 position을 반환합니다. None은 그쪽에 폴더가 없다는 뜻입니다."""
+    if before is None and after is None:
+        return POSITION_GAP
+    if before is None:
+        return after - POSITION_GAP
+    if after is None:
+        return math.floor(before) + POSITION_GAP
+
+    middle = (before + after) / 2
+    if after - before >= 2:
+        # 간격이 2 이상이면 사이에 정수가 반드시 있음
+        return math.floor(middle)
+    return middle
+
+
+def needs_rebalance(position):
+    """간격이 소진되어 소수 position이 쓰였는지 확인합니다."""
+    return position != math.floor(position)
+
+
+def _spread_positions(cursor, where="", params=None):
+    # 현재 순서(position, id)를 유지한 채 POSITION_GAP 간격으로 다시 번호를 매기고
+    # 값이 바뀌는 행만 갱신
+    cursor.execute(
+        f"""
+        UPDATE folders
+        SET position = ranked.rank * :gap
+        FROM (
+            SELECT id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY parent_id ORDER BY position, id
+                   ) AS rank
+            FROM folders
+            {where}
+        ) AS ranked
+        WHERE folders.id = ranked.id
+          AND folders.position IS NOT ranked.rank * :gap
+        """,
+        {"gap": POSITION_GAP, **(params or {})},
+    )
+    return cursor.rowcount
+
+
+def spread_folder_positions(cursor):
+    """모든 형제 그룹의 position을 POSITION_GAP 간격으로 다시 매깁니다."""
+    return _spread_positions(cursor)
+
+
+def rebalance_sibling_positions(conn, parent_id):
+    """parent_id 아래 형제 폴더의 position 간격을 다시 벌립니다. (백그라운드 작업)"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        updated = _spread_positions(
+            conn.cursor(), "WHERE parent_id IS :parent_id", {"parent_id": parent_id}
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    print(f"폴더 position 재정렬: 부모={parent_id}, {updated}개 갱신")
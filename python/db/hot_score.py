@@ -0,0 +1,95 @@
+"""시간이 지날수록 감쇠하는 프롬프트 인기 점수(hot score)
+
+현재 점수는 사용할 때마다 score = score * exp(-λΔt) + 1로 갱신되는 값, 즉
+Σ exp(-λ(now - 사용 시각))입니다. 이 값을 그대로 저장하면 시간이 지날 때마다
+모든 행을 다시 계산해야 하므로, prompts.hot_score에는 기준 시각(HOT_SCORE_EPOCH)으로
+환산한 로그 값 ln Σ exp(λ(사용 시각 - 기준 시각))을 저장합니다. 모든 프롬프트가
+같은 비율로 감쇠하므로 이 값의 순서가 곧 현재 점수의 순서이고, 사용할 때마다
+한 행만 O(1)로 갱신하면 되며 인덱스를 그대로 정렬에 쓸 수 있습니다.
+"""
+
+import datetime
+import math
+import os
+
+# 점수가 절반으로 줄어드는 기간(일)
+HOT_SCORE_HALF_LIFE_DAYS = float(
+    os.environ.get("PROMPT_MANAGER_HOT_SCORE_HALF_LIFE_DAYS", "7")
+)
+
+HOT_SCORE_EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+# 초당 감쇠율 λ
+_DECAY_RATE = math.log(2) / (HOT_SCORE_HALF_LIFE_DAYS * 86400)
+
+
+def _parse_used_at(used_at):
+    moment = datetime.datetime.fromisoformat(used_at.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment
+
+
+def _log_weight(moment):
+    return _DECAY_RATE * (moment - HOT_SCORE_EPOCH).total_seconds()
+
+
+def log_add(a, b):
+    """ln(exp(a) + exp(b))를 넘침 없이 계산합니다. None은 0점(사용 기록 없음)입니다."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def usage_hot_score(used_at_list):
+    """사용 시각(ISO 문자열) 목록이 더하는 저장용 점수를 반환합니다."""
+    score = None
+    for used_at in used_at_list:
+        score = log_add(score, _log_weight(_parse_used_at(used_at)))
+    return score
+
+
+def current_hot_score(stored, now=None):
+    """저장된 값을 지금 시각 기준의 감쇠된 점수로 변환합니다."""
+    if stored is None:
+        return 0.0
+    if now is None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+    return math.exp(stored - _log_weight(now))
+
+
+def add_hot_score(cursor):
+    """prompts.hot_score 컬럼과 인덱스를 추가하고 기존 사용 기록으로 초기값을 채웁니다.
+
+    사용 시각별 기록이 없으므로 기존 사용 횟수가 모두 마지막 사용 시각에
+    있었던 것으로 계산합니다.
+    """
+    cursor.execute("PRAGMA table_info(prompts)")
+    if "hot_score" not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE prompts ADD COLUMN hot_score REAL")
+
+    cursor.execute(
+        """
+        SELECT id, use_count, last_used_at FROM prompts
+        WHERE use_count > 0 AND last_used_at IS NOT NULL AND hot_score IS NULL
+        """
+    )
+    updates = []
+    for row in cursor.fetchall():
+        try:
+            moment = _parse_used_at(row[2])
+        except ValueError:
+            continue
+        updates.append((math.log(row[1]) + _log_weight(moment), row[0]))
+    cursor.executemany("UPDATE prompts SET hot_score = ? WHERE id = ?", updates)
+
+    # 사용 기록이 있는 프롬프트만 담는 부분 인덱스 (상위 K개를 역순으로 바로 읽음)
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_prompts_hot_score
+        ON prompts(hot_score) WHERE hot_score IS NOT NULL
+        """
+    )
@@ -0,0 +1,115 @@
+"""프롬프트 목록에 태그와 변수를 일괄 조회로 채워 넣는 하이드레이션 계층"""
+
+# SQLite 바인딩 파라미터 한도(기본 999)를 넘지 않도록 IN 절을 나눠서 조회
+IN_BATCH_SIZE = 500
+
+
+def batched(ids):
+    """ID 목록을 IN_BATCH_SIZE 단위로 나눕니다."""
+    ids = list(dict.fromkeys(ids))
+    for start in range(0, len(ids), IN_BATCH_SIZE):
+        yield ids[start : start + IN_BATCH_SIZE]
+
+
+def fetch_tags_by_prompt(conn, prompt_ids):
+    """프롬프트 ID별 태그 목록을 {prompt_id: [tag, ...]} 형태로 반환합니다."""
+    tags_by_prompt = {}
+
+    for batch in batched(prompt_ids):
+        placeholders = ", ".join(["?"] * len(batch))
+        cursor = conn.execute(
+            f"""
+            SELECT pt.prompt_id, t.id, t.name, t.color
+            FROM prompt_tags pt
+            JOIN tags t ON t.id = pt.tag_id
+            WHERE pt.prompt_id IN ({placeholders})
+            ORDER BY pt.prompt_id, pt.tag_id
+            """,
+            batch,
+        )
+        for row in cursor:
+            tags_by_prompt.setdefault(row["prompt_id"], []).append(
+                {"id": row["id"], "name": row["name"], "color": row["color"]}
+            )
+
+    return tags_by_prompt
+
+
+def fetch_variables_by_prompt(conn, prompt_ids):
+    """프롬프트 ID별 변수 목록을 {prompt_id: [variable, ...]} 형태로 반환합니다."""
+    variables_by_prompt = {}
+
+    for batch in batched(prompt_ids):
+        placeholders = ", ".join(["?"] * len(batch))
+        cursor = conn.execute(
+            f"""
+            SELECT prompt_id, id, name, default_value
+            FROM variables
+            WHERE prompt_id IN ({placeholders})
+            ORDER BY prompt_id, id
+            """,
+            batch,
+        )
+        for row in cursor:
+            variables_by_prompt.setdefault(row["prompt_id"], []).append(
+                {
+                    "id": row["id"],
+                    "name": row["name"],
+                    "default_value": row["default_value"],
+                }
+            )
+
+    return variables_by_prompt
+
+
+def hydrate_prompts(conn, prompts, tags=True, variables=True):
+    """프롬프트 dict 목록에 tags/variables 필드를 일정한 횟수의 쿼리로 채웁니다.
+
+    프롬프트 수와 관계없이 (프롬프트 수 / IN_BATCH_SIZE)번의 조회만 수행합니다.
+    """
+    if not prompts:
+        return prompts
+
+    prompt_ids = [prompt["id"] for prompt in prompts]
+
+    if tags:
+        tags_by_prompt = fetch_tags_by_prompt(conn, prompt_ids)
+        for prompt in prompts:
+            prompt["tags"] = tags_by_prompt.get(prompt["id"], [])
+
+    if variables:
+        variables_by_prompt = fetch_variables_by_prompt(conn, prompt_ids)
+        for prompt in prompts:
+            prompt["variables"] = variables_by_prompt.get(prompt["id"], [])
+
+    return prompts
+
+
+def fetch_scored_prompts(conn, scored, score_name="similarity_score"):
+    """(프롬프트 ID, 점수) 목록 순서대로 프롬프트 요약을 조회해 score_name 필드에 점수를 넣습니다.
+
+    그사이 삭제된 프롬프트는 건너뜁니다.
+    """
+    rows = {}
+    for batch in batched([prompt_id for prompt_id, _ in scored]):
+        placeholders = ", ".join(["?"] * len(batch))
+        cursor = conn.execute(
+            f"""
+            SELECT p.id, p.title, p.content, p.folder_id, f.name as folder,
+                   p.is_favorite, p.use_count
+            FROM prompts p
+            LEFT JOIN folders f ON p.folder_id = f.id
+            WHERE p.id IN ({placeholders})
+            """,
+            batch,
+        )
+        for row in cursor:
+            rows[row["id"]] = dict(row)
+
+    prompts = []
+    for prompt_id, score in scored:
+        if prompt_id in rows:
+            prompt = rows[prompt_id]
+            prompt[score_name] = score
+            prompts.append(prompt)
+    return prompts
@@ -0,0 +1,170 @@
+"""큰 JSON 응답을 한 번에 만들지 않고 조각 단위로 내보내는 스트리밍 인코더
+
+전체 목록/내보내기처럼 큰 응답은 모든 행을 dict 목록으로 만든 뒤 jsonify로 한
+문자열을 만들면 행 목록, 문자열, 바이트가 동시에 메모리에 올라갑니다.
+JSONArrayStream으로 감싼 행 이터레이터는 행을 하나씩 인코딩해 약
+STREAM_CHUNK_SIZE 바이트씩 보내므로, 메모리에는 읽는 중인 배치만 남습니다.
+
+출력은 같은 값을 jsonify한 결과와 바이트 단위로 같습니다 (앱 JSON 설정의
+sort_keys/ensure_ascii/들여쓰기와 끝의 줄바꿈까지). orjson이 설치되어 있고
+app.json.ensure_ascii가 꺼져 있으면 행 인코딩에 orjson을 쓰며, orjson이 다르게
+쓰는 값(지수 표기 실수, NaN, 64비트를 넘는 정수 등)이 있는 행만 표준 json으로
+인코딩합니다. 기본 설정(ensure_ascii 켜짐)에서는 orjson 출력을 같은 바이트로
+만들 수 없으므로 C 가속 표준 json 인코더를 씁니다.
+"""
+
+import json
+import math
+
+from flask import Response, current_app
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 한 번에 보내는 응답 조각 크기 (바이트)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# orjson은 이 범위 밖의 실수를 표준 json과 다른 지수 표기로 씀 (예: 1e-05 -> 0.00001)
+_ORJSON_FLOAT_RANGE = (1e-4, 1e16)
+
+
+class JSONArrayStream:
+    """stream_json_response에 넘긴 값 안에서 JSON 배열로 인코딩할 행 이터레이터
+
+    이터레이터는 응답을 보내는 동안 소비되므로, 데이터베이스 연결이 필요하면
+    이터레이터 안에서 빌려야 합니다.
+    """
+
+    def __init__(self, items):
+        self.items = items
+
+
+def _materialize(value):
+    if isinstance(value, JSONArrayStream):
+        return list(value.items)
+    if isinstance(value, dict):
+        return {key: _materialize(item) for key, item in value.items()}
+    return value
+
+
+def _orjson_safe(row):
+    """행의 최상위 실수가 orjson과 표준 json에서 같은 표기인지 반환합니다."""
+    values = row.values() if isinstance(row, dict) else (row,)
+    low, high = _ORJSON_FLOAT_RANGE
+    for value in values:
+        if type(value) is float and value != 0:
+            if not math.isfinite(value) or not low <= abs(value) < high:
+                return False
+    return True
+
+
+def _value_encoder(provider, indent):
+    """앱 JSON 설정과 같은 출력을 바이트로 내는 값 인코더를 반환합니다."""
+    separators = (",", ": ") if indent else (",", ":")
+    stdlib_encode = json.JSONEncoder(
+        default=provider.default,
+        ensure_ascii=provider.ensure_ascii,
+        sort_keys=provider.sort_keys,
+        indent=indent,
+        separators=separators,
+    ).encode
+
+    def encode(value):
+        return stdlib_encode(value).encode("utf-8")
+
+    if orjson is None or indent or provider.ensure_ascii:
+        return encode
+
+    options = (
+        orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+        | orjson.OPT_PASSTHROUGH_SUBCLASS
+    )
+    if provider.sort_keys:
+        options |= orjson.OPT_SORT_KEYS
+
+    def encode_fast(value):
+        if _orjson_safe(value):
+            try:
+                return orjson.dumps(value, default=provider.default, option=options)
+            except TypeError:
+                pass
+        return encode(value)
+
+    return encode_fast
+
+
+def _iter_json(value, encode, indent, sort_keys, level=0):
+    # 들여쓰기 모드에서 이 깊이와 한 단계 안쪽 줄의 시작
+    padding = b"\n" + b" " * (indent * level) if indent else b""
+    inner_padding = b"\n" + b" " * (indent * (level + 1)) if indent else b""
+
+    if isinstance(value, JSONArrayStream):
+        yield b"["
+        separator = inner_padding
+        for item in value.items:
+            encoded = encode(item)
+            if indent:
+                # 문자열 안의 줄바꿈은 \n으로 이스케이프되므로 줄 시작만 들여씀
+                encoded = encoded.replace(b"\n", inner_padding)
+            yield separator + encoded
+            separator = b"," + inner_padding
+        if separator != inner_padding:
+            yield padding
+        yield b"]"
+        return
+
+    if isinstance(value, dict) and value:
+        key_separator = b": " if indent else b":"
+        yield b"{"
+        for position, key in enumerate(sorted(value) if sort_keys else value):
+            yield (b"," if position else b"") + inner_padding
+            yield encode(str(key)) + key_separator
+            yield from _iter_json(value[key], encode, indent, sort_keys, level + 1)
+        yield padding + b"}"
+        return
+
+    encoded = encode(value)
+    if indent:
+        encoded = encoded.replace(b"\n", padding)
+    yield encoded
+
+
+def _chunks(pieces):
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= STREAM_CHUNK_SIZE:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    buffer.append(b"\n")
+    yield b"".join(buffer)
+
+
+def stream_json_response(value):
+    """value를 jsonify와 같은 JSON 응답으로 조각 단위로 보냅니다.
+
+    value 안의 JSONArrayStream은 행을 하나씩 인코딩하며, 나머지 값은 한 번에
+    인코딩합니다. 스트리밍 중 발생한 오류는 상태 코드로 알릴 수 없으므로,
+    실패할 수 있는 조회는 응답을 만들기 전에 해야 합니다.
+    """
+    app = current_app
+    provider = app.json
+    if not hasattr(provider, "ensure_ascii"):
+        # 기본 JSON 제공자가 아니면 출력 형식을 알 수 없으므로 한 번에 인코딩
+        return provider.response(_materialize(value))
+
+    compact = provider.compact
+    indent = 2 if (compact is None and app.debug) or compact is False else None
+    encode = _value_encoder(provider, indent)
+
+    # 응답을 보내는 동안에는 앱 컨텍스트가 없으므로 설정을 미리 읽어 둠
+    return Response(
+        _chunks(_iter_json(value, encode, indent, provider.sort_keys)),
+        mimetype=provider.mimetype,
+    )
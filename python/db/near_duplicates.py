@@ -0,0 +1,244 @@
+"""MinHash 서명과 LSH 버킷으로 내용이 거의 같은 프롬프트를 찾는 인덱스
+
+프롬프트 내용을 MINHASH_SHINGLE_SIZE 글자 단위 조각(shingle)의 집합으로 보고,
+MINHASH_NUM_PERM개의 해시 함수 각각의 최솟값으로 만든 서명을 prompt_minhash에
+저장합니다. 서명을 LSH_ROWS개씩 LSH_BANDS개 밴드로 나눠 밴드별 해시를
+prompt_lsh_buckets에 저장하면, 자카드 유사도가 높은 프롬프트끼리는 적어도 한 밴드의
+버킷이 같을 확률이 높으므로 같은 버킷의 프롬프트만 후보로 비교하면 됩니다.
+후보는 실제 조각 집합의 자카드 유사도로 다시 확인합니다.
+"""
+
+import array
+import hashlib
+import re
+
+MINHASH_SHINGLE_SIZE = 5
+MINHASH_NUM_PERM = 128
+# 밴드당 8개 값: 유사도 0.8인 쌍은 약 95%, 0.5인 쌍은 약 6%만 후보가 됨
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_NUM_PERM // LSH_BANDS
+
+# 중복으로 판단하는 기본 자카드 유사도
+DUPLICATE_THRESHOLD = 0.8
+
+# blake2b 한 번에 64바이트(32비트 해시 16개)를 얻으므로 해시 함수 16개마다 키를 바꿈
+_HASH_PERSONS = [b"minhash%d" % i for i in range(MINHASH_NUM_PERM // 16)]
+
+
+def create_minhash_tables(cursor):
+    """MinHash 서명/LSH 버킷 테이블을 만들고 기존 프롬프트를 색인합니다."""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prompt_minhash (
+            prompt_id INTEGER PRIMARY KEY,
+            signature BLOB NOT NULL,
+            FOREIGN KEY (prompt_id) REFERENCES prompts (id) ON DELETE CASCADE
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prompt_lsh_buckets (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            prompt_id INTEGER NOT NULL,
+            PRIMARY KEY (band, bucket, prompt_id),
+            FOREIGN KEY (prompt_id) REFERENCES prompts (id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        """
+    )
+    # 재색인/삭제 시 프롬프트별 조회용
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_prompt_lsh_buckets_prompt
+        ON prompt_lsh_buckets(prompt_id)
+        """
+    )
+
+    index_missing_prompts(cursor)
+
+
+def index_missing_prompts(cursor):
+    """색인되지 않은 프롬프트의 서명과 버킷을 계산합니다."""
+    cursor.execute(
+        """
+        SELECT id, content FROM prompts
+        WHERE id NOT IN (SELECT prompt_id FROM prompt_minhash)
+        """
+    )
+    for row in cursor.fetchall():
+        index_prompt_content(cursor, row[0], row[1])
+
+
+def shingles(content):
+    """공백을 정리한 소문자 내용의 글자 조각 집합을 반환합니다."""
+    text = re.sub(r"\s+", " ", (content or "").lower()).strip()
+    if len(text) <= MINHASH_SHINGLE_SIZE:
+        return {text} if text else set()
+    return {
+        text[i : i + MINHASH_SHINGLE_SIZE]
+        for i in range(len(text) - MINHASH_SHINGLE_SIZE + 1)
+    }
+
+
+def jaccard(a, b):
+    """두 집합의 자카드 유사도를 반환합니다."""
+    if not a or not b:
+        return 0.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+def minhash_signature(shingle_set):
+    """조각 집합의 MinHash 서명(32비트 정수 MINHASH_NUM_PERM개)을 반환합니다."""
+    rows = []
+    for shingle in shingle_set:
+        data = shingle.encode("utf-8")
+        rows.append(
+            array.array(
+                "I",
+                b"".join(
+                    hashlib.blake2b(data, digest_size=64, person=person).digest()
+                    for person in _HASH_PERSONS
+                ),
+            )
+        )
+    return array.array("I", [min(column) for column in zip(*rows)])
+
+
+def _band_buckets(signature):
+    for band in range(LSH_BANDS):
+        values = signature[band * LSH_ROWS : (band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(values.tobytes(), digest_size=8).digest()
+        yield band, int.from_bytes(digest, "little", signed=True)
+
+
+def index_prompt_content(cursor, prompt_id, content):
+    """프롬프트의 서명과 LSH 버킷을 다시 계산해 저장합니다. 트랜잭션은 호출하는 쪽에서 관리합니다."""
+    cursor.execute("DELETE FROM prompt_lsh_buckets WHERE prompt_id = ?", (prompt_id,))
+    cursor.execute("DELETE FROM prompt_minhash WHERE prompt_id = ?", (prompt_id,))
+
+    shingle_set = shingles(content)
+    if not shingle_set:
+        return
+
+    signature = minhash_signature(shingle_set)
+    cursor.execute(
+        "INSERT INTO prompt_minhash (prompt_id, signature) VALUES (?, ?)",
+        (prompt_id, signature.tobytes()),
+    )
+    cursor.executemany(
+        "INSERT INTO prompt_lsh_buckets (band, bucket, prompt_id) VALUES (?, ?, ?)",
+        [(band, bucket, prompt_id) for band, bucket in _band_buckets(signature)],
+    )
+
+
+def copy_prompt_index(cursor, source_id, prompt_id):
+    """내용이 같은 프롬프트(복제본)의 서명과 버킷을 그대로 복사합니다."""
+    cursor.execute(
+        """
+        INSERT INTO prompt_minhash (prompt_id, signature)
+        SELECT ?, signature FROM prompt_minhash WHERE prompt_id = ?
+        """,
+        (prompt_id, source_id),
+    )
+    cursor.execute(
+        """
+        INSERT INTO prompt_lsh_buckets (band, bucket, prompt_id)
+        SELECT band, bucket, ? FROM prompt_lsh_buckets WHERE prompt_id = ?
+        """,
+        (prompt_id, source_id),
+    )
+
+
+def find_similar_content(
+    cursor, content, threshold=DUPLICATE_THRESHOLD, exclude_id=None
+):
+    """content와 자카드 유사도가 threshold 이상인 프롬프트를 유사도 순으로 반환합니다."""
+    shingle_set = shingles(content)
+    if not shingle_set:
+        return []
+
+    buckets = list(_band_buckets(minhash_signature(shingle_set)))
+    conditions = " OR ".join(["(b.band = ? AND b.bucket = ?)"] * len(buckets))
+    cursor.execute(
+        f"""
+        SELECT DISTINCT p.id, p.title, p.content
+        FROM prompt_lsh_buckets b
+        JOIN prompts p ON p.id = b.prompt_id
+        WHERE ({conditions}) AND p.id IS NOT ?
+        """,
+        [value for bucket in buckets for value in bucket] + [exclude_id],
+    )
+
+    matches = []
+    for row in cursor.fetchall():
+        similarity = jaccard(shingle_set, shingles(row["content"]))
+        if similarity >= threshold:
+            matches.append(
+                {"id": row["id"], "title": row["title"], "similarity": similarity}
+            )
+    matches.sort(key=lambda match: (-match["similarity"], match["id"]))
+    return matches
+
+
+def duplicate_clusters(cursor, threshold=DUPLICATE_THRESHOLD):
+    """자카드 유사도가 threshold 이상인 프롬프트 쌍을 이어 만든 묶음 목록을 반환합니다.
+
+    같은 LSH 버킷을 공유하는 쌍만 비교하므로 전체 쌍을 비교하지 않습니다.
+    각 묶음은 {"prompt_ids": [...], "similarity": 묶음 안 쌍의 최고 유사도}입니다.
+    """
+    cursor.execute(
+        """
+        SELECT DISTINCT a.prompt_id AS first_id, b.prompt_id AS second_id
+        FROM prompt_lsh_buckets a
+        JOIN prompt_lsh_buckets b
+          ON b.band = a.band AND b.bucket = a.bucket AND b.prompt_id > a.prompt_id
+        """
+    )
+    candidates = [(row[0], row[1]) for row in cursor.fetchall()]
+    if not candidates:
+        return []
+
+    candidate_ids = sorted({prompt_id for pair in candidates for prompt_id in pair})
+    placeholders = ", ".join(["?"] * len(candidate_ids))
+    cursor.execute(
+        f"SELECT id, content FROM prompts WHERE id IN ({placeholders})", candidate_ids
+    )
+    shingle_sets = {row[0]: shingles(row[1]) for row in cursor.fetchall()}
+
+    # 유니온-파인드로 기준 이상인 쌍을 묶음으로 합침
+    parents = {}
+
+    def find(prompt_id):
+        root = prompt_id
+        while parents.get(root, root) != root:
+            root = parents[root]
+        parents[prompt_id] = root
+        return root
+
+    best = {}
+    for first_id, second_id in candidates:
+        similarity = jaccard(shingle_sets[first_id], shingle_sets[second_id])
+        if similarity < threshold:
+            continue
+        first_root, second_root = find(first_id), find(second_id)
+        if first_root != second_root:
+            parents[max(first_root, second_root)] = min(first_root, second_root)
+        best[first_id] = max(best.get(first_id, 0.0), similarity)
+        best[second_id] = max(best.get(second_id, 0.0), similarity)
+
+    clusters = {}
+    for prompt_id in best:
+        clusters.setdefault(find(prompt_id), []).append(prompt_id)
+
+    return sorted(
+        (
+            {
+                "prompt_ids": sorted(prompt_ids),
+                "similarity": max(best[prompt_id] for prompt_id in prompt_ids),
+            }
+            for prompt_ids in clusters.values()
+        ),
+        key=lambda cluster: (-len(cluster["prompt_ids"]), cluster["prompt_ids"][0]),
+    )
@@ -0,0 +1,236 @@
+"""목록 API의 응답 필드 선택(fields=)과 하이드레이션 선택(include=)
+
+fields=title,use_count처럼 필요한 필드만 요청하면 SQL이 그 컬럼과 조인만 읽고
+(folder를 요청하지 않으면 folders 조인 없음), include=tags,variables로 태그/변수
+일괄 조회 여부를 고릅니다. 파라미터가 없으면 엔드포인트의 기존 응답과 같습니다.
+
+content_preview는 prompt_previews에 트리거로 저장해 두는 내용 앞부분
+(CONTENT_PREVIEW_LENGTH자)이므로, 목록에서 긴 내용 전체를 읽지 않고 미리보기를
+보여줄 수 있습니다.
+
+format=normalized이면 프롬프트마다 태그 객체와 폴더 이름을 반복하지 않고, 최상위
+tags/folders에 ID를 키로 한 번씩 담은 뒤 프롬프트에는 tag_ids와 folder_id만
+남깁니다. 이때 folder는 폴더 조인 대신 응답에 나온 폴더만 한 번에 조회합니다.
+"""
+
+from db.hydration import batched
+
+CONTENT_PREVIEW_LENGTH = 200
+
+# 응답 필드 -> SELECT 식 (prompts p 기준)
+PROMPT_FIELDS = {
+    "id": "p.id",
+    "title": "p.title",
+    "content": "p.content",
+    "content_preview": "IFNULL(pv.preview, '') AS content_preview",
+    "folder_id": "p.folder_id",
+    "folder": "f.name AS folder",
+    "created_at": "p.created_at",
+    "updated_at": "p.updated_at",
+    "is_favorite": "p.is_favorite",
+    "use_count": "p.use_count",
+    "last_used_at": "p.last_used_at",
+    "memo": "p.memo",
+}
+
+# 필드를 읽는 데 필요한 조인
+FIELD_JOINS = {
+    "content_preview": "LEFT JOIN prompt_previews pv ON pv.prompt_id = p.id",
+    "folder": "LEFT JOIN folders f ON p.folder_id = f.id",
+}
+
+INCLUDE_OPTIONS = ("tags", "variables")
+
+# nested: 프롬프트마다 태그 객체/폴더 이름 포함 (기본), normalized: 최상위에 한 번씩
+RESPONSE_FORMATS = ("nested", "normalized")
+
+# 목록 조회(GET /api/prompts) 기본 필드 (prompt_query.PROMPT_LIST_COLUMNS와 같음)
+PROMPT_LIST_FIELDS = (
+    "id",
+    "title",
+    "content",
+    "folder_id",
+    "folder",
+    "created_at",
+    "updated_at",
+    "is_favorite",
+    "use_count",
+    "last_used_at",
+    "memo",
+)
+
+PREVIEW_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS prompts_preview_ai
+    AFTER INSERT ON prompts BEGIN
+        INSERT OR REPLACE INTO prompt_previews (prompt_id, preview)
+        VALUES (new.id, substr(new.content, 1, {CONTENT_PREVIEW_LENGTH}));
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS prompts_preview_au
+    AFTER UPDATE OF content ON prompts
+    WHEN old.content IS NOT new.content BEGIN
+        INSERT OR REPLACE INTO prompt_previews (prompt_id, preview)
+        VALUES (new.id, substr(new.content, 1, {CONTENT_PREVIEW_LENGTH}));
+    END
+    """,
+)
+
+
+def create_preview_table(cursor):
+    """내용 미리보기 테이블과 트리거를 만들고 기존 프롬프트의 미리보기를 채웁니다."""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prompt_previews (
+            prompt_id INTEGER PRIMARY KEY,
+            preview TEXT NOT NULL,
+            FOREIGN KEY (prompt_id) REFERENCES prompts (id) ON DELETE CASCADE
+        )
+        """
+    )
+
+    for trigger in PREVIEW_TRIGGERS:
+        cursor.execute(trigger)
+
+    cursor.execute(
+        f"""
+        INSERT OR IGNORE INTO prompt_previews (prompt_id, preview)
+        SELECT id, substr(content, 1, {CONTENT_PREVIEW_LENGTH}) FROM prompts
+        """
+    )
+
+
+def _parse_names(value, allowed, name):
+    names = [item.strip() for item in value.split(",") if item.strip()]
+    for item in names:
+        if item not in allowed:
+            raise ValueError(f"{name}에 지원하지 않는 값이 있습니다: {item}")
+    return names
+
+
+def parse_format(args):
+    """요청 파라미터에서 응답 형식(format)을 읽어 검증합니다."""
+    response_format = args.get("format", "nested")
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError("format은 nested 또는 normalized여야 합니다.")
+    return response_format
+
+
+def parse_projection(args, default_fields, default_include, extra_fields=()):
+    """요청 파라미터에서 fields/include/format을 읽어 검증합니다.
+
+    파라미터가 없으면 엔드포인트 기본값(default_fields/default_include)을 쓰며,
+    fields에는 PROMPT_FIELDS와 엔드포인트 고유 필드(extra_fields)를 쓸 수 있습니다.
+    id는 항상 포함됩니다. 정규화 형식이면 folder 대신 folder_id를 읽고
+    folders에 폴더 목록이 필요한지 기록합니다. 지원하지 않는 값이 있으면
+    ValueError를 발생시킵니다.
+    """
+    fields = default_fields
+    if "fields" in args:
+        allowed = tuple(PROMPT_FIELDS) + tuple(extra_fields)
+        fields = tuple(
+            dict.fromkeys(["id"] + _parse_names(args["fields"], allowed, "fields"))
+        )
+
+    include = default_include
+    if "include" in args:
+        include = tuple(_parse_names(args["include"], INCLUDE_OPTIONS, "include"))
+
+    response_format = parse_format(args)
+    folders = False
+    if response_format == "normalized" and "folder" in fields:
+        folders = True
+        fields = tuple(
+            dict.fromkeys(
+                "folder_id" if field == "folder" else field for field in fields
+            )
+        )
+
+    return {
+        "fields": fields,
+        "include": frozenset(include),
+        "format": response_format,
+        "folders": folders,
+    }
+
+
+def projection_sql(fields, extra_columns=None):
+    """필드 목록을 SELECT 컬럼 목록과 필요한 조인으로 변환합니다.
+
+    extra_columns는 엔드포인트 고유 필드 -> SELECT 식입니다 (예: cp.position).
+    """
+    columns = []
+    joins = []
+    for field in fields:
+        if extra_columns and field in extra_columns:
+            columns.append(extra_columns[field])
+            continue
+
+        columns.append(PROMPT_FIELDS[field])
+        if field in FIELD_JOINS and FIELD_JOINS[field] not in joins:
+            joins.append(FIELD_JOINS[field])
+
+    return ", ".join(columns), "\n".join(joins)
+
+
+def drop_fields(prompts, fields):
+    """내부 처리(정렬, 사용 내역 반영 등)에만 필요해 읽은 필드를 응답에서 뺍니다."""
+    if fields:
+        for prompt in prompts:
+            for field in fields:
+                prompt.pop(field, None)
+    return prompts
+
+
+def normalize_prompts(conn, prompts, folders=True):
+    """프롬프트 목록을 태그/폴더 객체를 한 번씩만 담는 정규화 형식으로 바꿉니다.
+
+    프롬프트의 tags(태그 객체 목록)는 tag_ids로 바꾸고, 이미 tag_ids만 있으면
+    태그 객체를 한 번에 조회합니다. folder(폴더 이름)는 빼고, folders가 참이면
+    프롬프트의 folder_id에 해당하는 폴더를 한 번에 조회합니다. 반환 형식은
+    {"prompts": [...], "tags": {ID: 태그}, "folders": {ID: 폴더}}입니다.
+    """
+    tags = {}
+    missing_tag_ids = set()
+    for prompt in prompts:
+        prompt.pop("folder", None)
+        if "tags" in prompt:
+            prompt_tags = prompt.pop("tags")
+            prompt["tag_ids"] = [tag["id"] for tag in prompt_tags]
+            for tag in prompt_tags:
+                tags.setdefault(tag["id"], tag)
+        elif "tag_ids" in prompt:
+            missing_tag_ids.update(prompt["tag_ids"])
+
+    missing_tag_ids.difference_update(tags)
+    for batch in batched(sorted(missing_tag_ids)):
+        placeholders = ", ".join(["?"] * len(batch))
+        for row in conn.execute(
+            f"SELECT id, name, color FROM tags WHERE id IN ({placeholders})", batch
+        ):
+            tags[row["id"]] = {
+                "id": row["id"],
+                "name": row["name"],
+                "color": row["color"],
+            }
+
+    folder_objects = {}
+    if folders:
+        folder_ids = {prompt["folder_id"] for prompt in prompts} - {None}
+        for batch in batched(sorted(folder_ids)):
+            placeholders = ", ".join(["?"] * len(batch))
+            for row in conn.execute(
+                f"""
+                SELECT id, name, parent_id FROM folders
+                WHERE id IN ({placeholders})
+                """,
+                batch,
+            ):
+                folder_objects[row["id"]] = {
+                    "id": row["id"],
+                    "name": row["name"],
+                    "parent_id": row["parent_id"],
+                }
+
+    return {"prompts": prompts, "tags": tags, "folders": folder_objects}
@@ -0,0 +1,272 @@
+"""프롬프트 목록 조회용 SQL 빌더 (필터, 정렬, 키셋 페이지네이션)"""
+
+import base64
+import json
+
+from db.tag_expression import parse_tag_expression, tag_expression_sql
+
+# 정렬 키 -> SQL 식. 모든 정렬은 p.id를 보조 키로 사용해 순서를 고정합니다.
+# last_used_at은 NULL이 있어 행 값 비교가 가능하도록 빈 문자열로 치환합니다.
+SORT_FIELDS = {
+    "updated_at": "p.updated_at",
+    "created_at": "p.created_at",
+    "use_count": "p.use_count",
+    "last_used_at": "IFNULL(p.last_used_at, '')",
+    "title": "p.title",
+}
+
+SORT_DIRECTIONS = ("asc", "desc")
+
+DEFAULT_SORT = "updated_at"
+DEFAULT_DIRECTION = "desc"
+
+TAG_MODES = ("any", "all")
+
+# 사이드바의 가상 폴더 ID (folder_routes.get_folders 참고)
+ALL_PROMPTS_FOLDER_ID = -1
+FAVORITES_FOLDER_ID = -2
+
+# 목록 조회 경로를 타게 하는 요청 파라미터
+LIST_QUERY_ARGS = (
+    "limit",
+    "cursor",
+    "sort",
+    "order",
+    "folder_id",
+    "include_descendants",
+    "tag_ids",
+    "tag_mode",
+    "tag_expr",
+    "is_favorite",
+)
+
+# 한 페이지에 반환할 수 있는 최대 프롬프트 수
+MAX_PAGE_LIMIT = 500
+
+# 목록 조회 기본 컬럼
+PROMPT_LIST_COLUMNS = """
+    p.id, p.title, p.content, p.folder_id, f.name as folder,
+    p.created_at, p.updated_at, p.is_favorite,
+    p.use_count, p.last_used_at, p.memo
+"""
+
+
+def encode_cursor(sort, direction, row, total_estimate):
+    """마지막 행의 정렬 키와 ID를 불투명한 커서 문자열로 인코딩합니다."""
+    payload = {
+        "s": sort,
+        "d": direction,
+        "v": row["_sort_key"],
+        "i": row["id"],
+        "t": total_estimate,
+    }
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """커서 문자열을 해석합니다. 형식이 잘못되면 ValueError를 발생시킵니다."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return {
+            "sort": payload["s"],
+            "direction": payload["d"],
+            "value": payload["v"],
+            "id": int(payload["i"]),
+            "total_estimate": payload.get("t"),
+        }
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("유효하지 않은 커서입니다.") from e
+
+
+def _parse_bool(value, name):
+    """'true'/'false', '1'/'0' 형식의 불리언 파라미터를 해석합니다."""
+    if value is None:
+        return None
+    lowered = value.lower()
+    if lowered in ("1", "true", "yes"):
+        return True
+    if lowered in ("0", "false", "no"):
+        return False
+    raise ValueError(f"{name} 값은 true 또는 false여야 합니다.")
+
+
+def _parse_id_list(value, name):
+    """쉼표로 구분된 ID 목록을 정수 리스트로 변환합니다."""
+    if not value:
+        return []
+    try:
+        return list(dict.fromkeys(int(item) for item in value.split(",") if item))
+    except ValueError as e:
+        raise ValueError(f"{name}는 쉼표로 구분된 숫자 목록이어야 합니다.") from e
+
+
+def parse_filter_args(args):
+    """요청 파라미터에서 folder_id/tag_ids/tag_expr/is_favorite 필터를 읽어 검증합니다."""
+    filters = {
+        "folder_id": None,
+        "unfiled": False,
+        "include_descendants": _parse_bool(
+            args.get("include_descendants"), "include_descendants"
+        )
+        or False,
+        "tag_ids": _parse_id_list(args.get("tag_ids"), "tag_ids"),
+        "tag_mode": args.get("tag_mode", "any").lower(),
+        # 태그 이름 식, 예: (GPT-4 AND 요약) AND NOT 번역 (db.tag_expression 참고)
+        "tag_expr": None,
+        "is_favorite": _parse_bool(args.get("is_favorite"), "is_favorite"),
+    }
+
+    if filters["tag_mode"] not in TAG_MODES:
+        raise ValueError(f"지원하지 않는 tag_mode입니다: {filters['tag_mode']}")
+
+    if args.get("tag_expr", "").strip():
+        filters["tag_expr"] = parse_tag_expression(args["tag_expr"])
+
+    folder_id = args.get("folder_id")
+    if folder_id in ("none", "null"):
+        # 폴더에 속하지 않은 프롬프트
+        filters["unfiled"] = True
+    elif folder_id:
+        try:
+            folder_id = int(folder_id)
+        except ValueError as e:
+            raise ValueError("folder_id는 숫자여야 합니다.") from e
+
+        if folder_id == FAVORITES_FOLDER_ID:
+            filters["is_favorite"] = True
+        elif folder_id != ALL_PROMPTS_FOLDER_ID:
+            filters["folder_id"] = folder_id
+
+    return filters
+
+
+def parse_list_args(args):
+    """요청 파라미터에서 필터와 sort/order/limit/cursor를 읽어 검증합니다."""
+    sort = args.get("sort", DEFAULT_SORT)
+    direction = args.get("order", DEFAULT_DIRECTION).lower()
+
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"지원하지 않는 정렬 기준입니다: {sort}")
+    if direction not in SORT_DIRECTIONS:
+        raise ValueError(f"지원하지 않는 정렬 방향입니다: {direction}")
+
+    limit = args.get("limit", type=int)
+    if limit is not None and not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise ValueError(f"limit은 1에서 {MAX_PAGE_LIMIT} 사이여야 합니다.")
+
+    cursor = None
+    if args.get("cursor"):
+        cursor = decode_cursor(args["cursor"])
+        if cursor["sort"] != sort or cursor["direction"] != direction:
+            raise ValueError("커서의 정렬 조건이 요청과 일치하지 않습니다.")
+
+    paginated = "limit" in args or "cursor" in args
+
+    return {
+        "filters": parse_filter_args(args),
+        "sort": sort,
+        "direction": direction,
+        "limit": (limit or MAX_PAGE_LIMIT) if paginated else None,
+        "cursor": cursor,
+        "paginated": paginated,
+    }
+
+
+def build_filter_clause(filters):
+    """필터 조건을 WHERE 절 조각과 바인딩 파라미터로 변환합니다."""
+    clauses = []
+    params = []
+
+    if filters["folder_id"] is not None:
+        if filters["include_descendants"]:
+            clauses.append(
+                """p.folder_id IN (
+                    SELECT descendant FROM folder_closure WHERE ancestor = ?
+                )"""
+            )
+        else:
+            clauses.append("p.folder_id = ?")
+        params.append(filters["folder_id"])
+    elif filters["unfiled"]:
+        clauses.append("p.folder_id IS NULL")
+
+    if filters["is_favorite"] is not None:
+        clauses.append("p.is_favorite = ?")
+        params.append(1 if filters["is_favorite"] else 0)
+
+    tag_ids = filters["tag_ids"]
+    if tag_ids:
+        placeholders = ", ".join(["?"] * len(tag_ids))
+        if filters["tag_mode"] == "all":
+            # 지정한 태그를 모두 가진 프롬프트
+            clauses.append(
+                f"""p.id IN (
+                    SELECT prompt_id FROM prompt_tags
+                    WHERE tag_id IN ({placeholders})
+                    GROUP BY prompt_id
+                    HAVING COUNT(*) = ?
+                )"""
+            )
+            params.extend(tag_ids)
+            params.append(len(tag_ids))
+        else:
+            # 지정한 태그 중 하나라도 가진 프롬프트
+            clauses.append(
+                f"""p.id IN (
+                    SELECT prompt_id FROM prompt_tags
+                    WHERE tag_id IN ({placeholders})
+                )"""
+            )
+            params.extend(tag_ids)
+
+    if filters.get("tag_expr") is not None:
+        sql, expr_params = tag_expression_sql(filters["tag_expr"])
+        clauses.append(sql)
+        params.extend(expr_params)
+
+    return clauses, params
+
+
+def build_list_query(filters, sort, direction, limit=None, cursor=None):
+    """필터, 정렬, 키셋 페이지네이션을 하나의 SQL 쿼리로 컴파일합니다.
+
+    OFFSET 대신 마지막 행의 (정렬 키, id) 다음부터 읽으므로
+    깊은 페이지도 첫 페이지와 같은 비용으로 조회됩니다.
+    """
+    sort_expr = SORT_FIELDS[sort]
+    order = "DESC" if direction == "desc" else "ASC"
+
+    clauses, params = build_filter_clause(filters)
+
+    if cursor:
+        comparison = "<" if direction == "desc" else ">"
+        clauses.append(f"({sort_expr}, p.id) {comparison} (?, ?)")
+        params.extend([cursor["value"], cursor["id"]])
+
+    sql = f"""
+        SELECT {PROMPT_LIST_COLUMNS}, {sort_expr} AS _sort_key
+        FROM prompts p
+        LEFT JOIN folders f ON p.folder_id = f.id
+    """
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+
+    sql += f" ORDER BY {sort_expr} {order}, p.id {order}"
+
+    if limit is not None:
+        # 다음 페이지 존재 여부를 알기 위해 한 행을 더 읽음
+        sql += " LIMIT ?"
+        params.append(limit + 1)
+
+    return sql, params
+
+
+def estimate_total(conn, filters):
+    """필터에 맞는 프롬프트 수를 반환합니다. 첫 페이지에서만 계산해 커서에 담아 재사용합니다."""
+    clauses, params = build_filter_clause(filters)
+    sql = "SELECT COUNT(*) FROM prompts p"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    return conn.execute(sql, params).fetchone()[0]
@@ -0,0 +1,130 @@
+"""조회 API의 직렬화된 응답 본문을 메모리에 두는 캐시
+
+여러 브라우저 탭과 데스크톱 웹뷰가 같은 목록(폴더, 태그, 컬렉션, 전체 프롬프트)을
+반복해서 요청하므로, 엔드포인트 경로와 정렬한 쿼리 파라미터를 키로 응답 본문
+바이트를 저장합니다. 각 항목에는 만들 때의 ETag(응답이 의존하는 테이블의 데이터
+버전, db.data_versions)를 함께 저장하고, 조회할 때 현재 ETag와 다르면 그 항목만
+버립니다. 따라서 쓰기는 자신이 바꾼 테이블에 의존하는 항목만 무효화합니다.
+
+전체 크기가 RESPONSE_CACHE_BYTES를 넘으면 가장 오래 쓰이지 않은 항목부터 버리며,
+이 크기의 절반을 넘는 응답은 저장하지 않습니다.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+# 캐시에 둘 응답 본문의 최대 전체 크기 (바이트, 0이면 사용하지 않음)
+RESPONSE_CACHE_BYTES = int(
+    os.environ.get("PROMPT_MANAGER_RESPONSE_CACHE_BYTES", str(32 * 1024 * 1024))
+)
+
+
+class ResponseCache:
+    """(경로, 쿼리 파라미터) -> (ETag, 본문, MIME 형식)을 LRU 순서로 보관합니다."""
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._evictions = 0
+        self._too_large = 0
+
+    def get(self, key, etag):
+        """etag로 만든 항목의 (본문, MIME 형식)을 반환합니다. 없거나 오래되면 None입니다."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != etag:
+                # 의존하는 테이블이 바뀐 항목
+                self._remove(key)
+                self._stale += 1
+                entry = None
+
+            if entry is None:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key, etag, body, mimetype):
+        """응답 본문을 저장하고 크기 한도를 넘으면 오래된 항목을 버립니다."""
+        if len(body) > self.max_bytes // 2:
+            with self._lock:
+                self._too_large += 1
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (etag, body, mimetype)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def store_stream(self, key, etag, chunks, mimetype):
+        """스트리밍 응답 조각을 그대로 내보내면서 모아, 끝까지 보내면 저장합니다.
+
+        클라이언트가 중간에 끊거나 본문이 저장 한도를 넘으면 저장하지 않습니다.
+        """
+        parts = []
+        size = 0
+        try:
+            for chunk in chunks:
+                if parts is not None:
+                    size += len(chunk)
+                    if size > self.max_bytes // 2:
+                        parts = None
+                        with self._lock:
+                            self._too_large += 1
+                    else:
+                        parts.append(chunk)
+                yield chunk
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+        if parts is not None:
+            self.put(key, etag, b"".join(parts), mimetype)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def clear(self):
+        """모든 항목을 버립니다."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """캐시 적중/실패와 크기 통계를 반환합니다."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "max_bytes": self.max_bytes,
+                "bytes": self._size,
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "stale": self._stale,
+                "evictions": self._evictions,
+                "too_large": self._too_large,
+            }
+
+
+response_cache = ResponseCache()
+
+
+def get_response_cache_stats():
+    """응답 캐시 통계를 반환합니다."""
+    return response_cache.stats()
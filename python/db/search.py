@@ -0,0 +1,130 @@
+"""prompts_fts(FTS5) 기반 프롬프트 전문 검색"""
+
+# trigram 토크나이저는 3글자 이상의 검색어만 인덱스로 찾을 수 있음
+MIN_MATCH_LENGTH = 3
+
+# bm25 컬럼 가중치 (title, content, memo)
+BM25_WEIGHTS = (10.0, 1.0, 2.0)
+
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+SNIPPET_ELLIPSIS = "…"
+SNIPPET_TOKENS = 24
+
+# 검색 결과 최대 개수
+MAX_SEARCH_LIMIT = 100
+
+
+def _quote_fts(term):
+    """검색어를 FTS5 구문(phrase) 문자열로 감쌉니다."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _escape_like(term):
+    """LIKE 패턴의 특수 문자를 이스케이프합니다."""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _highlight(text, term):
+    """텍스트에서 검색어가 처음 나오는 부분을 강조 표시합니다."""
+    index = text.lower().find(term.lower())
+    if index < 0:
+        return text
+    end = index + len(term)
+    return (
+        text[:index] + HIGHLIGHT_OPEN + text[index:end] + HIGHLIGHT_CLOSE + text[end:]
+    )
+
+
+def _make_snippet(text, term, width=40):
+    """검색어 주변 텍스트를 잘라 강조 표시한 스니펫을 만듭니다."""
+    if not text:
+        return ""
+
+    index = text.lower().find(term.lower())
+    if index < 0:
+        return text[:width] + (SNIPPET_ELLIPSIS if len(text) > width else "")
+
+    start = max(0, index - width // 2)
+    end = min(len(text), index + len(term) + width // 2)
+    return (
+        (SNIPPET_ELLIPSIS if start > 0 else "")
+        + text[start:index]
+        + HIGHLIGHT_OPEN
+        + text[index : index + len(term)]
+        + HIGHLIGHT_CLOSE
+        + text[index + len(term) : end]
+        + (SNIPPET_ELLIPSIS if end < len(text) else "")
+    )
+
+
+def search_prompts(conn, query, limit=20):
+    """제목/내용/메모에서 검색어를 찾아 관련도 순으로 반환합니다.
+
+    3글자 이상의 단어는 FTS5 MATCH로, 더 짧은 단어(예: '요약')는
+    같은 인덱스 테이블에 대한 LIKE 조건으로 찾습니다. 모든 단어가
+    일치해야(AND) 결과에 포함됩니다.
+    """
+    terms = [term for term in query.split() if term]
+    if not terms:
+        return []
+
+    match_terms = [term for term in terms if len(term) >= MIN_MATCH_LENGTH]
+    like_terms = [term for term in terms if len(term) < MIN_MATCH_LENGTH]
+
+    clauses = []
+    params = []
+
+    if match_terms:
+        clauses.append("prompts_fts MATCH ?")
+        params.append(" AND ".join(_quote_fts(term) for term in match_terms))
+
+    for term in like_terms:
+        pattern = f"%{_escape_like(term)}%"
+        clauses.append(
+            "(prompts_fts.title LIKE ? ESCAPE '\\' "
+            "OR prompts_fts.content LIKE ? ESCAPE '\\' "
+            "OR prompts_fts.memo LIKE ? ESCAPE '\\')"
+        )
+        params.extend([pattern, pattern, pattern])
+
+    if match_terms:
+        weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+        extra_columns = f"""
+            bm25(prompts_fts, {weights}) AS rank,
+            highlight(prompts_fts, 0, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}')
+                AS title_highlight,
+            snippet(prompts_fts, -1, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}',
+                    '{SNIPPET_ELLIPSIS}', {SNIPPET_TOKENS}) AS snippet
+        """
+        order_by = "rank"
+    else:
+        # MATCH 없이는 bm25/snippet을 쓸 수 없으므로 최근 수정 순으로 정렬
+        extra_columns = "NULL AS rank, NULL AS title_highlight, NULL AS snippet"
+        order_by = "p.updated_at DESC"
+
+    sql = f"""
+        SELECT p.id, p.title, p.content, p.folder_id, f.name as folder,
+               p.is_favorite, p.use_count, p.last_used_at, p.updated_at,
+               {extra_columns}
+        FROM prompts_fts
+        JOIN prompts p ON p.id = prompts_fts.rowid
+        LEFT JOIN folders f ON p.folder_id = f.id
+        WHERE {" AND ".join(clauses)}
+        ORDER BY {order_by}
+        LIMIT ?
+    """
+    params.append(limit)
+
+    results = []
+    for row in conn.execute(sql, params):
+        result = dict(row)
+        content = result.pop("content")
+
+        if result["snippet"] is None:
+            result["title_highlight"] = _highlight(result["title"], terms[0])
+            result["snippet"] = _make_snippet(content, terms[0])
+
+        results.append(result)
+
+    return results
@@ -0,0 +1,418 @@
+"""프롬프트별 유사 프롬프트 상위 K개를 미리 계산해 저장하는 유사도 인덱스
+
+유사도 점수는 태그 일치(50점), 같은 폴더(30점), 내용의 문자 3-gram 자카드
+유사도(20점)의 합이며, prompt_similarity에는 프롬프트마다 점수가 0보다 큰 상위
+SIMILARITY_TOP_K개만 저장합니다. GET /api/prompts/<id>/similar는 이 테이블을
+인덱스로 읽기만 하고 계산하지 않으며, 목록이 최신이 아니면 저장된 목록(비어 있을
+수 있음)과 함께 상태를 알리고 백그라운드 갱신을 예약합니다.
+
+프롬프트의 내용·폴더·태그가 바뀌면 트리거가 prompt_similarity_dirty에 표시하고,
+백그라운드 작업(refresh_similarity)이 표시된 프롬프트의 목록을 다시 계산한 뒤 다른
+프롬프트의 목록에 그 프롬프트가 새로 들어가거나 빠져야 하는지만 확인해 갱신합니다.
+prompt_similarity_ready에 없는 프롬프트(새 DB, 삭제된 프롬프트를 목록에 가지고
+있던 프롬프트 등)의 목록도 같은 작업이 채웁니다. 이때 한 트랜잭션은
+SIMILARITY_FILL_SECONDS 안에서 계산할 수 있는 만큼만 처리하고 다음 트랜잭션 전에
+잠시 쉬므로, 그 사이에 요청의 쓰기가 잠금을 얻습니다.
+"""
+
+import os
+import re
+import time
+
+SIMILARITY_TOP_K = 10
+
+# 한 번에 이만큼 넘게 바뀌면(가져오기 등) 증분 갱신 대신 모든 목록을 다시 계산
+SIMILARITY_FULL_RESET = 100
+
+# 목록이 없는 프롬프트를 채울 때 한 트랜잭션에서 처리하는 최대 개수와 계산 시간(초)
+SIMILARITY_FILL_BATCH = 200
+SIMILARITY_FILL_SECONDS = 0.5
+# 다음 트랜잭션 전에 쉬는 시간(초). SQLite의 잠금 대기 간격(최대 100ms)보다 길어야
+# 기다리던 쓰기가 잠금을 얻음
+SIMILARITY_FILL_PAUSE = 0.15
+
+# 내용 3-gram 캐시에 둘 최대 3-gram 수 (환경 변수로 조정 가능)
+SIMILARITY_GRAM_CACHE_LIMIT = int(
+    os.environ.get("PROMPT_MANAGER_SIMILARITY_GRAM_CACHE", "500000")
+)
+
+TAG_WEIGHT = 50.0
+FOLDER_WEIGHT = 30.0
+CONTENT_WEIGHT = 20.0
+
+SIMILARITY_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS prompts_similarity_ai
+    AFTER INSERT ON prompts BEGIN
+        INSERT OR IGNORE INTO prompt_similarity_dirty (prompt_id) VALUES (new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS prompts_similarity_au
+    AFTER UPDATE OF content, folder_id ON prompts
+    WHEN old.content IS NOT new.content OR old.folder_id IS NOT new.folder_id BEGIN
+        INSERT OR IGNORE INTO prompt_similarity_dirty (prompt_id) VALUES (new.id);
+    END
+    """,
+    # 삭제된 프롬프트를 목록에 가지고 있던 프롬프트는 다음 후보를 채우도록 다시 계산
+    """
+    CREATE TRIGGER IF NOT EXISTS prompts_similarity_bd
+    BEFORE DELETE ON prompts BEGIN
+        DELETE FROM prompt_similarity_ready
+        WHERE prompt_id IN (
+            SELECT prompt_id FROM prompt_similarity WHERE similar_id = old.id
+        );
+        DELETE FROM prompt_similarity_dirty WHERE prompt_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS prompt_tags_similarity_ai
+    AFTER INSERT ON prompt_tags BEGIN
+        INSERT OR IGNORE INTO prompt_similarity_dirty (prompt_id)
+        VALUES (new.prompt_id);
+    END
+    """,
+    # 프롬프트 삭제로 연결이 함께 지워지는 경우는 표시하지 않음
+    """
+    CREATE TRIGGER IF NOT EXISTS prompt_tags_similarity_ad
+    AFTER DELETE ON prompt_tags BEGIN
+        INSERT OR IGNORE INTO prompt_similarity_dirty (prompt_id)
+        SELECT old.prompt_id WHERE EXISTS (
+            SELECT 1 FROM prompts WHERE id = old.prompt_id
+        );
+    END
+    """,
+)
+
+
+def create_similarity_tables(cursor):
+    """유사도 인덱스 테이블과 변경 표시 트리거를 만듭니다. 목록은 백그라운드에서 채워집니다."""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prompt_similarity (
+            prompt_id INTEGER NOT NULL,
+            similar_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (prompt_id, similar_id),
+            FOREIGN KEY (prompt_id) REFERENCES prompts (id) ON DELETE CASCADE,
+            FOREIGN KEY (similar_id) REFERENCES prompts (id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        """
+    )
+    # 삭제 시 역방향 조회용
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_prompt_similarity_similar
+        ON prompt_similarity(similar_id)
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prompt_similarity_ready (
+            prompt_id INTEGER PRIMARY KEY,
+            FOREIGN KEY (prompt_id) REFERENCES prompts (id) ON DELETE CASCADE
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prompt_similarity_dirty (
+            prompt_id INTEGER PRIMARY KEY
+        )
+        """
+    )
+
+    for trigger in SIMILARITY_TRIGGERS:
+        cursor.execute(trigger)
+
+
+# 프롬프트 ID -> (내용, 3-gram 집합). 내용이 같으면 다시 계산하지 않음
+_gram_cache = {}
+# 캐시에 있는 3-gram 수
+_gram_cache_size = 0
+
+
+def _forget_grams(prompt_id):
+    global _gram_cache_size
+    cached = _gram_cache.pop(prompt_id, None)
+    if cached:
+        _gram_cache_size -= len(cached[1])
+
+
+def _content_grams(prompt_id, content):
+    global _gram_cache_size
+    cached = _gram_cache.get(prompt_id)
+    if cached and cached[0] == content:
+        return cached[1]
+
+    text = re.sub(r"\s+", " ", (content or "").lower()).strip()
+    if len(text) < 3:
+        grams = {text} if text else set()
+    else:
+        grams = {text[i : i + 3] for i in range(len(text) - 2)}
+
+    _forget_grams(prompt_id)
+    # 가득 차면 새 항목은 저장하지 않음. 매번 모든 프롬프트를 같은 순서로 읽으므로
+    # 오래된 항목을 밀어내면 어느 항목도 적중하지 않음
+    if _gram_cache_size + len(grams) <= SIMILARITY_GRAM_CACHE_LIMIT:
+        _gram_cache[prompt_id] = (content, grams)
+        _gram_cache_size += len(grams)
+    return grams
+
+
+def _load_features(cursor):
+    """모든 프롬프트의 (폴더 ID, 태그 ID 집합, 내용 3-gram 집합)을 읽습니다."""
+    cursor.execute(
+        """
+        SELECT p.id, p.folder_id, p.content, GROUP_CONCAT(pt.tag_id) AS tag_ids
+        FROM prompts p
+        LEFT JOIN prompt_tags pt ON pt.prompt_id = p.id
+        GROUP BY p.id
+        """
+    )
+    features = {}
+    for row in cursor.fetchall():
+        tag_ids = {int(tag_id) for tag_id in row[3].split(",")} if row[3] else set()
+        features[row[0]] = (row[1], tag_ids, _content_grams(row[0], row[2]))
+
+    # 삭제된 프롬프트는 캐시에서 제거
+    for prompt_id in _gram_cache.keys() - features.keys():
+        _forget_grams(prompt_id)
+    return features
+
+
+def _score(owner, candidate):
+    """owner 프롬프트 기준으로 candidate의 유사도 점수를 계산합니다."""
+    owner_folder, owner_tags, owner_grams = owner
+    folder_id, tag_ids, grams = candidate
+
+    score = 0.0
+    if owner_tags:
+        score += len(owner_tags & tag_ids) * TAG_WEIGHT / len(owner_tags)
+    if owner_folder is not None and owner_folder == folder_id:
+        score += FOLDER_WEIGHT
+    if owner_grams and grams:
+        common = len(owner_grams & grams)
+        if common:
+            score += CONTENT_WEIGHT * common / (len(owner_grams) + len(grams) - common)
+    return score
+
+
+def _rank_key(item):
+    # 점수 내림차순, 같으면 ID 오름차순
+    similar_id, score = item
+    return (-score, similar_id)
+
+
+def _top_similar(prompt_id, features):
+    owner = features[prompt_id]
+    scored = []
+    for other_id, candidate in features.items():
+        if other_id == prompt_id:
+            continue
+        score = _score(owner, candidate)
+        if score > 0:
+            scored.append((other_id, score))
+    scored.sort(key=_rank_key)
+    return dict(scored[:SIMILARITY_TOP_K])
+
+
+def _store_similar(cursor, prompt_id, similar):
+    cursor.execute("DELETE FROM prompt_similarity WHERE prompt_id = ?", (prompt_id,))
+    cursor.executemany(
+        "INSERT INTO prompt_similarity (prompt_id, similar_id, score) VALUES (?, ?, ?)",
+        [(prompt_id, similar_id, score) for similar_id, score in similar.items()],
+    )
+    cursor.execute(
+        "INSERT OR IGNORE INTO prompt_similarity_ready (prompt_id) VALUES (?)",
+        (prompt_id,),
+    )
+
+
+def similarity_status(conn, prompt_id):
+    """prompt_id의 저장된 목록 상태를 반환합니다. 목록을 계산하지는 않습니다.
+
+    "ready"는 최신 목록, "stale"은 변경 후 아직 갱신되지 않은 목록, "pending"은
+    아직 계산되지 않은 목록(비어 있거나 이전에 계산한 목록)입니다. 최신이 아니면
+    백그라운드 갱신을 예약합니다.
+    """
+    ready, dirty = conn.execute(
+        """
+        SELECT EXISTS (SELECT 1 FROM prompt_similarity_ready WHERE prompt_id = ?1),
+               EXISTS (SELECT 1 FROM prompt_similarity_dirty WHERE prompt_id = ?1)
+        """,
+        (prompt_id,),
+    ).fetchone()
+    if ready and not dirty:
+        return "ready"
+
+    schedule_similarity_refresh()
+    return "stale" if ready else "pending"
+
+
+def similarity_needs_refresh(conn):
+    """목록이 없는 프롬프트나 반영되지 않은 변경 표시가 있는지 반환합니다."""
+    row = conn.execute(
+        """
+        SELECT EXISTS (
+                   SELECT 1 FROM prompts
+                   WHERE id NOT IN (SELECT prompt_id FROM prompt_similarity_ready)
+               )
+               OR EXISTS (SELECT 1 FROM prompt_similarity_dirty)
+        """
+    ).fetchone()
+    return bool(row[0])
+
+
+def refresh_similarity(conn):
+    """변경 표시된 프롬프트를 반영한 뒤 목록이 없는 프롬프트의 목록을 채웁니다. (백그라운드 작업)"""
+    _apply_dirty(conn)
+
+    filled = 0
+    while True:
+        count = _fill_missing(conn)
+        if not count:
+            break
+        filled += count
+        time.sleep(SIMILARITY_FILL_PAUSE)
+
+    if filled:
+        print(f"유사도 인덱스 채움: 목록 {filled}개 계산")
+
+
+def _fill_missing(conn):
+    """목록이 없는 프롬프트의 목록을 SIMILARITY_FILL_SECONDS 동안 계산하고 그 수를 반환합니다."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT id FROM prompts
+            WHERE id NOT IN (SELECT prompt_id FROM prompt_similarity_ready)
+            LIMIT ?
+            """,
+            (SIMILARITY_FILL_BATCH,),
+        )
+        missing_ids = [row[0] for row in cursor.fetchall()]
+        if not missing_ids:
+            conn.rollback()
+            return 0
+
+        features = _load_features(cursor)
+        started = time.perf_counter()
+        count = 0
+        for prompt_id in missing_ids:
+            _store_similar(cursor, prompt_id, _top_similar(prompt_id, features))
+            count += 1
+            if time.perf_counter() - started >= SIMILARITY_FILL_SECONDS:
+                break
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return count
+
+
+def _apply_dirty(conn):
+    """변경 표시된 프롬프트의 목록을 다시 계산하고 다른 프롬프트 목록에 반영합니다."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT prompt_id FROM prompt_similarity_dirty")
+        dirty_ids = [row[0] for row in cursor.fetchall()]
+        if not dirty_ids:
+            conn.rollback()
+            return
+
+        if len(dirty_ids) > SIMILARITY_FULL_RESET:
+            # 모든 목록을 다시 계산할 대상으로 표시 (_fill_missing). 이전 목록은 다시
+            # 계산할 때까지 그대로 조회됨
+            cursor.execute("DELETE FROM prompt_similarity_ready")
+            cursor.execute("DELETE FROM prompt_similarity_dirty")
+            conn.commit()
+            print(f"유사도 인덱스 전체 재계산 예약: 변경된 프롬프트 {len(dirty_ids)}개")
+            return
+
+        features = _load_features(cursor)
+
+        # 목록이 계산되어 있는 프롬프트의 현재 목록
+        cursor.execute("SELECT prompt_id FROM prompt_similarity_ready")
+        lists = {row[0]: {} for row in cursor.fetchall()}
+        cursor.execute("SELECT prompt_id, similar_id, score FROM prompt_similarity")
+        for row in cursor.fetchall():
+            if row[0] in lists:
+                lists[row[0]][row[1]] = row[2]
+
+        changed = set()
+        for prompt_id in dirty_ids:
+            if prompt_id not in features:
+                continue
+
+            lists[prompt_id] = _top_similar(prompt_id, features)
+            changed.add(prompt_id)
+
+            for owner_id, similar in lists.items():
+                if owner_id == prompt_id:
+                    continue
+
+                score = _score(features[owner_id], features[prompt_id])
+                old_score = similar.get(prompt_id)
+                if old_score is not None:
+                    if score == old_score:
+                        continue
+                    if score > old_score:
+                        # 점수가 오르면 목록에서 빠질 일이 없음
+                        similar[prompt_id] = score
+                    else:
+                        # 점수가 내려가면 목록 밖의 후보가 더 높을 수 있으므로 다시 계산
+                        lists[owner_id] = _top_similar(owner_id, features)
+                    changed.add(owner_id)
+                elif score > 0:
+                    if len(similar) < SIMILARITY_TOP_K:
+                        similar[prompt_id] = score
+                    else:
+                        worst = max(similar.items(), key=_rank_key)
+                        if _rank_key((prompt_id, score)) >= _rank_key(worst):
+                            continue
+                        del similar[worst[0]]
+                        similar[prompt_id] = score
+                    changed.add(owner_id)
+
+        for prompt_id in changed:
+            _store_similar(cursor, prompt_id, lists[prompt_id])
+        cursor.executemany(
+            "DELETE FROM prompt_similarity_dirty WHERE prompt_id = ?",
+            [(prompt_id,) for prompt_id in dirty_ids],
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    print(
+        f"유사도 인덱스 갱신: 변경된 프롬프트 {len(dirty_ids)}개, "
+        f"목록 {len(changed)}개 갱신"
+    )
+
+
+def rebuild_similarity(cursor):
+    """모든 프롬프트의 목록을 처음부터 다시 계산하고 계산한 프롬프트 수를 반환합니다.
+
+    트랜잭션은 호출하는 쪽에서 관리합니다.
+    """
+    features = _load_features(cursor)
+    cursor.execute("DELETE FROM prompt_similarity")
+    cursor.execute("DELETE FROM prompt_similarity_ready")
+    for prompt_id in features:
+        _store_similar(cursor, prompt_id, _top_similar(prompt_id, features))
+    cursor.execute("DELETE FROM prompt_similarity_dirty")
+    return len(features)
+
+
+def schedule_similarity_refresh():
+    """변경 표시된 프롬프트를 반영하는 백그라운드 작업을 예약합니다."""
+    # db.database가 마이그레이션용으로 이 모듈을 가져오므로 순환 참조를 피해 여기서 가져옴
+    from db.background import submit_task
+
+    submit_task("similarity-refresh", refresh_similarity)
@@ -0,0 +1,161 @@
+"""태그 이름으로 쓴 AND/OR/NOT 식의 해석기
+
+문법 (우선순위는 NOT > AND > OR, 연산자는 대소문자를 구분하지 않음):
+
+    식     := 항 (OR 항)*
+    항     := 인자 (AND? 인자)*      # 연산자 없이 나란히 쓰면 AND
+    인자   := NOT 인자 | "(" 식 ")" | 태그 이름
+
+태그 이름에 공백, 괄호, 따옴표가 있거나 이름이 연산자와 같으면 큰따옴표로
+감쌉니다 (따옴표 안의 큰따옴표는 두 번 씁니다). 예: (GPT-4 AND 요약) AND NOT "코드 리뷰"
+
+해석 결과는 ("tag", 이름), ("not", 식), ("and", 식, 식), ("or", 식, 식) 튜플로 된
+트리이며, 카탈로그는 태그별 비트셋으로, prompt_query는 SQL 조건으로 계산합니다.
+"""
+
+import re
+
+OPERATORS = ("AND", "OR", "NOT")
+
+# 식 하나에 쓸 수 있는 최대 토큰 수 (재귀 깊이 제한)
+MAX_TAG_EXPRESSION_TOKENS = 200
+
+_TOKEN_PATTERN = re.compile(r'\s*(?:(\()|(\))|"((?:[^"]|"")*)"|([^\s()"]+))')
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN_PATTERN.match(text, position)
+        if not match:
+            raise ValueError("태그 식의 따옴표가 닫히지 않았습니다.")
+        position = match.end()
+
+        if match.group(1):
+            tokens.append(("(", None))
+        elif match.group(2):
+            tokens.append((")", None))
+        elif match.group(3) is not None:
+            tokens.append(("tag", match.group(3).replace('""', '"')))
+        elif match.group(4).upper() in OPERATORS:
+            tokens.append((match.group(4).upper(), None))
+        else:
+            tokens.append(("tag", match.group(4)))
+
+    if len(tokens) > MAX_TAG_EXPRESSION_TOKENS:
+        raise ValueError(
+            f"태그 식은 최대 {MAX_TAG_EXPRESSION_TOKENS}개 항목까지 쓸 수 있습니다."
+        )
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position][0]
+        return None
+
+    def take(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def expression(self):
+        node = self.term()
+        while self.peek() == "OR":
+            self.take()
+            node = ("or", node, self.term())
+        return node
+
+    def term(self):
+        node = self.factor()
+        while self.peek() in ("AND", "NOT", "(", "tag"):
+            if self.peek() == "AND":
+                self.take()
+            node = ("and", node, self.factor())
+        return node
+
+    def factor(self):
+        kind = self.peek()
+        if kind == "NOT":
+            self.take()
+            return ("not", self.factor())
+        if kind == "(":
+            self.take()
+            node = self.expression()
+            if self.peek() != ")":
+                raise ValueError("태그 식의 괄호가 닫히지 않았습니다.")
+            self.take()
+            return node
+        if kind == "tag":
+            return ("tag", self.take()[1])
+        if kind is None:
+            raise ValueError("태그 식이 연산자로 끝났습니다.")
+        raise ValueError(f"태그 식의 {kind} 앞에 태그 이름이 필요합니다.")
+
+
+def parse_tag_expression(text):
+    """태그 식 문자열을 트리로 해석합니다. 구문이 잘못되면 ValueError를 발생시킵니다."""
+    tokens = _tokenize(text or "")
+    if not tokens:
+        raise ValueError("태그 식이 비어 있습니다.")
+
+    parser = _Parser(tokens)
+    node = parser.expression()
+    if parser.peek() is not None:
+        raise ValueError("태그 식의 괄호가 맞지 않습니다.")
+    return node
+
+
+def tag_names(node):
+    """식에 나오는 태그 이름 집합을 반환합니다."""
+    if node[0] == "tag":
+        return {node[1]}
+    names = set()
+    for child in node[1:]:
+        names |= tag_names(child)
+    return names
+
+
+def evaluate_tag_expression(node, tag_bits, universe):
+    """태그 이름 -> 비트셋 함수(tag_bits)로 식을 계산한 비트셋을 반환합니다.
+
+    NOT은 universe(전체 프롬프트 비트셋)에 대한 여집합입니다.
+    """
+    kind = node[0]
+    if kind == "tag":
+        return tag_bits(node[1])
+    if kind == "not":
+        return universe & ~evaluate_tag_expression(node[1], tag_bits, universe)
+
+    left = evaluate_tag_expression(node[1], tag_bits, universe)
+    right = evaluate_tag_expression(node[2], tag_bits, universe)
+    return left & right if kind == "and" else left | right
+
+
+def tag_expression_sql(node):
+    """식을 prompts p에 대한 SQL 조건과 바인딩 파라미터로 변환합니다."""
+    kind = node[0]
+    if kind == "tag":
+        return (
+            """p.id IN (
+                SELECT pt.prompt_id FROM prompt_tags pt
+                JOIN tags t ON t.id = pt.tag_id
+                WHERE t.name = ?
+            )""",
+            [node[1]],
+        )
+    if kind == "not":
+        sql, params = tag_expression_sql(node[1])
+        return f"NOT ({sql})", params
+
+    left_sql, left_params = tag_expression_sql(node[1])
+    right_sql, right_params = tag_expression_sql(node[2])
+    operator = "AND" if kind == "and" else "OR"
+    return f"({left_sql} {operator} {right_sql})", left_params + right_params
@@ -0,0 +1,211 @@
+"""프롬프트 사용 기록을 메모리에 모았다가 한 트랜잭션으로 기록하는 쓰기 버퍼
+
+POST /api/prompts/<id>/use는 클립보드 복사마다 호출되므로 요청마다 UPDATE와
+커밋(fsync)을 하지 않고, 프롬프트별로 사용 횟수는 합산하고 마지막 사용 시간은
+가장 늦은 값으로 합쳐 두었다가 USAGE_FLUSH_INTERVAL마다, 그리고 종료 시에
+한 번에 기록합니다. 같은 트랜잭션에서 사용 한 번마다 prompt_usage_events에 이벤트를
+추가하고 감쇠 인기 점수(db.hot_score)를 갱신하며, 기록 뒤에는 백그라운드에서
+시간/일 단위 집계를 갱신합니다(db.usage_stats).
+조회 API는 overlay_usage로 아직 기록되지 않은 값을 더해 보여줍니다.
+"""
+
+import atexit
+import os
+import threading
+
+from db.background import submit_task, wait_for_tasks
+from db.catalog import catalog
+from db.database import get_db
+from db.hot_score import log_add, usage_hot_score
+from db.usage_stats import insert_usage_events, rollup_usage
+
+# 버퍼를 데이터베이스에 기록하는 주기(초)
+USAGE_FLUSH_INTERVAL = float(os.environ.get("PROMPT_MANAGER_USAGE_FLUSH_INTERVAL", "2"))
+
+
+class UsageBuffer:
+    """프롬프트 ID별 (사용 횟수, 마지막 사용 시간)을 모아 두는 버퍼"""
+
+    def __init__(self, flush_interval=USAGE_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._events = []
+        # 기록 중인 값도 커밋 전까지는 조회에 반영되도록 따로 보관
+        self._flushing = {}
+        self._lock = threading.Lock()
+        # 기록을 추가하거나 기록을 마칠 때마다 올리는 값 (목록 API의 ETag에 포함)
+        self.generation = 0
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def record(self, prompt_id, used_at):
+        """사용 기록 한 건을 버퍼에 합칩니다."""
+        with self._lock:
+            entry = self._pending.get(prompt_id)
+            if entry:
+                entry[0] += 1
+                entry[1] = max(entry[1], used_at)
+            else:
+                self._pending[prompt_id] = [1, used_at]
+            self._events.append((prompt_id, used_at))
+            self.generation += 1
+
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="usage-buffer", daemon=True
+                )
+                self._thread.start()
+
+    def pending(self):
+        """아직 기록되지 않은 {prompt_id: (사용 횟수, 마지막 사용 시간)}을 반환합니다."""
+        with self._lock:
+            merged = {
+                prompt_id: tuple(entry) for prompt_id, entry in self._flushing.items()
+            }
+            for prompt_id, (count, used_at) in self._pending.items():
+                if prompt_id in merged:
+                    flushing_count, flushing_used_at = merged[prompt_id]
+                    merged[prompt_id] = (
+                        flushing_count + count,
+                        max(flushing_used_at, used_at),
+                    )
+                else:
+                    merged[prompt_id] = (count, used_at)
+            return merged
+
+    def flush(self):
+        """버퍼의 사용 기록을 한 트랜잭션으로 기록하고 기록한 프롬프트 수를 반환합니다."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+                batch = self._flushing
+                events, self._events = self._events, []
+
+            # 프롬프트별 사용 시각으로 인기 점수 증가분 계산
+            used_at_lists = {}
+            for prompt_id, used_at in events:
+                used_at_lists.setdefault(prompt_id, []).append(used_at)
+
+            try:
+                with get_db() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    placeholders = ", ".join(["?"] * len(batch))
+                    hot_scores = {
+                        row["id"]: row["hot_score"]
+                        for row in conn.execute(
+                            f"SELECT id, hot_score FROM prompts WHERE id IN ({placeholders})",
+                            list(batch),
+                        )
+                    }
+                    conn.executemany(
+                        """
+                        UPDATE prompts
+                        SET use_count = use_count + ?, last_used_at = ?, hot_score = ?
+                        WHERE id = ?
+                        """,
+                        [
+                            (
+                                count,
+                                used_at,
+                                log_add(
+                                    hot_scores[prompt_id],
+                                    usage_hot_score(used_at_lists[prompt_id]),
+                                ),
+                                prompt_id,
+                            )
+                            for prompt_id, (count, used_at) in batch.items()
+                            if prompt_id in hot_scores
+                        ],
+                    )
+                    insert_usage_events(conn.cursor(), events)
+                    conn.commit()
+            except Exception:
+                # 기록하지 못한 내역은 버퍼로 되돌려 다음 주기에 다시 시도
+                with self._lock:
+                    for prompt_id, (count, used_at) in batch.items():
+                        entry = self._pending.setdefault(prompt_id, [0, used_at])
+                        entry[0] += count
+                        entry[1] = max(entry[1], used_at)
+                    self._events[:0] = events
+                    self._flushing = {}
+                    self.generation += 1
+                raise
+
+            try:
+                # 목록 카탈로그의 사용 횟수/시간 갱신
+                with get_db() as conn:
+                    catalog.refresh_prompts(conn, batch)
+            finally:
+                with self._lock:
+                    self._flushing = {}
+                    # 조회 결과가 기록 중인 값 대신 카탈로그 값을 쓰게 되므로 ETag도 바꿈
+                    self.generation += 1
+
+        submit_task("usage-rollup", rollup_usage)
+        return len(batch)
+
+    def close(self):
+        """주기적 기록을 멈추고 남은 내역과 집계를 기록합니다."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        wait_for_tasks()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"사용 기록 저장 오류: {str(e)}")
+
+
+_buffer = UsageBuffer()
+
+# 서버 종료 시 버퍼에 남은 사용 기록 저장
+atexit.register(_buffer.close)
+
+
+def record_usage(prompt_id, used_at):
+    """프롬프트 사용 기록을 버퍼에 추가합니다."""
+    _buffer.record(prompt_id, used_at)
+
+
+def flush_usage():
+    """버퍼의 사용 기록을 지금 바로 기록합니다."""
+    return _buffer.flush()
+
+
+def pending_usage():
+    """아직 기록되지 않은 사용 내역을 반환합니다."""
+    return _buffer.pending()
+
+
+def usage_generation():
+    """버퍼의 내용이 바뀔 때마다 바뀌는 값을 반환합니다."""
+    return _buffer.generation
+
+
+def overlay_usage(prompts, fields=("use_count", "last_used_at")):
+    """프롬프트 dict 목록의 use_count/last_used_at에 아직 기록되지 않은 내역을 반영합니다.
+
+    fields에 없는 필드(응답에서 요청하지 않은 필드)는 건드리지 않습니다.
+    """
+    pending = _buffer.pending()
+    if not pending:
+        return prompts
+
+    with_count = "use_count" in fields
+    with_time = "last_used_at" in fields
+    for prompt in prompts:
+        entry = pending.get(prompt["id"])
+        if entry:
+            if with_count:
+                prompt["use_count"] = (prompt.get("use_count") or 0) + entry[0]
+            if with_time:
+                prompt["last_used_at"] = entry[1]
+    return prompts
@@ -0,0 +1,270 @@
+"""프롬프트 사용 이벤트 로그와 시간/일 단위 집계 테이블
+
+사용 기록 버퍼(db.usage_buffer)가 기록될 때 사용 한 번마다 prompt_usage_events에
+한 행을 추가하고, 백그라운드 작업(rollup_usage)이 아직 집계하지 않은 이벤트를
+prompt_usage_hourly / prompt_usage_daily에 더합니다. 통계 API는 집계 테이블만
+읽으며, 집계가 끝난 이벤트 중 보존 기간(USAGE_EVENT_RETENTION_DAYS)이 지난 것은
+같은 작업에서 삭제합니다.
+"""
+
+import datetime
+import os
+
+# 집계가 끝난 원본 이벤트를 보관하는 기간(일)
+USAGE_EVENT_RETENTION_DAYS = int(
+    os.environ.get("PROMPT_MANAGER_USAGE_EVENT_RETENTION_DAYS", "90")
+)
+
+# 한 번에 조회할 수 있는 최대 구간 수
+MAX_USAGE_BUCKETS = 1000
+
+# 단위별 (집계 테이블, used_at(UTC ISO 문자열)에서 구간 시작을 만드는 식, 구간 길이)
+ROLLUPS = {
+    "hour": (
+        "prompt_usage_hourly",
+        "substr(used_at, 1, 13) || ':00:00+00:00'",
+        datetime.timedelta(hours=1),
+    ),
+    "day": ("prompt_usage_daily", "substr(used_at, 1, 10)", datetime.timedelta(days=1)),
+}
+
+
+def create_usage_tables(cursor):
+    """사용 이벤트 테이블과 집계 테이블을 만듭니다."""
+    # 이벤트를 지운 뒤에도 id가 다시 쓰이지 않도록 AUTOINCREMENT 사용
+    # (집계 위치를 마지막으로 집계한 이벤트 id로 기억하므로)
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS prompt_usage_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prompt_id INTEGER NOT NULL,
+            used_at TEXT NOT NULL,
+            FOREIGN KEY (prompt_id) REFERENCES prompts (id) ON DELETE CASCADE
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_prompt_usage_events_prompt
+        ON prompt_usage_events(prompt_id)
+        """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_prompt_usage_events_used_at
+        ON prompt_usage_events(used_at)
+        """
+    )
+
+    for table, _, _ in ROLLUPS.values():
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                prompt_id INTEGER NOT NULL,
+                bucket TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (prompt_id, bucket),
+                FOREIGN KEY (prompt_id) REFERENCES prompts (id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+            """
+        )
+        # 전체 사용량 조회용 (기본 키는 프롬프트별 조회용)
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_bucket ON {table}(bucket)"
+        )
+
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS usage_rollup_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_event_id INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    cursor.execute("INSERT OR IGNORE INTO usage_rollup_state (id) VALUES (1)")
+
+
+def insert_usage_events(cursor, events):
+    """(prompt_id, used_at) 목록을 이벤트 테이블에 추가합니다. 삭제된 프롬프트는 건너뜁니다."""
+    cursor.executemany(
+        """
+        INSERT INTO prompt_usage_events (prompt_id, used_at)
+        SELECT ?1, ?2 WHERE EXISTS (SELECT 1 FROM prompts WHERE id = ?1)
+        """,
+        events,
+    )
+
+
+def rollup_usage(conn):
+    """아직 집계하지 않은 이벤트를 집계 테이블에 더하고 오래된 이벤트를 삭제합니다. (백그라운드 작업)"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT last_event_id FROM usage_rollup_state WHERE id = 1")
+        last_event_id = cursor.fetchone()[0]
+        cursor.execute("SELECT IFNULL(MAX(id), 0) FROM prompt_usage_events")
+        max_event_id = cursor.fetchone()[0]
+
+        rolled_up = 0
+        if max_event_id > last_event_id:
+            for table, bucket, _ in ROLLUPS.values():
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} (prompt_id, bucket, count)
+                    SELECT prompt_id, {bucket}, COUNT(*)
+                    FROM prompt_usage_events
+                    WHERE id > ? AND id <= ?
+                    GROUP BY 1, 2
+                    ON CONFLICT (prompt_id, bucket)
+                    DO UPDATE SET count = count + excluded.count
+                    """,
+                    (last_event_id, max_event_id),
+                )
+            cursor.execute(
+                "SELECT COUNT(*) FROM prompt_usage_events WHERE id > ? AND id <= ?",
+                (last_event_id, max_event_id),
+            )
+            rolled_up = cursor.fetchone()[0]
+            cursor.execute(
+                "UPDATE usage_rollup_state SET last_event_id = ? WHERE id = 1",
+                (max_event_id,),
+            )
+
+        # 집계가 끝난 이벤트만 보존 기간이 지나면 삭제
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+            days=USAGE_EVENT_RETENTION_DAYS
+        )
+        cursor.execute(
+            "DELETE FROM prompt_usage_events WHERE used_at < ? AND id <= ?",
+            (cutoff.isoformat(), max_event_id),
+        )
+        pruned = cursor.rowcount
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if rolled_up or pruned:
+        print(f"사용 통계 집계: 이벤트 {rolled_up}개 집계, {pruned}개 삭제")
+
+
+def _parse_time(value, name):
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} 값은 ISO 형식의 날짜나 시간이어야 합니다.")
+
+    # 타임존 정보가 없는 경우, UTC로 가정
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.astimezone(datetime.timezone.utc)
+
+
+def _bucket_start(moment, granularity):
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _bucket_key(moment, granularity):
+    if granularity == "hour":
+        return moment.isoformat()
+    return moment.date().isoformat()
+
+
+def parse_usage_args(args):
+    """통계 조회 파라미터를 해석합니다. 잘못된 값이면 ValueError를 발생시킵니다.
+
+    기본 구간은 오늘까지 30일(일 단위) 또는 지금까지 24시간(시간 단위)입니다.
+    """
+    granularity = args.get("granularity", "day")
+    if granularity not in ROLLUPS:
+        raise ValueError("granularity는 hour 또는 day여야 합니다.")
+
+    targets = {}
+    for name in ("prompt_id", "folder_id", "tag_id"):
+        value = args.get(name)
+        if value is None:
+            continue
+        try:
+            targets[name] = int(value)
+        except ValueError:
+            raise ValueError(f"{name} 값은 정수여야 합니다.")
+    if len(targets) > 1:
+        raise ValueError("prompt_id, folder_id, tag_id 중 하나만 지정할 수 있습니다.")
+
+    step = ROLLUPS[granularity][2]
+    if "end" in args:
+        end = _parse_time(args["end"], "end")
+    else:
+        end = datetime.datetime.now(datetime.timezone.utc)
+    end = _bucket_start(end, granularity)
+
+    if "start" in args:
+        start = _bucket_start(_parse_time(args["start"], "start"), granularity)
+    else:
+        start = end - step * (29 if granularity == "day" else 23)
+
+    if start > end:
+        raise ValueError("start는 end보다 늦을 수 없습니다.")
+    if (end - start) // step + 1 > MAX_USAGE_BUCKETS:
+        raise ValueError(
+            f"한 번에 최대 {MAX_USAGE_BUCKETS}개 구간까지 조회할 수 있습니다."
+        )
+
+    return {
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "target": next(iter(targets.items()), None),
+        "include_descendants": args.get("include_descendants", "").lower() == "true",
+    }
+
+
+def usage_series(conn, query):
+    """parse_usage_args 결과로 집계 테이블을 읽어 빈 구간을 0으로 채운 시계열을 반환합니다."""
+    granularity = query["granularity"]
+    table, _, step = ROLLUPS[granularity]
+    start_key = _bucket_key(query["start"], granularity)
+    end_key = _bucket_key(query["end"], granularity)
+
+    sql = f"SELECT r.bucket, SUM(r.count) AS count FROM {table} r"
+    params = []
+    target = query["target"]
+    if target is None:
+        sql += " WHERE r.bucket BETWEEN ? AND ?"
+    elif target[0] == "prompt_id":
+        sql += " WHERE r.prompt_id = ? AND r.bucket BETWEEN ? AND ?"
+        params.append(target[1])
+    elif target[0] == "folder_id":
+        if query["include_descendants"]:
+            folder_filter = (
+                "p.folder_id IN "
+                "(SELECT descendant FROM folder_closure WHERE ancestor = ?)"
+            )
+        else:
+            folder_filter = "p.folder_id = ?"
+        sql += (
+            f" JOIN prompts p ON p.id = r.prompt_id"
+            f" WHERE {folder_filter} AND r.bucket BETWEEN ? AND ?"
+        )
+        params.append(target[1])
+    else:
+        sql += (
+            " JOIN prompt_tags pt ON pt.prompt_id = r.prompt_id"
+            " WHERE pt.tag_id = ? AND r.bucket BETWEEN ? AND ?"
+        )
+        params.append(target[1])
+    sql += " GROUP BY r.bucket"
+    params += [start_key, end_key]
+
+    counts = {row["bucket"]: row["count"] for row in conn.execute(sql, params)}
+
+    series = []
+    moment = query["start"]
+    while moment <= query["end"]:
+        key = _bucket_key(moment, granularity)
+        series.append({"bucket": key, "count": counts.get(key, 0)})
+        moment += step
+    return series
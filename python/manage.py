@@ -0,0 +1,472 @@
+"""데이터베이스 관리 명령
+
+사용법:
+    python manage.py rebuild-fts [--db 경로]        # 전문 검색 인덱스(prompts_fts) 재생성
+    python manage.py check-query-plans             # 조회 API의 SQL 실행 계획 검사
+    python manage.py repair-counters [--db 경로]    # 폴더 클로저와 폴더/태그/컬렉션 집계 재계산
+    python manage.py rebuild-similarity [--db 경로] # 모든 프롬프트의 유사 프롬프트 목록 미리 계산
+    python manage.py check-catalog [--db 경로]      # 메모리 카탈로그의 목록 결과를 SQL 결과와 비교
+    python manage.py bench-wire-format [--db 경로]  # 목록 응답의 nested/normalized 크기와 인코딩 시간 비교
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from db import database
+from db.background import wait_for_tasks
+from db.catalog import PromptCatalog
+from db.closure import rebuild_folder_closure
+from db.counters import rebuild_counters
+from db.database import migrate_schema, rebuild_prompts_fts
+from db.prompt_query import (
+    SORT_DIRECTIONS,
+    SORT_FIELDS,
+    build_filter_clause,
+    build_list_query,
+    estimate_total,
+    parse_filter_args,
+)
+from db.similarity import rebuild_similarity
+
+
+def rebuild_fts(args):
+    """기존 데이터베이스의 prompts_fts 인덱스를 다시 만듭니다."""
+    # 테이블/트리거가 없는 오래된 DB라면 먼저 마이그레이션
+    migrate_schema()
+    rebuild_prompts_fts()
+    print(f"전문 검색 인덱스를 다시 생성했습니다: {database.DB_PATH}")
+
+
+def repair_counters(args):
+    """트리거로 유지되는 폴더 클로저와 집계 테이블을 원본 데이터로 다시 계산합니다."""
+    migrate_schema()
+
+    conn = database.get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.cursor()
+        # 집계 트리거가 클로저를 사용하므로 클로저를 먼저 복구
+        mismatched = {"folder_closure": rebuild_folder_closure(cursor)}
+        mismatched.update(rebuild_counters(cursor))
+        conn.commit()
+    finally:
+        conn.close()
+
+    for table, count in mismatched.items():
+        print(f"{table}: 어긋난 행 {count}개")
+    print(f"집계 테이블을 다시 계산했습니다: {database.DB_PATH}")
+
+
+def rebuild_similarity_index(args):
+    """모든 프롬프트의 유사 프롬프트 목록을 미리 계산합니다. (기본값은 조회 시 계산)"""
+    migrate_schema()
+
+    conn = database.get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        count = rebuild_similarity(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+
+    print(f"프롬프트 {count}개의 유사 프롬프트 목록을 계산했습니다: {database.DB_PATH}")
+
+
+def _catalog_filters(conn):
+    """카탈로그 비교에 쓸 필터 조합을 만듭니다."""
+    folder_ids = [row[0] for row in conn.execute("SELECT id FROM folders")]
+    tag_ids = [row[0] for row in conn.execute("SELECT id FROM tags")]
+    tag_names = [
+        '"' + row[0].replace('"', '""') + '"'
+        for row in conn.execute("SELECT name FROM tags ORDER BY id")
+    ]
+
+    combinations = [{}, {"folder_id": "none"}]
+    combinations += [{"is_favorite": value} for value in ("true", "false")]
+    for folder_id in folder_ids:
+        combinations.append({"folder_id": str(folder_id)})
+        combinations.append(
+            {"folder_id": str(folder_id), "include_descendants": "true"}
+        )
+    for tag_id in tag_ids:
+        combinations.append({"tag_ids": str(tag_id)})
+    for first, second in zip(tag_ids, tag_ids[1:]):
+        for mode in ("any", "all"):
+            combinations.append({"tag_ids": f"{first},{second}", "tag_mode": mode})
+    for first, second, third in zip(tag_names, tag_names[1:], tag_names[2:]):
+        combinations.append({"tag_expr": f"NOT {first}"})
+        combinations.append({"tag_expr": f"({first} OR {second}) AND NOT {third}"})
+        combinations.append(
+            {"tag_expr": f"{first} {second} OR NOT ({third})", "is_favorite": "true"}
+        )
+    return [parse_filter_args(args) for args in combinations]
+
+
+def _sql_facets(conn, filters):
+    """카탈로그 facets와 같은 형식의 개수를 그룹 SQL로 계산합니다."""
+    clauses, params = build_filter_clause(filters)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+
+    rows = conn.execute(
+        f"""
+        SELECT p.folder_id, COUNT(*), SUM(p.is_favorite != 0), SUM(p.use_count > 0)
+        FROM prompts p{where}
+        GROUP BY p.folder_id
+        """,
+        params,
+    ).fetchall()
+    direct_counts = {row[0]: row[1] for row in rows}
+    total = sum(row[1] for row in rows)
+    favorites = sum(row[2] for row in rows)
+    used = sum(row[3] for row in rows)
+
+    subtree_counts = dict(
+        conn.execute(
+            f"""
+            SELECT c.ancestor, COUNT(*)
+            FROM prompts p
+            JOIN folder_closure c ON c.descendant = p.folder_id{where}
+            GROUP BY c.ancestor
+            """,
+            params,
+        ).fetchall()
+    )
+    tag_counts = dict(
+        conn.execute(
+            f"""
+            SELECT pt.tag_id, COUNT(*)
+            FROM prompt_tags pt
+            JOIN prompts p ON p.id = pt.prompt_id{where}
+            GROUP BY pt.tag_id
+            """,
+            params,
+        ).fetchall()
+    )
+
+    return {
+        "total": total,
+        "tags": [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "color": row["color"],
+                "count": tag_counts.get(row["id"], 0),
+            }
+            for row in conn.execute("SELECT id, name, color FROM tags ORDER BY name")
+        ],
+        "folders": [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "parent_id": row["parent_id"],
+                "count": direct_counts.get(row["id"], 0),
+                "total_count": subtree_counts.get(row["id"], 0),
+            }
+            for row in conn.execute(
+                "SELECT id, name, parent_id FROM folders ORDER BY id"
+            )
+        ],
+        "unfiled": direct_counts.get(None, 0),
+        "favorites": {"favorite": favorites, "not_favorite": total - favorites},
+        "usage": {"used": used, "unused": total - used},
+    }
+
+
+def check_catalog(args):
+    """모든 필터/정렬 조합에서 카탈로그 목록, 개수, facets가 SQL 결과와 같은지 확인합니다.
+
+    다른 결과가 있으면 종료 코드 1을 반환합니다.
+    """
+    migrate_schema()
+
+    conn = database.get_db_connection()
+    try:
+        catalog = PromptCatalog()
+        catalog.load(conn)
+
+        failures = 0
+        filter_list = _catalog_filters(conn)
+        for filters in filter_list:
+            if catalog.count(filters) != estimate_total(conn, filters):
+                print(f"[개수] {filters}")
+                failures += 1
+            if catalog.facets(filters) != _sql_facets(conn, filters):
+                print(f"[facets] {filters}")
+                failures += 1
+
+            for sort in SORT_FIELDS:
+                for direction in SORT_DIRECTIONS:
+                    sql, params = build_list_query(filters, sort, direction)
+                    expected = [row["id"] for row in conn.execute(sql, params)]
+                    actual = [
+                        record.id for record in catalog.query(filters, sort, direction)
+                    ]
+                    if actual != expected:
+                        print(f"[순서] {sort} {direction} {filters}")
+                        failures += 1
+    finally:
+        conn.close()
+
+    if failures:
+        print(f"SQL 결과와 다른 카탈로그 결과가 {failures}건 있습니다.")
+        return 1
+
+    print(f"{len(filter_list)}개 필터 조합에서 카탈로그 결과가 SQL 결과와 같습니다.")
+    return 0
+
+
+def _time_call(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_wire_format(args):
+    """목록 API 응답의 기본(nested) 형식과 정규화(normalized) 형식을 비교합니다.
+
+    데이터베이스 복사본에서 요청별로 응답 크기, 서버 JSON 인코딩 시간,
+    클라이언트 JSON 파싱 시간을 측정합니다. 원본 데이터베이스는 바꾸지 않습니다.
+    """
+    source = database.DB_PATH
+    if not os.path.exists(source):
+        print(f"데이터베이스가 없습니다: {source}")
+        return 1
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), "prompt_manager.db")
+    shutil.copy(source, database.DB_PATH)
+    database.setup_database()
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+    from app import app
+
+    with database.get_db() as conn:
+        prompt_id = conn.execute("SELECT MIN(id) FROM prompts").fetchone()[0]
+        collection = conn.execute(
+            """
+            SELECT collection_id FROM collection_stats
+            WHERE prompt_count > 0
+            ORDER BY prompt_count DESC LIMIT 1
+            """
+        ).fetchone()
+
+    urls = [
+        "/api/prompts",
+        "/api/prompts?fields=title,folder,use_count&include=tags",
+        "/api/prompts?limit=100",
+        "/api/prompts/recent?limit=50",
+    ]
+    if prompt_id is not None:
+        urls.append(f"/api/prompts/{prompt_id}/similar")
+    if collection:
+        urls.append(f"/api/collections/{collection[0]}/prompts")
+
+    client = app.test_client()
+    print(f"{'형식':<11}{'크기(바이트)':>14}{'인코딩(ms)':>12}{'파싱(ms)':>10}  요청")
+    for url in urls:
+        for response_format in ("nested", "normalized"):
+            separator = "&" if "?" in url else "?"
+            response = client.get(f"{url}{separator}format={response_format}")
+            if response.status_code != 200:
+                print(f"[실패] {url}: HTTP {response.status_code}")
+                return 1
+
+            payload = response.get_json()
+            body = response.get_data()
+            repeat = max(3, min(200, 2_000_000 // max(len(body), 1)))
+            encode_ms = _time_call(lambda: app.json.dumps(payload), repeat)
+            decode_ms = _time_call(lambda: json.loads(body), repeat)
+            print(
+                f"{response_format:<11}{len(body):>14,}{encode_ms:>12.2f}"
+                f"{decode_ms:>10.2f}  {url}"
+            )
+
+
+# 실행 계획을 검사할 조회 API 요청 (샘플 데이터 기준)
+QUERY_PLAN_REQUESTS = (
+    "/api/prompts",
+    "/api/prompts?limit=5",
+    "/api/prompts?limit=5&sort=title&order=asc",
+    "/api/prompts?limit=5&sort=use_count",
+    "/api/prompts?limit=5&sort=last_used_at",
+    "/api/prompts?limit=5&sort=created_at&order=asc",
+    "/api/prompts?folder_id=3&include_descendants=true&limit=5",
+    "/api/prompts?folder_id=5&limit=5",
+    "/api/prompts?tag_ids=1,3&tag_mode=all&limit=5",
+    "/api/prompts?tag_ids=1&limit=5",
+    "/api/prompts?is_favorite=true&limit=5",
+    "/api/prompts?fields=title,content_preview&include=tags&limit=5",
+    "/api/prompts/1",
+    "/api/prompts/search?q=요약해주",
+    "/api/prompts/search?q=요약",
+    "/api/prompts/1/similar",
+    "/api/prompts/semantic?q=요약",
+    "/api/prompts/1/similar?mode=semantic",
+    "/api/prompts/recent",
+    "/api/prompts/recent?fields=title,content_preview&include=",
+    "/api/prompts/duplicates",
+    "/api/prompts/trending",
+    "/api/prompts/facets?folder_id=3&include_descendants=true",
+    "/api/folders",
+    "/api/tags",
+    "/api/collections",
+    "/api/collections/1/prompts",
+    "/api/collections/1/prompts?fields=title,content_preview&include=",
+    "/api/settings",
+    "/api/export",
+    "/api/stats/usage",
+    "/api/stats/usage?prompt_id=1&granularity=hour",
+    "/api/stats/usage?folder_id=3&include_descendants=true",
+    "/api/stats/usage?tag_id=1",
+)
+
+# 요청 경로별로 전체 스캔을 허용하는 테이블 (결과 자체가 테이블 전체인 경우)
+EXPECTED_SCANS = {
+    # 조건부 요청용 데이터 버전은 몇 행뿐인 data_versions를 한 번에 읽음
+    "/api/prompts": {"prompts", "folders", "data_versions"},
+    "/api/folders": {"folders", "folder_stats", "data_versions"},
+    "/api/tags": {"tags", "data_versions"},
+    "/api/collections": {"collections", "data_versions"},
+    "/api/export": {"folders", "tags", "prompts"},
+    # 목록이 아직 계산되지 않은 첫 조회에서는 모든 프롬프트의 특징을 읽고,
+    # 이어지는 백그라운드 갱신은 계산된 목록 전체를 읽음
+    "/api/prompts/1/similar": {
+        "prompts",
+        "prompt_tags",
+        "prompt_similarity",
+        "prompt_similarity_ready",
+        "prompt_similarity_dirty",
+        "prompt_embedding_dirty",
+    },
+    # 임베딩 파일이 없으면 모든 프롬프트로 만들고, 변경 표시는 있는지만 확인
+    "/api/prompts/semantic": {"prompts", "prompt_embedding_dirty"},
+}
+
+_ALIAS_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.I)
+_STEP_PATTERN = re.compile(r"^(SCAN|SEARCH) (\S+)(.*)$")
+
+
+def _table_aliases(sql, tables):
+    """SQL의 FROM/JOIN 절에서 별칭 -> 실제 테이블 이름 매핑을 추출합니다."""
+    aliases = {}
+    for table, alias in _ALIAS_PATTERN.findall(sql):
+        if table in tables:
+            aliases[table] = table
+            if alias and alias.upper() not in ("ON", "WHERE", "LEFT", "JOIN"):
+                aliases[alias] = table
+    return aliases
+
+
+def _unexpected_scans(conn, sql, allowed, tables):
+    """인덱스 없이 실제 테이블을 전체 스캔하거나 자동 인덱스를 만드는 단계를 찾습니다."""
+    aliases = _table_aliases(sql, tables)
+    problems = []
+
+    for row in conn.execute("EXPLAIN QUERY PLAN " + sql):
+        match = _STEP_PATTERN.match(row[3])
+        if not match:
+            continue
+
+        # 인덱스가 없어 SQLite가 임시로 만드는 자동 인덱스도 누락된 인덱스로 간주
+        automatic = "AUTOMATIC" in match.group(3)
+        full_scan = match.group(1) == "SCAN" and "INDEX" not in match.group(3)
+        if not (automatic or full_scan) or "VIRTUAL TABLE" in row[3]:
+            continue
+
+        # CTE나 상수 행, FTS 내부 테이블 등은 검사 대상이 아님
+        table = aliases.get(match.group(2))
+        if table and table not in allowed:
+            problems.append(row[3])
+
+    return problems
+
+
+def check_query_plans(args):
+    """샘플 DB에서 조회 API를 호출하며 실행된 SQL의 실행 계획을 검사합니다.
+
+    예상하지 못한 전체 테이블 스캔(SCAN)이 있으면 종료 코드 1을 반환합니다.
+    """
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), "prompt_manager.db")
+    database.setup_database()
+
+    # 연결을 하나만 두고 실행되는 모든 SQL을 기록
+    database.configure_pool(max_size=1)
+    statements = []
+    with database.get_db() as conn:
+        conn.set_trace_callback(statements.append)
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+    from app import app
+
+    client = app.test_client()
+    explain_conn = sqlite3.connect(database.DB_PATH)
+    tables = {
+        row[0]
+        for row in explain_conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )
+    }
+
+    failures = 0
+    for url in QUERY_PLAN_REQUESTS:
+        statements.clear()
+        response = client.get(url)
+        # 요청이 예약한 백그라운드 작업의 SQL도 그 요청의 것으로 검사
+        wait_for_tasks()
+        if response.status_code != 200:
+            print(f"[실패] {url}: HTTP {response.status_code}")
+            failures += 1
+            continue
+
+        allowed = EXPECTED_SCANS.get(url.split("?")[0], set())
+        for sql in statements:
+            if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                continue
+            for step in _unexpected_scans(explain_conn, sql, allowed, tables):
+                print(f"[SCAN] {url}: {step}\n    {' '.join(sql.split())}")
+                failures += 1
+
+    explain_conn.close()
+
+    if failures:
+        print(f"예상하지 못한 실행 계획이 {failures}건 있습니다.")
+        return 1
+
+    print(
+        f"{len(QUERY_PLAN_REQUESTS)}개 요청의 실행 계획에 예상하지 못한 SCAN이 없습니다."
+    )
+    return 0
+
+
+COMMANDS = {
+    "rebuild-fts": rebuild_fts,
+    "check-query-plans": check_query_plans,
+    "repair-counters": repair_counters,
+    "rebuild-similarity": rebuild_similarity_index,
+    "check-catalog": check_catalog,
+    "bench-wire-format": bench_wire_format,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="프롬프트 관리 도구 데이터베이스 관리")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument(
+        "--db", help="데이터베이스 파일 경로 (기본값: data/prompt_manager.db)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_PATH = os.path.abspath(args.db)
+
+    return COMMANDS[args.command](args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())